@@ -6,7 +6,7 @@
     """,
     'author':'Alexander Paiz',
     'category': 'General',
-    'version' : '1.0.5',
+    'version' : '1.0.8',
     'depends': [
         'base', 'product', 'account', 'hr'
     ],
@@ -16,6 +16,7 @@
     'data': [
         'security/asovec_security.xml',
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/proyecto_aso_view.xml',
         'views/res_company_view.xml',
         'views/residencia_view.xml',
@@ -31,12 +32,15 @@
         'views/residencia_recibo_wizard_view.xml',
         'views/proceso_recibo_masivo_wizard_view.xml',
         'views/proceso_estado_cuenta_csv_wizard_view.xml',
+        'views/estado_cuenta_masivo_view.xml',
         'views/proceso_estado_lecturas_excel_wizard_view.xml',
         'views/proceso_analisis_mensual_wizard_view.xml',
         'views/proceso_lecturas_csv_wizard_view.xml',
         'views/lectura_listado_wizard_view.xml',
         'views/account_move_view.xml',
         'views/account_payment_view.xml',
+        'views/residencia_cuenta_view.xml',
+        'views/batch_run_view.xml',
         'views/convenio_wizard_view.xml',
         'views/residencia_config_wizard_view.xml',
         'views/proceso_corte_servicio_wizard_view.xml',
@@ -1,63 +1,64 @@
 # -*- coding: utf-8 -*-
-import base64
+import os
+
+from werkzeug.wsgi import wrap_file
 
 from odoo import http
 from odoo.http import content_disposition, request
 
+from ..models.xlsx_export import xlsx_en_archivo_temporal
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
 
 class EstadoCuentaController(http.Controller):
 
-    @http.route("/asovec/estado_cuenta/<int:wizard_id>/xlsx", type="http", auth="user")
-    def estado_cuenta_xlsx(self, wizard_id, **kwargs):
-        """Genera y descarga el Excel del estado de cuenta directamente desde el
-        reporte HTML, sin tener que volver al wizard. Reusa action_generar_excel
-        (mismo builder que el HTML y el PDF) para que los tres coincidan."""
-        wizard = request.env["asovec.cobro_mensual_consulta_wizard"].browse(wizard_id).exists()
+    def _xlsx_response(self, model, wizard_id):
+        """Arma el Excel del wizard en modo streaming (constant_memory a un archivo
+        temporal, ver models/xlsx_export.py) y lo envía tal cual en la respuesta, sin
+        guardarlo en `file_data` del wizard ni en ir_attachment. Usa el mismo
+        `_escribir_excel` que el botón del wizard, así que ambos coinciden."""
+        wizard = request.env[model].browse(wizard_id).exists()
         if not wizard:
             return request.not_found()
 
-        wizard.action_generar_excel()
-
-        return request.make_response(
-            base64.b64decode(wizard.file_data),
+        archivo, filename = xlsx_en_archivo_temporal(wizard._escribir_excel)
+        response = request.make_response(
+            wrap_file(request.httprequest.environ, archivo),
             headers=[
-                ("Content-Type", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
-                ("Content-Disposition", content_disposition(wizard.file_name)),
+                ("Content-Type", XLSX_CONTENT_TYPE),
+                ("Content-Disposition", content_disposition(filename)),
+                ("Content-Length", os.fstat(archivo.fileno()).st_size),
             ],
         )
+        response.direct_passthrough = True
+        return response
+
+    @http.route("/asovec/estado_cuenta/<int:wizard_id>/xlsx", type="http", auth="user")
+    def estado_cuenta_xlsx(self, wizard_id, **kwargs):
+        """Genera y descarga el Excel del estado de cuenta directamente desde el
+        reporte HTML, sin tener que volver al wizard. Mismo builder que el HTML y el
+        PDF, para que los tres coincidan."""
+        return self._xlsx_response("asovec.cobro_mensual_consulta_wizard", wizard_id)
 
     @http.route("/asovec/residencia_config/<int:wizard_id>/xlsx", type="http", auth="user")
     def residencia_config_xlsx(self, wizard_id, **kwargs):
         """Genera y descarga el Excel de configuración de residencias directamente
         desde el reporte HTML, sin tener que volver al wizard."""
-        wizard = request.env["asovec.residencia_config_wizard"].browse(wizard_id).exists()
-        if not wizard:
-            return request.not_found()
-
-        wizard.action_generar_excel()
-
-        return request.make_response(
-            base64.b64decode(wizard.file_data),
-            headers=[
-                ("Content-Type", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
-                ("Content-Disposition", content_disposition(wizard.file_name)),
-            ],
-        )
+        return self._xlsx_response("asovec.residencia_config_wizard", wizard_id)
 
     @http.route("/asovec/analisis_mensual/<int:wizard_id>/xlsx", type="http", auth="user")
     def analisis_mensual_xlsx(self, wizard_id, **kwargs):
         """Genera y descarga el Excel del análisis mensual directamente desde el
         reporte HTML, sin tener que volver al wizard."""
-        wizard = request.env["asovec.proceso_analisis_mensual_wizard"].browse(wizard_id).exists()
-        if not wizard:
-            return request.not_found()
+        return self._xlsx_response("asovec.proceso_analisis_mensual_wizard", wizard_id)
 
-        wizard.action_generar_excel()
+    @http.route("/asovec/corte_servicio/<int:wizard_id>/xlsx", type="http", auth="user")
+    def corte_servicio_xlsx(self, wizard_id, **kwargs):
+        """Excel de las residencias seleccionadas para corte de servicio."""
+        return self._xlsx_response("asovec.proceso_corte_servicio_wizard", wizard_id)
 
-        return request.make_response(
-            base64.b64decode(wizard.file_data),
-            headers=[
-                ("Content-Type", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
-                ("Content-Disposition", content_disposition(wizard.file_name)),
-            ],
-        )
+    @http.route("/asovec/estado_lecturas/<int:wizard_id>/xlsx", type="http", auth="user")
+    def estado_lecturas_xlsx(self, wizard_id, **kwargs):
+        """Excel de estado de lecturas del mes (uno o todos los proyectos)."""
+        return self._xlsx_response("asovec.proceso_estado_lecturas_excel_wizard", wizard_id)
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""Los indicadores de avance del Cobro Mensual (total de residencias, con/sin lectura,
+inactivas, cargos generados, pendientes por generar) pasan de computados al vuelo a
+campos guardados que se mantienen solos al cambiar líneas, cargos o residencias. Las
+columnas nuevas quedan en cero al actualizar el módulo, así que esta migración los
+calcula una vez para todos los cobros mensuales existentes."""
+
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env["asovec.proyecto_cobro_mensual"].search([])._recalcular_indicadores()
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""Nueva Cuenta Corriente por Residencia (asovec.residencia_cuenta): tabla derivada de
+la contabilidad con un renglón por cargo y por pago aplicado. Desde ahora se mantiene
+sola al postear/cancelar cargos y conciliar pagos; esta migración la arma una vez
+para todo el histórico existente."""
+
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env["asovec.residencia_cuenta"]._reconstruir_todo()
+    # La antigüedad de deuda (asovec.residencia_atraso) toma los saldos de esta tabla.
+    env["asovec.residencia_atraso"]._refrescar()
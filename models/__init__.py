@@ -4,13 +4,19 @@ from . import product_template
 from . import contador
 from . import res_company
 from . import proyecto_cobro_mensual
+from . import proyecto_cobro_mensual_job
+from . import batch_run
 from . import account_journal
 from . import cobro_consulta_wizard
 from . import estado_cuenta_report
+from . import estado_cuenta_masivo
 from . import tipo_servicio_aso
 from . import account_move
 from . import account_move_line
 from . import account_payment
+from . import account_partial_reconcile
+from . import residencia_cuenta
+from . import residencia_atraso
 from . import residencia_report
 from . import residencia_recibo_wizard
 from . import residencia_recibo_report
@@ -28,6 +34,7 @@ from . import residencia_config_wizard
 from . import residencia_config_report
 from . import proceso_corte_servicio_wizard
 from . import proceso_corte_servicio_report
+from . import ir_actions_report
 from . import orden_trabajo
 from . import orden_trabajo_report
 from . import convenio_wizard
@@ -16,6 +16,11 @@ CTX_SKIP_CARGO_AUTOMATICO_CHECK = "iit_asovec_skip_cargo_automatico_check"
 # para ese proceso y no se puede operar manualmente desde Facturación.
 CTX_SKIP_CARGO_MIGRADO_CHECK = "iit_asovec_skip_cargo_migrado_check"
 
+# Campos de account.move que cambian la cuenta corriente por residencia
+# (asovec.residencia_cuenta): al escribir cualquiera de ellos se reconstruye la de las
+# residencias afectadas.
+_CAMPOS_CUENTA_RESIDENCIA = {"state", "residencia_id", "invoice_date", "date", "move_type"}
+
 
 class AccountMove(models.Model):
     _inherit = "account.move"
@@ -29,6 +34,69 @@ class AccountMove(models.Model):
              "distintas aunque compartan el mismo cliente.",
     )
 
+    def write(self, vals):
+        moves_cuenta = self.browse()
+        if _CAMPOS_CUENTA_RESIDENCIA.intersection(vals):
+            moves_cuenta = self if vals.get("residencia_id") else self._moves_cuenta_residencia()
+        Cuenta = self.env["asovec.residencia_cuenta"].sudo()
+        residencias_antes = Cuenta._residencias_de_moves(moves_cuenta)
+        # Un cargo cancelado vuelve "pendiente" a su residencia en el cobro mensual
+        # (ver asovec.proyecto_cobro_mensual._recalcular_indicadores): solo importa
+        # entrar o salir de Cancelado, no postear ni volver a borrador.
+        cargos_indicadores = self.browse()
+        if "state" in vals:
+            cargos_indicadores = self._cargos_cobro_mensual()
+            if vals["state"] != "cancel":
+                cargos_indicadores = cargos_indicadores.filtered(lambda m: m.state == "cancel")
+        res = super().write(vals)
+        if "state" in vals:
+            cargos_indicadores._cobros_mensuales()._programar_indicadores()
+        if moves_cuenta:
+            residencias = residencias_antes | Cuenta._residencias_de_moves(moves_cuenta)
+            Cuenta._reconstruir(residencias)
+            # La antigüedad de deuda sale de la cuenta corriente: solo hay que
+            # refrescarla si cambió la de alguna residencia (no por cada factura de
+            # proveedor, pago ajeno o borrador que se cancela).
+            if "state" in vals and residencias:
+                self.env["asovec.residencia_atraso"]._programar_refresco()
+        return res
+
+    def unlink(self):
+        cobros = self._cargos_cobro_mensual()._cobros_mensuales()
+        residencias = self.env["asovec.residencia_cuenta"].sudo()._residencias_de_moves(
+            self._moves_cuenta_residencia()
+        )
+        res = super().unlink()
+        cobros._programar_indicadores()
+        self.env["asovec.residencia_cuenta"].sudo()._reconstruir(residencias)
+        return res
+
+    def _moves_cuenta_residencia(self):
+        """Los de estos asientos que pueden cambiar la cuenta corriente por residencia:
+        cargos con residencia y asientos con alguna línea por cobrar conciliada (pagos
+        y notas de crédito aplicados a un cargo). Facturas de proveedor, asientos
+        manuales y demás no pasan por las consultas de la cuenta corriente."""
+        return self.filtered(lambda m: m.residencia_id or any(
+            line.account_type == "asset_receivable" and (line.matched_debit_ids or line.matched_credit_ids)
+            for line in m.line_ids
+        ))
+
+    def _cargos_cobro_mensual(self):
+        """Los de estos asientos que pueden ser cargos de un cobro mensual: solo el
+        diario 'Cargo Automatico Asociacion' los admite (ver
+        `_check_diario_cargo_automatico`), así el resto de facturas y asientos ni
+        siquiera consultan el detalle de los cobros."""
+        return self.filtered(lambda m: m.journal_id.aso_cargo_automatico == "Si")
+
+    def _cobros_mensuales(self):
+        """Cobros mensuales (asovec.proyecto_cobro_mensual) que tienen alguno de estos
+        cargos en su detalle."""
+        if not self.ids:
+            return self.env["asovec.proyecto_cobro_mensual"]
+        return self.env["asovec.proyecto_cobro_mensual_line"].sudo().search(
+            [("move_id", "in", self.ids)]
+        ).cobro_id
+
     @api.onchange("partner_id", "journal_id")
     def _onchange_partner_id_residencia(self):
         for move in self:
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from odoo import api, models
+
+
+class AccountPartialReconcile(models.Model):
+    _inherit = "account.partial.reconcile"
+
+    def _residencias_cuenta(self):
+        """Residencias de los cargos que concilian estos parciales (su cuenta corriente
+        y la antigüedad de su deuda cambian al conciliar o desconciliar un pago o nota
+        de crédito)."""
+        return (self.debit_move_id.move_id | self.credit_move_id.move_id).residencia_id.ids
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partials = super().create(vals_list)
+        self.env["asovec.residencia_cuenta"].sudo()._reconstruir(partials._residencias_cuenta())
+        self.env["asovec.residencia_atraso"]._programar_refresco()
+        return partials
+
+    def unlink(self):
+        residencias = self._residencias_cuenta()
+        res = super().unlink()
+        self.env["asovec.residencia_cuenta"].sudo()._reconstruir(residencias)
+        self.env["asovec.residencia_atraso"]._programar_refresco()
+        return res
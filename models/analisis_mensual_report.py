@@ -1,9 +1,7 @@
 # -*- coding: utf-8 -*-
-import base64
 from collections import defaultdict
 
 from odoo import models, api
-from odoo.tools import image_process
 
 from .contador import MONTH_SELECTION
 
@@ -39,21 +37,66 @@ class ReportAnalisisMensual(models.AbstractModel):
         else:
             resumen["sin_lectura"] += 1
 
-    def _acumular_dinero(self, resumen, line, move_lines_de_la_linea):
-        """Acumula los montos (facturado/pagado/saldo/por servicio) de un cargo YA
-        generado. Solo aplica a residencias que ya tienen línea de cobro mensual."""
-        resumen["total_facturado"] += line.amount_total
-        resumen["total_pagado"] += line.amount_paid
-        resumen["total_saldo"] += line.amount_balance
-        resumen["cantidad_residencias"] += 1
-        for ml in move_lines_de_la_linea:
-            resumen["por_servicio"][ml.product_id.name] += ml.price_unit
+    def _acumular_dinero(self, resumen, totales, servicios):
+        """Acumula en `resumen` los montos (facturado/pagado/saldo/por servicio) ya
+        agregados de los cargos generados. Solo cuenta residencias que ya tienen línea
+        de cobro mensual."""
+        resumen["total_facturado"] += totales["amount_total"]
+        resumen["total_pagado"] += totales["amount_paid"]
+        resumen["total_saldo"] += totales["amount_balance"]
+        resumen["cantidad_residencias"] += totales["cantidad"]
+        for nombre, monto in servicios.items():
+            resumen["por_servicio"][nombre] += monto
+
+    def _totales_por_proyecto(self, domain_lines):
+        """{proyecto_id: totales} de facturado/pagado/saldo y cantidad de líneas de
+        cobro mensual, agrupados en la base de datos."""
+        data = self.env["asovec.proyecto_cobro_mensual_line"].read_group(
+            domain=domain_lines,
+            fields=["amount_total:sum", "amount_paid:sum", "amount_balance:sum", "proyecto_aso_id"],
+            groupby=["proyecto_aso_id"],
+        )
+        return {
+            (d["proyecto_aso_id"][0] if d["proyecto_aso_id"] else False): {
+                "amount_total": d["amount_total"] or 0.0,
+                "amount_paid": d["amount_paid"] or 0.0,
+                "amount_balance": d["amount_balance"] or 0.0,
+                "cantidad": d["proyecto_aso_id_count"],
+            }
+            for d in data
+        }
+
+    def _servicios_por_move(self, moves):
+        """{move_id: {nombre del servicio: monto}} de las líneas de producto de
+        `moves`, agrupadas en la base de datos por cargo y producto."""
+        if not moves:
+            return {}
+        data = self.env["account.move.line"].read_group(
+            domain=[
+                ("move_id", "in", moves.ids),
+                ("display_type", "=", "product"),
+                ("product_id", "!=", False),
+            ],
+            fields=["price_unit:sum", "move_id", "product_id"],
+            groupby=["move_id", "product_id"],
+            lazy=False,
+        )
+        productos = self.env["product.product"].browse({d["product_id"][0] for d in data})
+        nombres = {producto.id: producto.name for producto in productos}
+        servicios_por_move = defaultdict(dict)
+        for d in data:
+            servicios_por_move[d["move_id"][0]][nombres[d["product_id"][0]]] = d["price_unit"]
+        return servicios_por_move
 
     @api.model
     def _build_analisis_data(self, wizard):
         """Arma el resumen global, el resumen y detalle por proyecto para el mes/año del
         wizard. Se comparte entre el reporte HTML y la exportación a Excel, para que
-        ambos siempre muestren exactamente los mismos números."""
+        ambos siempre muestren exactamente los mismos números.
+
+        Todo en una sola pasada: una sola lectura de lecturas/cargos para todas las
+        residencias (`_lecturas_rows`), los montos agrupados por proyecto y por
+        cargo/servicio con read_group, y el reparto por proyecto con diccionarios."""
         wizard.ensure_one()
         mes = wizard.mes
         anio = wizard.anio
@@ -61,22 +104,17 @@ class ReportAnalisisMensual(models.AbstractModel):
         mes_label = dict(MONTH_SELECTION).get(mes, mes)
 
         CobroLine = self.env["asovec.proyecto_cobro_mensual_line"]
-        lines = CobroLine.search([
+        domain_lines = [
             ("month", "=", mes_padded),
             ("year", "=", anio),
-        ], order="proyecto_aso_id, residencia_id")
+        ]
+        lines = CobroLine.search(domain_lines, order="proyecto_aso_id, residencia_id")
 
-        moves = lines.mapped("move_id")
-        move_lines = self.env["account.move.line"].search([
-            ("move_id", "in", moves.ids),
-            ("display_type", "=", "product"),
-            ("product_id", "!=", False),
-        ])
-        move_lines_por_move = defaultdict(lambda: self.env["account.move.line"])
-        for ml in move_lines:
-            move_lines_por_move[ml.move_id.id] |= ml
-
-        servicios_nombres = sorted(set(move_lines.mapped("product_id.name")))
+        servicios_por_move = self._servicios_por_move(lines.move_id)
+        servicios_nombres = sorted({
+            nombre for servicios in servicios_por_move.values() for nombre in servicios
+        })
+        totales_por_proyecto = self._totales_por_proyecto(domain_lines)
 
         # Residencias vigentes (no "No paga servicios"): se usan para contar Con
         # lectura/Sin lectura/Inactivas según su estado REAL este mes, sin importar si
@@ -87,38 +125,41 @@ class ReportAnalisisMensual(models.AbstractModel):
         # Universo de proyectos: cualquiera con residencias vigentes, más cualquiera
         # que ya tenga líneas este mes (por si alguna residencia con línea ya no
         # califica en el filtro anterior), para no perder ningún proyecto.
-        proyectos = (residencias_activas.mapped("proyecto_aso_id") | lines.mapped("proyecto_aso_id")).sorted("name")
+        proyectos = (residencias_activas.proyecto_aso_id | lines.proyecto_aso_id).sorted("name")
 
         resumen_global = self._resumen_vacio()
-        proyectos_data = []
+        resumen_por_proyecto = {proyecto.id: self._resumen_vacio() for proyecto in proyectos}
+
+        for residencia, _lectura, _move, con_lectura, _total, _mstate, _pstate in CobroLine._lecturas_rows(
+            residencias_activas.filtered("proyecto_aso_id"), mes, anio
+        ):
+            self._acumular_categoria(resumen_por_proyecto[residencia.proyecto_aso_id.id], con_lectura)
+            self._acumular_categoria(resumen_global, con_lectura)
+
+        filas_por_proyecto = defaultdict(list)
+        servicios_por_proyecto = defaultdict(lambda: defaultdict(float))
+        for line in lines:
+            servicios_linea = servicios_por_move.get(line.move_id.id, {}) if line.move_id else {}
+            filas_por_proyecto[line.proyecto_aso_id.id].append({
+                "line": line,
+                "servicios": servicios_linea,
+            })
+            for nombre, monto in servicios_linea.items():
+                servicios_por_proyecto[line.proyecto_aso_id.id][nombre] += monto
 
+        proyectos_data = []
         for proyecto in proyectos:
-            residencias_proyecto = residencias_activas.filtered(lambda r, p=proyecto: r.proyecto_aso_id == p)
-            lineas_proyecto = lines.filtered(lambda l, p=proyecto: l.proyecto_aso_id == p)
-
-            resumen_proyecto = self._resumen_vacio()
-
-            for _residencia, _lectura, _move, con_lectura, _total, _mstate, _pstate in CobroLine._lecturas_rows(
-                residencias_proyecto, mes, anio
-            ):
-                self._acumular_categoria(resumen_proyecto, con_lectura)
-                self._acumular_categoria(resumen_global, con_lectura)
-
-            filas = []
-            for line in lineas_proyecto:
-                mls = move_lines_por_move.get(line.move_id.id, self.env["account.move.line"]) if line.move_id else self.env["account.move.line"]
-                servicios_linea = {ml.product_id.name: ml.price_unit for ml in mls}
-                filas.append({
-                    "line": line,
-                    "servicios": servicios_linea,
-                })
-                self._acumular_dinero(resumen_proyecto, line, mls)
-                self._acumular_dinero(resumen_global, line, mls)
+            resumen_proyecto = resumen_por_proyecto[proyecto.id]
+            totales = totales_por_proyecto.get(proyecto.id)
+            if totales:
+                servicios = servicios_por_proyecto[proyecto.id]
+                self._acumular_dinero(resumen_proyecto, totales, servicios)
+                self._acumular_dinero(resumen_global, totales, servicios)
 
             proyectos_data.append({
                 "proyecto": proyecto,
                 "resumen": resumen_proyecto,
-                "filas": filas,
+                "filas": filas_por_proyecto[proyecto.id],
             })
 
         return {
@@ -136,11 +177,8 @@ class ReportAnalisisMensual(models.AbstractModel):
         datos = self._build_analisis_data(wizard)
 
         company = self.env.company
-        logo_b64 = False
-        if company.logo:
-            resized = image_process(base64.b64decode(company.logo), size=(0, LOGO_MAX_HEIGHT))
-            if resized:
-                logo_b64 = base64.b64encode(resized).decode()
+        logo = company._aso_logo_miniatura(LOGO_MAX_HEIGHT)
+        logo_b64 = logo.decode() if logo else False
 
         return {
             "doc_ids": docids,
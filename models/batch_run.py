@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+PROCESOS = [
+    ("generar", "Completar Faltantes"),
+    ("regenerar", "Regenerar Cargos"),
+    ("confirmar", "Confirmar"),
+    ("generar_fondo", "Completar Faltantes (segundo plano)"),
+    ("confirmar_fondo", "Confirmar (segundo plano)"),
+]
+
+# Cuántos de los elementos más lentos se guardan en cada corrida.
+MAS_LENTOS = 10
+
+
+def _percentil(valores_ordenados, p):
+    """Percentil `p` (0-100) por rango más cercano de una lista ya ordenada."""
+    if not valores_ordenados:
+        return 0.0
+    indice = max(int(round(p / 100.0 * len(valores_ordenados))) - 1, 0)
+    return valores_ordenados[min(indice, len(valores_ordenados) - 1)]
+
+
+class MedicionLote:
+    """Mide una corrida de un proceso por lotes del cobro mensual (duración total,
+    tiempo de cada elemento, consultas SQL y fallos) y la deja registrada en
+    asovec.batch_run al llamar `registrar`.
+
+    Un elemento es la unidad que el proceso trata de a una: una residencia en
+    Completar Faltantes (modo uno a uno) y Regenerar Cargos, un lote de residencias en
+    la creación masiva de Completar Faltantes, y una tanda de cargos (o un cargo, si
+    la tanda falla) en Confirmar. En segundo plano (asovec.proyecto_cobro_mensual_job)
+    cada tanda del cron es una corrida."""
+
+    def __init__(self, cobro, proceso):
+        self.cobro = cobro
+        self.proceso = proceso
+        self.inicio = time.monotonic()
+        self.fecha = fields.Datetime.now()
+        self.consultas_inicio = cobro.env.cr.sql_log_count
+        self.tiempos = []
+        self.fallos = []
+
+    @contextmanager
+    def medir(self, etiqueta):
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.tiempos.append((time.monotonic() - inicio, etiqueta))
+
+    def fallo(self, etiqueta, error):
+        self.fallos.append("%s: %s" % (etiqueta, error))
+
+    def registrar(self, residencias):
+        """Guarda la corrida (sin hacer commit: lo hace el proceso junto con su propio
+        avance) y la emite como una línea de log JSON. `residencias` es la cantidad de
+        residencias (o cargos, en Confirmar) efectivamente procesadas."""
+        duracion = time.monotonic() - self.inicio
+        consultas = self.cobro.env.cr.sql_log_count - self.consultas_inicio
+        segundos = sorted(t for t, _etiqueta in self.tiempos)
+        lentos = sorted(self.tiempos, key=lambda t: t[0], reverse=True)[:MAS_LENTOS]
+        vals = {
+            "proceso": self.proceso,
+            "cobro_id": self.cobro.id,
+            "fecha_inicio": self.fecha,
+            "duracion": duracion,
+            "residencias": residencias,
+            "elementos": len(self.tiempos),
+            "fallidos": len(self.fallos),
+            "consultas": consultas,
+            "consultas_por_residencia": consultas / residencias if residencias else 0.0,
+            "tiempo_p50": _percentil(segundos, 50) * 1000,
+            "tiempo_p90": _percentil(segundos, 90) * 1000,
+            "tiempo_max": (segundos[-1] if segundos else 0.0) * 1000,
+            "mas_lentos": "\n".join("%.0f ms  %s" % (t * 1000, etiqueta) for t, etiqueta in lentos),
+            "detalle_errores": "\n".join(self.fallos),
+        }
+        corrida = self.cobro.env["asovec.batch_run"].sudo().create(vals)
+        _logger.info("asovec.batch_run %s", json.dumps({
+            "id": corrida.id,
+            "proceso": self.proceso,
+            "cobro": self.cobro.name,
+            "proyecto": self.cobro.proyecto_aso_id.name,
+            "duracion_s": round(duracion, 3),
+            "residencias": residencias,
+            "elementos": len(self.tiempos),
+            "fallidos": len(self.fallos),
+            "consultas": consultas,
+            "consultas_por_residencia": round(vals["consultas_por_residencia"], 2),
+            "p50_ms": round(vals["tiempo_p50"], 1),
+            "p90_ms": round(vals["tiempo_p90"], 1),
+            "max_ms": round(vals["tiempo_max"], 1),
+            "mas_lentos": [[round(t * 1000, 1), etiqueta] for t, etiqueta in lentos[:3]],
+        }, ensure_ascii=False))
+        return corrida
+
+
+class BatchRun(models.Model):
+    """Registro de cada corrida de los procesos por lotes del cobro mensual (Completar
+    Faltantes, Regenerar Cargos, Confirmar): cuánto tardó, cuántas consultas hizo por
+    residencia y cuáles fueron las residencias más lentas o con error. Lo llena
+    `MedicionLote`; sirve para ver qué proyectos o pasos se vuelven más lentos con el
+    tiempo sin tener que perfilar producción."""
+    _name = "asovec.batch_run"
+    _description = "Corrida de Proceso por Lotes"
+    _order = "fecha_inicio desc, id desc"
+    _rec_name = "cobro_id"
+
+    proceso = fields.Selection(PROCESOS, string="Proceso", required=True, readonly=True)
+    cobro_id = fields.Many2one(
+        "asovec.proyecto_cobro_mensual", string="Cobro mensual", readonly=True, ondelete="cascade", index=True,
+    )
+    proyecto_aso_id = fields.Many2one(
+        related="cobro_id.proyecto_aso_id", string="Proyecto", store=True, readonly=True,
+    )
+    user_id = fields.Many2one("res.users", string="Usuario", default=lambda self: self.env.user, readonly=True)
+    fecha_inicio = fields.Datetime(string="Inicio", readonly=True)
+    duracion = fields.Float(string="Duración (s)", readonly=True, group_operator="avg")
+    residencias = fields.Integer(string="Residencias", readonly=True)
+    elementos = fields.Integer(
+        string="Elementos medidos", readonly=True,
+        help="Residencias, lotes de residencias o tandas de cargos medidos uno por uno "
+             "(ver 'Más lentos').",
+    )
+    fallidos = fields.Integer(string="Fallidos", readonly=True)
+    consultas = fields.Integer(string="Consultas SQL", readonly=True)
+    consultas_por_residencia = fields.Float(string="Consultas por residencia", readonly=True, group_operator="avg")
+    tiempo_p50 = fields.Float(string="p50 (ms)", readonly=True, group_operator="avg")
+    tiempo_p90 = fields.Float(string="p90 (ms)", readonly=True, group_operator="avg")
+    tiempo_max = fields.Float(string="Máximo (ms)", readonly=True, group_operator="max")
+    mas_lentos = fields.Text(string="Más lentos", readonly=True)
+    detalle_errores = fields.Text(string="Errores", readonly=True)
+
+    @api.autovacuum
+    def _gc_corridas_antiguas(self):
+        """Conserva un año de corridas: suficiente para comparar ciclos de cobro."""
+        limite = fields.Datetime.subtract(fields.Datetime.now(), years=1)
+        self.search([("fecha_inicio", "<", limite)]).unlink()
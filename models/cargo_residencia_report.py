@@ -1,8 +1,5 @@
 # -*- coding: utf-8 -*-
-import base64
-
 from odoo import models, fields, api
-from odoo.tools import image_process
 
 LOGO_MAX_HEIGHT = 120
 
@@ -24,19 +21,16 @@ class ReportCargoResidencia(models.AbstractModel):
     def _get_cargo_data(self, lines):
         datos = []
         logos_cache = {}
+        contadores = lines.residencia_id._get_contadores_activos()
 
         for line in lines:
             company = line.cobro_id.company_id or self.env.company
             if company.id not in logos_cache:
-                if company.logo:
-                    resized = image_process(base64.b64decode(company.logo), size=(0, LOGO_MAX_HEIGHT))
-                    logos_cache[company.id] = base64.b64encode(resized) if resized else False
-                else:
-                    logos_cache[company.id] = False
+                logos_cache[company.id] = company._aso_logo_miniatura(LOGO_MAX_HEIGHT)
 
             move = line.move_id
             residencia = line.residencia_id
-            contador = residencia._get_contador_activo()
+            contador = contadores.get(residencia.id)
 
             meses = dict(self.env["asovec.proyecto_cobro_mensual"]._fields["month"].selection)
             periodo = "%s %s" % (meses.get(line.month, line.month or ""), line.year or "")
@@ -1,13 +1,10 @@
 # -*- coding: utf-8 -*-
 import base64
-import io
-
-import xlsxwriter
-
 from odoo import api, models, fields, _
 from odoo.exceptions import UserError
 
 from .contador import MONTH_SELECTION
+from .xlsx_export import xlsx_en_memoria
 
 _INVALID_FILENAME_CHARS = set('\\/:*?"<>|')
 _MONTH_LABELS = dict(MONTH_SELECTION)
@@ -141,44 +138,28 @@ class CobroMensualConsultaWizard(models.TransientModel):
         return self.env.ref("iit_asovec.action_report_estado_cuenta_pdf").report_action(self, data={})
 
     # -------------------------
-    # Líneas de cobro mensual (con cargo) de una residencia. La deuda migrada y los
-    # pagos se agregan aparte, ver
-    # report.iit_asovec.report_estado_cuenta_document._movimientos_residencia
+    # Líneas de cobro mensual (con cargo) de una o varias residencias. La deuda
+    # migrada y los pagos se agregan aparte, ver
+    # report.iit_asovec.report_estado_cuenta_document._movimientos_residencias
     # -------------------------
     def _get_cobro_lines_residencia(self, residencia):
-        self.ensure_one()
+        return self._get_cobro_lines_residencias(residencia)
 
-        domain = [
-            ("residencia_id", "=", residencia.id),
-            ("cobro_id.state", "=", "posted"),
-            ("move_id", "!=", False),
-            # El estado del cobro mensual (el mes completo) no se sincroniza
-            # automáticamente si alguien resetea a borrador o cancela una factura
-            # individual desde Contabilidad, así que se revisa también el estado
-            # real de la factura de esta línea, no solo el del cobro.
-            ("move_id.state", "=", "posted"),
-        ]
-        if self.solo_residente_actual and self.cliente_id:
-            domain.append(("cliente_id", "=", self.cliente_id.id))
-        if self.excluir_cargos_mes_actual:
-            hoy = fields.Date.context_today(self)
-            domain += [
-                "|",
-                ("month", "!=", str(hoy.month).zfill(2)),
-                ("year", "!=", hoy.year),
-            ]
-
-        return self.env["asovec.proyecto_cobro_mensual_line"].search(domain, order="year, month, id")
+    def _get_cobro_lines_residencias(self, residencias):
+        self.ensure_one()
+        return self.env["report.iit_asovec.report_estado_cuenta_document"]._cobro_lines_residencias(self, residencias)
 
     # -------------------------
     # Exportación a Excel
     # -------------------------
-    def action_generar_excel(self):
+    def _escribir_excel(self, workbook, movimientos_por_residencia=None):
+        """Llena `workbook` con el estado de cuenta y devuelve el nombre de archivo.
+        Ver `_build_estado_cuenta_data` para `movimientos_por_residencia`."""
         self.ensure_one()
-        datos = self.env["report.iit_asovec.report_estado_cuenta_document"]._build_estado_cuenta_data(self)
+        datos = self.env["report.iit_asovec.report_estado_cuenta_document"]._build_estado_cuenta_data(
+            self, movimientos_por_residencia=movimientos_por_residencia,
+        )
 
-        buffer = io.BytesIO()
-        workbook = xlsxwriter.Workbook(buffer, {"in_memory": True})
         worksheet = workbook.add_worksheet("Estado de Cuenta")
 
         fmt_titulo = workbook.add_format({"bold": True, "font_size": 14})
@@ -294,13 +275,14 @@ class CobroMensualConsultaWizard(models.TransientModel):
 
         ws2.freeze_panes(header_row2 + 1, 0)
 
-        workbook.close()
-        buffer.seek(0)
-
         nombre_cliente = "".join(c for c in (self.cliente_id.name or "Residente") if c not in _INVALID_FILENAME_CHARS)
-        filename = "Estado_Cuenta_%s.xlsx" % nombre_cliente
+        return "Estado_Cuenta_%s.xlsx" % nombre_cliente
+
+    def action_generar_excel(self):
+        self.ensure_one()
+        contenido, filename = xlsx_en_memoria(self._escribir_excel)
         self.write({
-            "file_data": base64.b64encode(buffer.read()),
+            "file_data": base64.b64encode(contenido),
             "file_name": filename,
         })
 
@@ -312,3 +294,13 @@ class CobroMensualConsultaWizard(models.TransientModel):
             "target": "new",
             "context": self.env.context,
         }
+
+    def action_descargar_excel(self):
+        """Descarga el Excel en modo streaming (ver xlsx_export): se arma en el
+        controlador y no se guarda en el wizard."""
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_url",
+            "url": "/asovec/estado_cuenta/%s/xlsx" % self.id,
+            "target": "self",
+        }
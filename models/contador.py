@@ -2,6 +2,7 @@
 from datetime import date
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
+from odoo.tools import float_compare
 
 
 MONTH_SELECTION = [
@@ -21,6 +22,84 @@ def mes_anio_anterior(today):
     return str(mes), anio
 
 
+class TarifaAgua:
+    """Foto de los precios de agua que aplican a UNA residencia: canon (cobro base),
+    precio por metro de exceso, metros base y exoneración de exceso, ya resueltos entre
+    los valores del proyecto y los "propios" de la residencia. Se arma una vez por lote
+    (ver `ContadorLine._tarifas_agua`) y se reutiliza para todas las lecturas de esa
+    residencia, en vez de volver a leer los mismos campos del ORM lectura por lectura."""
+    __slots__ = ('cobro_base', 'precio_metro', 'metro_base', 'exonera_exceso')
+
+    def __init__(self, cobro_base=0.0, precio_metro=0.0, metro_base=0.0, exonera_exceso=False):
+        self.cobro_base = cobro_base
+        self.precio_metro = precio_metro
+        self.metro_base = metro_base
+        self.exonera_exceso = exonera_exceso
+
+    @classmethod
+    def de_residencia(cls, residencia):
+        if not residencia:
+            return cls()
+        proyecto = residencia.proyecto_aso_id
+
+        # El "canon de agua" (cobro base) sigue en vivo el valor del proyecto, salvo que la
+        # residencia tenga marcado su propio "Canon de agua propio": en ese caso se usa el
+        # valor guardado en la residencia, independiente de lo que tenga el proyecto.
+        if residencia.cobro_base_especial:
+            cobro_base = float(residencia.cobro_base_especial_valor or 0.0)
+        else:
+            cobro_base = float(proyecto.cobro_base or 0.0) if proyecto else 0.0
+        # El "precio metro exceso" sigue en vivo el valor del proyecto, salvo que la
+        # residencia tenga marcado su propio "Precio metro exceso propio": en ese caso se usa
+        # el valor guardado en la residencia, independiente de lo que tenga el proyecto.
+        if residencia.precio_metro_especial:
+            precio_metro = float(residencia.precio_metro_especial_valor or 0.0)
+        else:
+            precio_metro = float(proyecto.precio_metro or 0.0) if proyecto else 0.0
+        # El "metro base (derecho)" sigue en vivo el valor del proyecto, salvo que la
+        # residencia tenga marcado su propio metro base ("Metro base propio"): en ese caso
+        # se usa el valor guardado en la residencia, independiente de lo que tenga el proyecto.
+        if residencia.metros_especiales:
+            metro_base = float(residencia.metros_especiales_cantidad or 0.0)
+        else:
+            metro_base = float(proyecto.metro_base or 0.0) if proyecto else 0.0
+
+        return cls(cobro_base, precio_metro, metro_base, bool(residencia.exonera_exceso_agua))
+
+    def calcular(self, lectura_actual, lectura_anterior):
+        consumo = (lectura_actual or 0.0) - (lectura_anterior or 0.0)
+
+        metros_extras = consumo - self.metro_base
+        if metros_extras < 0:
+            metros_extras = 0.0
+
+        # Residencia exonerada de exceso de agua: el exceso (metros_extras) se sigue
+        # calculando y guardando tal cual, para que quede visible cuánto se excedió;
+        # solo el COBRO de ese exceso se anula. Como _build_invoice_lines_residencia
+        # solo crea la línea de exceso cuando pago_extra > 0, dejarlo en 0 evita esa
+        # línea sin tener que tocar esa lógica aparte.
+        pago_extra = 0.0 if self.exonera_exceso else metros_extras * self.precio_metro
+
+        return {
+            'lectura_anterior': lectura_anterior or 0.0,
+            'consumo': consumo,
+            'base': self.cobro_base,
+            'metros_extras': metros_extras,
+            'pago_extra': pago_extra,
+            'pago_total': self.cobro_base + pago_extra,
+        }
+
+
+CAMPOS_LINEA_INICIAL = {
+    'lectura_anterior': 0.0,
+    'consumo': 0.0,
+    'base': 0.0,
+    'metros_extras': 0.0,
+    'pago_extra': 0.0,
+    'pago_total': 0.0,
+}
+
+
 class Contador(models.Model):
     _name = 'asovec.contador'
     _description = 'Contador por Residencia'
@@ -43,9 +122,23 @@ class Contador(models.Model):
 
     line_ids = fields.One2many('asovec.contador.lines', 'contador_id', string='Lecturas')
 
-    ultima_lectura = fields.Float(string="Última lectura", compute="_compute_ultima", readonly=True)
-    ultimo_consumo = fields.Float(string="Último consumo", compute="_compute_ultima", readonly=True)
-    ultima_fecha = fields.Date(string="Último período", compute="_compute_ultima", readonly=True)
+    # Puntero guardado a la última lectura (la mensual más reciente o, si todavía no hay
+    # mensuales, el registro inicial) y sus valores: así el asistente del operador, los
+    # onchanges, create/write y el cambio de contador leen una sola fila en vez de
+    # recorrer todo el historial del contador (hay contadores con más de 10 años de
+    # lecturas). Se recalcula solo al crear/modificar/borrar lecturas.
+    ultima_lectura_id = fields.Many2one(
+        'asovec.contador.lines', string="Última lectura registrada",
+        compute="_compute_ultima", store=True, readonly=True,
+    )
+    ultima_lectura = fields.Float(string="Última lectura", compute="_compute_ultima", store=True, readonly=True)
+    ultimo_consumo = fields.Float(string="Último consumo", compute="_compute_ultima", store=True, readonly=True)
+    ultima_fecha = fields.Date(string="Último período", compute="_compute_ultima", store=True, readonly=True)
+    siguiente_periodo = fields.Date(
+        string="Siguiente período", compute="_compute_ultima", store=True, readonly=True,
+        help="Primer día del mes que sigue a la última lectura mensual. Vacío si el "
+             "contador todavía no tiene lecturas mensuales.",
+    )
 
     tiene_inicial = fields.Boolean(string="Tiene inicial", compute="_compute_tiene_inicial", store=True, readonly=True)
 
@@ -65,16 +158,35 @@ class Contador(models.Model):
 
     @api.depends('line_ids.periodo_date', 'line_ids.lectura', 'line_ids.consumo', 'line_ids.es_inicial')
     def _compute_ultima(self):
-        for rec in self:
-            mensuales = rec.line_ids.filtered(lambda l: not l.es_inicial and l.periodo_date)
-            if mensuales:
-                last = mensuales.sorted(lambda l: (l.periodo_date, l.id))[-1]
-            else:
-                last = rec.line_ids.sorted(lambda l: (l.id,))[-1] if rec.line_ids else False
+        Line = self.env['asovec.contador.lines']
+        ultima_por_contador = {}
+        ids = [rec._origin.id for rec in self if rec._origin.id]
+        if ids:
+            # Una sola consulta para todos: la mensual más reciente de cada contador o,
+            # si no tiene mensuales, su lectura de id más alto (el inicial).
+            Line.flush_model(['contador_id', 'es_inicial', 'periodo_date'])
+            self._cr.execute("""
+                SELECT DISTINCT ON (contador_id) contador_id, id
+                  FROM asovec_contador_lines
+                 WHERE contador_id IN %s
+              ORDER BY contador_id,
+                       (es_inicial IS NOT TRUE AND periodo_date IS NOT NULL) DESC,
+                       periodo_date DESC NULLS LAST,
+                       id DESC
+            """, (tuple(ids),))
+            ultima_por_contador = dict(self._cr.fetchall())
 
+        for rec in self:
+            last = Line.browse(ultima_por_contador.get(rec._origin.id, []))
+            rec.ultima_lectura_id = last
             rec.ultima_lectura = last.lectura if last else 0.0
             rec.ultimo_consumo = last.consumo if last else 0.0
             rec.ultima_fecha = last.periodo_date if (last and last.periodo_date) else False
+            if last and not last.es_inicial and last.periodo_date:
+                mes, anio = Line._siguiente_periodo(last.periodo_date.month, last.periodo_date.year)
+                rec.siguiente_periodo = date(anio, int(mes), 1)
+            else:
+                rec.siguiente_periodo = False
 
     def _check_no_other_active(self, residencia_id, exclude_id=None):
         domain = [
@@ -405,6 +517,17 @@ class ContadorLine(models.Model):
             BEFORE UPDATE OR DELETE ON asovec_contador_lines
             FOR EACH ROW EXECUTE FUNCTION asovec_contador_lines_protect_migrada()
         """)
+        # Lectura de un período por contador (siguiente período, validación de
+        # duplicados, recibos) y por residencia (_lecturas_rows del cobro mensual y
+        # de los procesos de todos los proyectos).
+        self._cr.execute("""
+            CREATE INDEX IF NOT EXISTS asovec_contador_lines_contador_periodo
+            ON asovec_contador_lines (contador_id, es_inicial, anio, mes)
+        """)
+        self._cr.execute("""
+            CREATE INDEX IF NOT EXISTS asovec_contador_lines_residencia_periodo
+            ON asovec_contador_lines (residencia_id, anio, mes)
+        """)
 
     @api.depends(
         "invoice_line_ids.move_id.state", "invoice_line_ids.move_id.payment_state",
@@ -451,6 +574,39 @@ class ContadorLine(models.Model):
                 rec.invoice_status_badge = "not_invoiced"
                 rec.payment_status_badge = "migrado" if rec.force_paid else "unpaid"
 
+    def _facturas_y_pagos(self):
+        """{lectura_id: (move, payment_status_badge)} para todas las lecturas de
+        `self`, con el mismo criterio que `_compute_invoice_info` (la factura es la de
+        la primera línea por move_id; inicial y migradas no tienen factura), pero sin
+        recorrer `invoice_line_ids` lectura por lectura: una sola consulta agrupada
+        sobre account_move_line.contador_line_id y una sola lectura de los cargos."""
+        Move = self.env['account.move']
+        if not self.ids:
+            return {}
+        self.env['account.move.line'].flush_model(['contador_line_id', 'move_id'])
+        self.env.cr.execute("""
+            SELECT contador_line_id, MIN(move_id)
+              FROM account_move_line
+             WHERE contador_line_id IN %s
+          GROUP BY contador_line_id
+        """, [tuple(self.ids)])
+        move_id_por_lectura = dict(self.env.cr.fetchall())
+        moves = Move.browse(set(move_id_por_lectura.values()))
+        moves.mapped('payment_state')
+        move_por_id = {move.id: move for move in moves}
+
+        resultado = {}
+        for rec in self:
+            if rec.es_inicial:
+                resultado[rec.id] = (Move, 'inicial')
+                continue
+            move = move_por_id.get(move_id_por_lectura.get(rec.id), Move)
+            if rec.force_invoiced or not move:
+                resultado[rec.id] = (Move, 'migrado' if rec.force_paid else 'unpaid')
+            else:
+                resultado[rec.id] = (move, 'paid' if move.payment_state == 'paid' else 'unpaid')
+        return resultado
+
     def action_view_invoice(self):
         self.ensure_one()
         if not self.invoice_move_id:
@@ -528,6 +684,12 @@ class ContadorLine(models.Model):
     # -------------------------
     @api.model
     def _last_mensual(self, contador_id, exclude_id=None):
+        if not exclude_id:
+            # Caso normal: el puntero guardado en el contador (ver Contador._compute_ultima).
+            last = self.env['asovec.contador'].browse(contador_id).ultima_lectura_id
+            if last and not last.es_inicial and last.periodo_date:
+                return last
+            return self.browse()
         domain = [('contador_id', '=', contador_id), ('es_inicial', '=', False), ('periodo_date', '!=', False)]
         if exclude_id:
             domain.append(('id', '!=', exclude_id))
@@ -550,11 +712,11 @@ class ContadorLine(models.Model):
 
     @api.model
     def _next_period_for_contador(self, contador_id):
-        last = self._last_mensual(contador_id)
-        today = fields.Date.context_today(self)
-        if not last:
+        siguiente = self.env['asovec.contador'].browse(contador_id).siguiente_periodo
+        if not siguiente:
+            today = fields.Date.context_today(self)
             return str(today.month), int(today.year)
-        return self._siguiente_periodo(last.mes, last.anio)
+        return str(siguiente.month), int(siguiente.year)
 
     # -------------------------
     # Validaciones
@@ -602,13 +764,66 @@ class ContadorLine(models.Model):
                     f"El siguiente período debe ser {exp_m}/{exp_y}. No se permiten saltos de meses."
                 )
 
+    @api.model
+    def _estado_lecturas_por_contador(self, contador_ids):
+        """Estado inicial, por contador, para validar un lote de `create()` en memoria
+        (ver `_validate_periodo_vals_en_lote`). Lee de una vez, para todos los contadores
+        del lote, lo que ya existe en la base de datos: el registro inicial, la última
+        lectura mensual (puntero guardado en el contador) y los períodos (mes, año) ya
+        registrados; una consulta por cada cosa, en vez de varias búsquedas por fila. `inicial`/`mensuales` se van llenando
+        con las filas del mismo lote a medida que se procesan."""
+        estado = {
+            contador_id: {
+                'inicial': None,
+                'mensuales': [],
+                'inicial_db': None,
+                'ultimo_db': self.browse(),
+                'periodos_db': set(),
+            }
+            for contador_id in contador_ids
+        }
+        if not estado:
+            return estado
+
+        self.flush_model(['contador_id', 'es_inicial', 'mes', 'anio', 'periodo_date', 'lectura'])
+        ids = tuple(estado)
+
+        self._cr.execute("""
+            SELECT DISTINCT ON (contador_id) contador_id, lectura
+              FROM asovec_contador_lines
+             WHERE contador_id IN %s AND es_inicial IS TRUE
+          ORDER BY contador_id, id DESC
+        """, (ids,))
+        for contador_id, lectura in self._cr.fetchall():
+            estado[contador_id]['inicial_db'] = lectura or 0.0
+
+        # Última mensual: el puntero guardado en cada contador. Se leen juntas, así que
+        # el estado del cargo (`invoice_status_badge`, no guardado) que revisa
+        # `_check_cargo_anterior_confirmado` se calcula en lote.
+        for contador in self.env['asovec.contador'].browse(ids):
+            ultimo = contador.ultima_lectura_id
+            if ultimo and not ultimo.es_inicial and ultimo.periodo_date:
+                estado[contador.id]['ultimo_db'] = ultimo
+
+        self._cr.execute("""
+            SELECT contador_id, mes, anio
+              FROM asovec_contador_lines
+             WHERE contador_id IN %s AND es_inicial IS NOT TRUE AND mes IS NOT NULL AND anio IS NOT NULL
+        """, (ids,))
+        for contador_id, mes, anio in self._cr.fetchall():
+            estado[contador_id]['periodos_db'].add((str(mes), int(anio)))
+
+        return estado
+
     @api.model
     def _validate_periodo_vals_en_lote(self, vals, estado):
         """Igual que `_validate_periodo_vals`, pero considerando además las filas del
         mismo contador ya procesadas dentro de este mismo lote de `create()` (necesario
         para que una importación masiva con varios meses de un mismo contador en un solo
         archivo valide/calcule la secuencia correctamente, ya que esas filas todavía no
-        existen en la base de datos mientras se procesa el lote)."""
+        existen en la base de datos mientras se procesa el lote). Lo que ya existe en la
+        base de datos viene en `estado` (ver `_estado_lecturas_por_contador`), así que
+        aquí no se hace ninguna búsqueda."""
         contador_id = vals.get('contador_id')
         if not contador_id:
             raise ValidationError("Debe seleccionar un Contador.")
@@ -616,10 +831,7 @@ class ContadorLine(models.Model):
         es_inicial = bool(vals.get('es_inicial', False))
 
         if es_inicial:
-            if estado['inicial'] is not None:
-                raise ValidationError("Ya existe un registro inicial para este contador.")
-            domain_ini = [('contador_id', '=', contador_id), ('es_inicial', '=', True)]
-            if self.search(domain_ini, limit=1):
+            if estado['inicial'] is not None or estado['inicial_db'] is not None:
                 raise ValidationError("Ya existe un registro inicial para este contador.")
             return
 
@@ -628,28 +840,21 @@ class ContadorLine(models.Model):
         if not mes or not anio:
             raise ValidationError("Debe seleccionar Mes y Año para una lectura mensual.")
 
+        if (str(mes), int(anio)) in estado['periodos_db']:
+            raise ValidationError("Ya existe una lectura para ese Mes/Año en este contador.")
         for m in estado['mensuales']:
             if str(m['mes']) == str(mes) and int(m['anio']) == int(anio):
                 raise ValidationError("Ya existe una lectura para ese Mes/Año en este contador.")
 
-        domain_dup = [
-            ('contador_id', '=', contador_id),
-            ('es_inicial', '=', False),
-            ('mes', '=', mes),
-            ('anio', '=', anio),
-        ]
-        if self.search(domain_dup, limit=1):
-            raise ValidationError("Ya existe una lectura para ese Mes/Año en este contador.")
-
         if estado['mensuales']:
             ultimo = estado['mensuales'][-1]
             exp_m, exp_y = self._siguiente_periodo(ultimo['mes'], ultimo['anio'])
         else:
-            last = self._last_mensual(contador_id)
+            last = estado['ultimo_db']
             if not last:
                 return
             self._check_cargo_anterior_confirmado(last)
-            exp_m, exp_y = self._next_period_for_contador(contador_id)
+            exp_m, exp_y = self._siguiente_periodo(last.mes, last.anio)
 
         if str(mes) != str(exp_m) or int(anio) != int(exp_y):
             raise ValidationError(
@@ -671,88 +876,60 @@ class ContadorLine(models.Model):
     # -------------------------
     # Cálculos
     # -------------------------
-    def _calcular_campos_linea(self, contador, lectura_actual, lectura_anterior, es_inicial=False):
-        if es_inicial:
-            return {
-                'lectura_anterior': 0.0,
-                'consumo': 0.0,
-                'base': 0.0,
-                'metros_extras': 0.0,
-                'pago_extra': 0.0,
-                'pago_total': 0.0,
-            }
-
-        residencia = contador.residencia_id
-        proyecto = residencia.proyecto_aso_id if residencia else False
-
-        # El "canon de agua" (cobro base) sigue en vivo el valor del proyecto, salvo que la
-        # residencia tenga marcado su propio "Canon de agua propio": en ese caso se usa el
-        # valor guardado en la residencia, independiente de lo que tenga el proyecto.
-        if residencia and residencia.cobro_base_especial:
-            cobro_base = float(residencia.cobro_base_especial_valor or 0.0)
-        else:
-            cobro_base = float(getattr(proyecto, 'cobro_base', 0.0) or 0.0) if proyecto else 0.0
-        # El "precio metro exceso" sigue en vivo el valor del proyecto, salvo que la
-        # residencia tenga marcado su propio "Precio metro exceso propio": en ese caso se usa
-        # el valor guardado en la residencia, independiente de lo que tenga el proyecto.
-        if residencia and residencia.precio_metro_especial:
-            precio_maestro = float(residencia.precio_metro_especial_valor or 0.0)
-        else:
-            precio_maestro = float(getattr(proyecto, 'precio_metro', 0.0) or 0.0) if proyecto else 0.0
-        # El "metro base (derecho)" sigue en vivo el valor del proyecto, salvo que la
-        # residencia tenga marcado su propio metro base ("Metro base propio"): en ese caso
-        # se usa el valor guardado en la residencia, independiente de lo que tenga el proyecto.
-        if residencia and residencia.metros_especiales:
-            metro_base = float(residencia.metros_especiales_cantidad or 0.0)
-        else:
-            metro_base = float(getattr(proyecto, 'metro_base', 0.0) or 0.0) if proyecto else 0.0
-
-        consumo = (lectura_actual or 0.0) - (lectura_anterior or 0.0)
-
-        base = cobro_base
-        metros_extras = consumo - metro_base
-        if metros_extras < 0:
-            metros_extras = 0.0
-
-        pago_extra = metros_extras * precio_maestro
-
-        # Residencia exonerada de exceso de agua: el exceso (metros_extras) se sigue
-        # calculando y guardando tal cual, para que quede visible cuánto se excedió;
-        # solo el COBRO de ese exceso se anula. Como _build_invoice_lines_residencia
-        # solo crea la línea de exceso cuando pago_extra > 0, dejarlo en 0 evita esa
-        # línea sin tener que tocar esa lógica aparte.
-        if residencia and residencia.exonera_exceso_agua:
-            pago_extra = 0.0
-
-        pago_total = base + pago_extra
-
+    @api.model
+    def _tarifas_agua(self, contadores):
+        """{residencia_id: TarifaAgua} de las residencias de `contadores`, armado una
+        sola vez para todo un lote de lecturas."""
         return {
-            'lectura_anterior': lectura_anterior or 0.0,
-            'consumo': consumo,
-            'base': base,
-            'metros_extras': metros_extras,
-            'pago_extra': pago_extra,
-            'pago_total': pago_total,
+            residencia.id: TarifaAgua.de_residencia(residencia)
+            for residencia in contadores.mapped('residencia_id')
         }
 
+    def _calcular_campos_linea(self, contador, lectura_actual, lectura_anterior, es_inicial=False, tarifa=None):
+        if es_inicial:
+            return dict(CAMPOS_LINEA_INICIAL)
+        if tarifa is None:
+            tarifa = TarifaAgua.de_residencia(contador.residencia_id)
+        return tarifa.calcular(lectura_actual, lectura_anterior)
+
+    @api.model
+    def _calcular_campos_lineas(self, filas, tarifas):
+        """Versión por lote de `_calcular_campos_linea`: `filas` es una lista de
+        (residencia_id, lectura_actual, lectura_anterior, es_inicial) y `tarifas` el
+        resultado de `_tarifas_agua`. Devuelve la lista de valores calculados en el
+        mismo orden, sin tocar el ORM."""
+        sin_tarifa = TarifaAgua()
+        return [
+            dict(CAMPOS_LINEA_INICIAL) if es_inicial
+            else tarifas.get(residencia_id, sin_tarifa).calcular(lectura_actual, lectura_anterior)
+            for residencia_id, lectura_actual, lectura_anterior, es_inicial in filas
+        ]
+
     def _refrescar_calculo_con_precio_actual(self):
         """Vuelve a calcular y guardar base/metros_extras/pago_extra/pago_total de esta
         lectura usando el precio VIGENTE del proyecto en este momento. Se usa justo antes
         de generar un cargo que todavía no existe (por ejemplo desde "Completar
         Faltantes"), para no usar una foto vieja del precio si el proyecto cambió de
-        precio después de que la lectura ya se había guardado."""
-        self.ensure_one()
-        if self.es_inicial:
+        precio después de que la lectura ya se había guardado. Acepta varias lecturas a
+        la vez: las tarifas se arman una sola vez para todas."""
+        mensuales = self.filtered(lambda l: not l.es_inicial)
+        if not mensuales:
             return
-        calc = self._calcular_campos_linea(
-            self.contador_id, self.lectura, self.lectura_anterior, es_inicial=False
+        tarifas = self._tarifas_agua(mensuales.mapped('contador_id'))
+        calcs = self._calcular_campos_lineas(
+            [(rec.residencia_id.id, rec.lectura, rec.lectura_anterior, False) for rec in mensuales],
+            tarifas,
         )
-        self.write({
-            'base': calc['base'],
-            'metros_extras': calc['metros_extras'],
-            'pago_extra': calc['pago_extra'],
-            'pago_total': calc['pago_total'],
-        })
+        for rec, calc in zip(mensuales, calcs):
+            vals = {
+                campo: calc[campo]
+                for campo in ('base', 'metros_extras', 'pago_extra', 'pago_total')
+                if float_compare(rec[campo], calc[campo], precision_digits=2) != 0
+            }
+            # Solo escribir si algo cambió: "Regenerar Cargos" refresca todas las lecturas
+            # del cobro y la mayoría sigue con el mismo precio.
+            if vals:
+                rec.write(vals)
 
     # -------------------------
     # PREVIEW
@@ -830,7 +1007,13 @@ class ContadorLine(models.Model):
         # ejemplo una importación masiva de Excel con varios meses de un mismo
         # contador en un solo archivo), cada fila considere las filas anteriores del
         # mismo lote y no solo lo que ya existía en la base de datos antes de crear.
-        estado_por_contador = {}
+        # Lo que ya existía se lee de una vez para todos los contadores del lote.
+        contador_ids = {vals['contador_id'] for vals in vals_list if vals.get('contador_id')}
+        estado_por_contador = self._estado_lecturas_por_contador(contador_ids)
+
+        # Precios de agua de todas las residencias del lote, leídos una sola vez.
+        tarifas = self._tarifas_agua(self.env['asovec.contador'].browse(contador_ids))
+        filas = []
 
         for vals in vals_list:
             contador_id = vals.get('contador_id')
@@ -840,7 +1023,7 @@ class ContadorLine(models.Model):
             if not contador_id:
                 raise ValidationError("Debe seleccionar un Contador.")
 
-            estado = estado_por_contador.setdefault(contador_id, {'inicial': None, 'mensuales': []})
+            estado = estado_por_contador[contador_id]
 
             self._validate_periodo_vals_en_lote(vals, estado)
 
@@ -848,39 +1031,39 @@ class ContadorLine(models.Model):
                 lectura_anterior = 0.0
             elif estado['mensuales']:
                 lectura_anterior = estado['mensuales'][-1]['lectura']
+            elif estado['ultimo_db']:
+                lectura_anterior = estado['ultimo_db'].lectura or 0.0
+            elif estado['inicial'] is not None:
+                lectura_anterior = estado['inicial']
             else:
-                last_m = self._last_mensual(contador_id)
-                if last_m:
-                    lectura_anterior = last_m.lectura or 0.0
-                elif estado['inicial'] is not None:
-                    lectura_anterior = estado['inicial']
-                else:
-                    ini = self._get_inicial(contador_id)
-                    lectura_anterior = (ini.lectura or 0.0) if ini else 0.0
+                lectura_anterior = estado['inicial_db'] or 0.0
 
             if (lectura_actual or 0.0) < (lectura_anterior or 0.0):
                 raise ValidationError(
                     f"La lectura ({lectura_actual}) no puede ser menor que la lectura anterior ({lectura_anterior})."
                 )
 
-            contador = self.env['asovec.contador'].browse(contador_id)
-            vals.update(self._calcular_campos_linea(contador, lectura_actual, lectura_anterior, es_inicial=es_inicial))
+            residencia_id = self.env['asovec.contador'].browse(contador_id).residencia_id.id
+            filas.append((residencia_id, lectura_actual, lectura_anterior, es_inicial))
 
             if es_inicial:
                 estado['inicial'] = lectura_actual
             else:
                 estado['mensuales'].append({'mes': vals.get('mes'), 'anio': vals.get('anio'), 'lectura': lectura_actual})
 
+        for vals, calc in zip(vals_list, self._calcular_campos_lineas(filas, tarifas)):
+            vals.update(calc)
+
         records = super().create(vals_list)
 
-        for rec in records:
-            # La generación del cargo/factura es un efecto de sistema automático de
-            # registrar una lectura, no una acción contable que el usuario esté
-            # ejecutando a propósito: se corre con sudo para que un operador de
-            # lecturas (sin permisos de facturación) pueda registrar su lectura sin
-            # que la generación del cargo le falle por falta de acceso a los modelos
-            # contables internos.
-            rec.sudo()._generar_cargo_mensual()
+        # La generación del cargo/factura es un efecto de sistema automático de
+        # registrar una lectura, no una acción contable que el usuario esté
+        # ejecutando a propósito: se corre con sudo para que un operador de
+        # lecturas (sin permisos de facturación) pueda registrar su lectura sin
+        # que la generación del cargo le falle por falta de acceso a los modelos
+        # contables internos. Todas las lecturas del lote van juntas, agrupadas por
+        # cobro mensual (ver _generar_cargos_mensuales).
+        records.sudo()._generar_cargos_mensuales()
 
         return records
 
@@ -927,6 +1110,7 @@ class ContadorLine(models.Model):
         if not any(k in vals for k in ('lectura', 'contador_id', 'es_inicial', 'mes', 'anio')):
             return res
 
+        tarifas = self._tarifas_agua(self.mapped('contador_id'))
         for rec in self:
             final_vals = {
                 'contador_id': vals.get('contador_id', rec.contador_id.id),
@@ -952,7 +1136,8 @@ class ContadorLine(models.Model):
                 rec.contador_id,
                 rec.lectura or 0.0,
                 lectura_anterior,
-                es_inicial=is_ini
+                es_inicial=is_ini,
+                tarifa=tarifas.get(rec.contador_id.residencia_id.id),
             )
 
             # Si el período (mes/año) cambió, hay que limpiar el cargo que había quedado
@@ -971,9 +1156,9 @@ class ContadorLine(models.Model):
                 'pago_total': calc['pago_total'],
             })
 
-            # Ver comentario equivalente en create(): efecto de sistema, se corre con
-            # sudo para no exigirle permisos contables al operador de lecturas.
-            rec.sudo()._generar_cargo_mensual()
+        # Ver comentario equivalente en create(): efecto de sistema, se corre con
+        # sudo para no exigirle permisos contables al operador de lecturas.
+        self.sudo()._generar_cargos_mensuales()
 
         return res
 
@@ -988,11 +1173,13 @@ class ContadorLine(models.Model):
     # -------------------------
     def _cobro_line_for_period(self, residencia, mes, anio):
         mes_padded = str(mes or "").zfill(2)
+        # Mes/año/estado guardados en la propia línea (related del cobro): la búsqueda
+        # usa el índice (residencia_id, year, month) sin pasar por el cobro.
         return self.env["asovec.proyecto_cobro_mensual_line"].search([
             ("residencia_id", "=", residencia.id),
-            ("cobro_id.month", "=", mes_padded),
-            ("cobro_id.year", "=", anio),
-            ("cobro_id.state", "!=", "cancel"),
+            ("month", "=", mes_padded),
+            ("year", "=", anio),
+            ("cobro_state", "!=", "cancel"),
         ], limit=1)
 
     def _eliminar_cargo_periodo(self, residencia, mes, anio):
@@ -1035,14 +1222,38 @@ class ContadorLine(models.Model):
     def _generar_cargo_mensual(self):
         """Crea (o recrea, si estaba en borrador) el cargo correspondiente a esta lectura."""
         self.ensure_one()
-        if self.es_inicial:
-            return
-        if not self._periodo_habilitado_para_calculo():
-            return
-        if self.residencia_id.no_paga_servicios:
-            return
-        proyecto = self.residencia_id.proyecto_aso_id
-        if not proyecto:
-            return
-        cobro = self.env["asovec.proyecto_cobro_mensual"]._get_or_create_cobro(proyecto, self.mes, self.anio)
-        cobro._generar_cargo_residencia(self.residencia_id, lectura=self)
+        self._generar_cargos_mensuales()
+
+    def _generar_cargos_mensuales(self):
+        """Crea (o recrea, si estaban en borrador) los cargos de varias lecturas a la vez.
+
+        Las lecturas se agrupan por proyecto/mes/año: cada cobro mensual se busca (o
+        crea) una sola vez y todas sus residencias pasan por UNA generación por lote
+        (`_generar_cargos_lote`) que reutiliza diario, servicios, productos de agua y
+        precios. Igual que generar una por una, es todo o nada: si alguna falla, el
+        error se propaga y se revierte la operación completa."""
+        grupos = {}
+        for rec in self:
+            if rec.es_inicial:
+                continue
+            if not rec._periodo_habilitado_para_calculo():
+                continue
+            if rec.residencia_id.no_paga_servicios:
+                continue
+            proyecto = rec.residencia_id.proyecto_aso_id
+            if not proyecto:
+                continue
+            grupos.setdefault((proyecto, rec.mes, rec.anio), []).append(rec)
+
+        Cobro = self.env["asovec.proyecto_cobro_mensual"]
+        for (proyecto, mes, anio), lecturas in grupos.items():
+            cobro = Cobro._get_or_create_cobro(proyecto, mes, anio)
+            lectura_por_residencia = {lectura.residencia_id.id: lectura for lectura in lecturas}
+            residencias = self.env["asovec.residencia"].browse(list(lectura_por_residencia))
+            journal = cobro._get_journal_cargo()
+            servicios = cobro._get_servicios_automaticos()
+            productos_especiales = cobro._get_productos_especiales()
+            cobro._generar_cargos_lote(
+                residencias, lectura_por_residencia, journal, servicios, productos_especiales,
+                indices=cobro._indices_precios(residencias, servicios, productos_especiales),
+            )
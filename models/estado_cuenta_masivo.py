@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+import base64
+import io
+import logging
+import time
+import traceback
+import zipfile
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools.pdf import merge_pdf
+
+from .cobro_consulta_wizard import _INVALID_FILENAME_CHARS
+from .contador import MONTH_SELECTION
+from .xlsx_export import xlsx_en_memoria
+
+_logger = logging.getLogger(__name__)
+
+
+class EstadoCuentaMasivo(models.Model):
+    """Estados de cuenta de TODOS los residentes de un proyecto (o de todos los
+    proyectos) en una sola corrida, para las campañas de cobro antes del corte.
+
+    Cada residente (cliente) es un estado de cuenta con todas sus residencias dentro
+    del alcance elegido, armado con exactamente el mismo motor que la consulta
+    individual (asovec.cobro_mensual_consulta_wizard / `_build_estado_cuenta_data`),
+    así que los números siempre coinciden con lo que se ve en pantalla. El cron
+    `ir_cron_asovec_estado_cuenta_masivo` los procesa en tandas de `_CHUNK_SIZE`
+    residentes, con commit después de cada tanda, guardando cada archivo como adjunto
+    intermedio; al terminar los junta en un ZIP (un Excel o un PDF por residente) o en
+    un solo PDF paginado."""
+    _name = "asovec.estado_cuenta_masivo"
+    _description = "Estado de Cuenta Masivo"
+    _order = "id desc"
+
+    name = fields.Char(string="Referencia", compute="_compute_name", store=True)
+    proyecto_aso_id = fields.Many2one(
+        "asovec.proyecto_aso", string="Proyecto",
+        help="Vacío para generar los estados de cuenta de todos los proyectos.",
+    )
+    formato = fields.Selection(
+        selection=[
+            ("xlsx_zip", "ZIP con un Excel por residente"),
+            ("pdf_zip", "ZIP con un PDF por residente"),
+            ("pdf", "Un solo PDF paginado"),
+        ],
+        string="Formato",
+        required=True,
+        default="pdf",
+    )
+
+    # Mismas opciones que la consulta individual de Estado de Cuenta; se copian tal
+    # cual a cada estado de cuenta generado.
+    solo_residente_actual = fields.Boolean(string="Solo movimientos del residente actual", default=True)
+    excluir_cargos_mes_actual = fields.Boolean(
+        string="No incluir cargos del mes por lecturas del mes actual", default=True,
+    )
+    filtrar_por_periodo = fields.Boolean(string="Filtrar por Período", default=False)
+    mes_periodo = fields.Selection(
+        MONTH_SELECTION, string="Mes",
+        default=lambda self: str(fields.Date.context_today(self).month),
+    )
+    anio_periodo = fields.Integer(string="Año", default=lambda self: fields.Date.context_today(self).year)
+    aplicar_periodo_lecturas = fields.Boolean(string="Aplicar también al Historial de Lecturas", default=False)
+
+    state = fields.Selection(
+        selection=[
+            ("borrador", "Borrador"),
+            ("pendiente", "En cola"),
+            ("en_proceso", "En proceso"),
+            ("terminado", "Terminado"),
+            ("error", "Error"),
+        ],
+        string="Estado",
+        default="borrador",
+        required=True,
+        index=True,
+    )
+    user_id = fields.Many2one("res.users", string="Solicitado por", default=lambda self: self.env.user, readonly=True)
+    fecha_inicio = fields.Datetime(string="Inicio", readonly=True)
+    fecha_fin = fields.Datetime(string="Fin", readonly=True)
+
+    total = fields.Integer(string="Residentes", readonly=True)
+    procesados = fields.Integer(string="Generados", readonly=True)
+    fallidos = fields.Integer(string="Fallidos", readonly=True)
+    progreso = fields.Float(string="Avance", compute="_compute_progreso")
+    detalle_errores = fields.Text(string="Detalle de errores", readonly=True)
+
+    # Id del último residente ya procesado: los residentes se recorren por id, así
+    # que un residente o una residencia que entre o salga del alcance a mitad de la
+    # corrida no corre a los demás (no se salta ni se repite ninguno).
+    cursor_cliente_id = fields.Integer(string="Cursor", default=-1, readonly=True)
+
+    file_data = fields.Binary(string="Archivo", readonly=True, attachment=True)
+    file_name = fields.Char(string="Nombre de archivo", readonly=True)
+
+    # Residentes por tanda: cada uno implica armar su estado de cuenta y, en PDF,
+    # una llamada a wkhtmltopdf.
+    _CHUNK_SIZE = 20
+
+    # Ver asovec.proyecto_cobro_mensual_job._TIEMPO_MAXIMO_CORRIDA.
+    _TIEMPO_MAXIMO_CORRIDA = 240
+
+    @api.depends("proyecto_aso_id", "create_date")
+    def _compute_name(self):
+        for rec in self:
+            alcance = rec.proyecto_aso_id.display_name or _("Todos los proyectos")
+            fecha = fields.Date.to_string(rec.create_date.date()) if rec.create_date else ""
+            rec.name = "%s %s" % (alcance, fecha)
+
+    @api.depends("total", "procesados", "fallidos")
+    def _compute_progreso(self):
+        for rec in self:
+            hechos = rec.procesados + rec.fallidos
+            rec.progreso = (hechos * 100.0 / rec.total) if rec.total else 0.0
+
+    @api.constrains("filtrar_por_periodo", "mes_periodo", "anio_periodo")
+    def _check_periodo_completo(self):
+        for rec in self:
+            if rec.filtrar_por_periodo and not (rec.mes_periodo and rec.anio_periodo):
+                raise UserError(_("Para filtrar por Período debe indicar tanto el Mes como el Año."))
+
+    # -------------------------
+    # Acciones
+    # -------------------------
+    def action_generar(self):
+        """Encola la corrida y dispara el cron de inmediato."""
+        self.ensure_one()
+        if self.state not in ("borrador", "terminado", "error"):
+            raise UserError(_("Este estado de cuenta masivo ya está en proceso."))
+        total = len(self._clientes_a_procesar(despues_de=-1))
+        if not total:
+            raise UserError(_("No hay residencias con residente asignado en el alcance seleccionado."))
+        self._adjuntos_intermedios().unlink()
+        self.write({
+            "state": "pendiente",
+            "total": total,
+            "procesados": 0,
+            "fallidos": 0,
+            "cursor_cliente_id": -1,
+            "detalle_errores": False,
+            "file_data": False,
+            "file_name": False,
+            "fecha_inicio": False,
+            "fecha_fin": False,
+            "user_id": self.env.user.id,
+        })
+        self.env.ref("iit_asovec.ir_cron_asovec_estado_cuenta_masivo")._trigger()
+        return self.action_refrescar()
+
+    def action_refrescar(self):
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "current",
+        }
+
+    # -------------------------
+    # Procesamiento (cron)
+    # -------------------------
+    @api.model
+    def _cron_procesar_trabajos(self):
+        """Mismo esquema que asovec.proyecto_cobro_mensual_job._cron_procesar_trabajos:
+        tandas con commit hasta agotar `_TIEMPO_MAXIMO_CORRIDA` y, si queda trabajo, el
+        cron se vuelve a disparar solo."""
+        inicio = time.monotonic()
+        while time.monotonic() - inicio < self._TIEMPO_MAXIMO_CORRIDA:
+            trabajo = self.search([("state", "in", ("pendiente", "en_proceso"))], order="id asc", limit=1)
+            if not trabajo:
+                return
+            try:
+                trabajo._procesar_tanda()
+            except Exception:
+                # Igual que en las corridas del cobro mensual: un error fuera de los
+                # savepoints por residente (búsqueda del alcance, empaquetado, etc.)
+                # deja la corrida en Error en vez de tomarla primero para siempre.
+                self.env.cr.rollback()
+                _logger.exception("Falló el estado de cuenta masivo %s.", trabajo.id)
+                trabajo.write({
+                    "state": "error",
+                    "fecha_fin": fields.Datetime.now(),
+                    "detalle_errores": "\n".join(filter(None, [
+                        trabajo.detalle_errores, traceback.format_exc(),
+                    ])),
+                })
+            self.env.cr.commit()
+        self.env.ref("iit_asovec.ir_cron_asovec_estado_cuenta_masivo")._trigger()
+
+    def _clientes_a_procesar(self, despues_de=None, limite=None):
+        """Residentes del alcance con id mayor que `despues_de` (por defecto el
+        cursor), en orden de id y hasta `limite`, cada uno con sus residencias
+        (por proyecto y nombre): [(cliente, residencias)]."""
+        self.ensure_one()
+        Residencia = self.env["asovec.residencia"]
+        if despues_de is None:
+            despues_de = self.cursor_cliente_id
+        domain = [("cliente_id", ">", despues_de)]
+        if self.proyecto_aso_id:
+            domain.append(("proyecto_aso_id", "=", self.proyecto_aso_id.id))
+        cliente_ids = sorted(set(Residencia.search(domain).mapped("cliente_id").ids))[:limite]
+        if not cliente_ids:
+            return []
+        residencias = Residencia.search(domain + [("cliente_id", "in", cliente_ids)], order="proyecto_aso_id, name")
+        por_cliente = {cliente_id: Residencia for cliente_id in cliente_ids}
+        for residencia in residencias:
+            por_cliente[residencia.cliente_id.id] |= residencia
+        clientes = self.env["res.partner"].browse(cliente_ids)
+        return [(cliente, por_cliente[cliente.id]) for cliente in clientes]
+
+    def _adjuntos_intermedios(self):
+        return self.env["ir.attachment"].search([
+            ("res_model", "=", self._name),
+            ("res_id", "in", self.ids),
+            ("res_field", "=", False),
+        ], order="id asc")
+
+    def _vals_consulta(self, residencias):
+        self.ensure_one()
+        return {
+            "residencia_ids": [(6, 0, residencias.ids)],
+            "proyecto_aso_id": residencias[:1].proyecto_aso_id.id,
+            "solo_residente_actual": self.solo_residente_actual,
+            "excluir_cargos_mes_actual": self.excluir_cargos_mes_actual,
+            "filtrar_por_periodo": self.filtrar_por_periodo,
+            "mes_periodo": self.mes_periodo,
+            "anio_periodo": self.anio_periodo,
+            "aplicar_periodo_lecturas": self.aplicar_periodo_lecturas,
+        }
+
+    def _generar_archivo_residente(self, cliente, residencias, movimientos_por_residencia=None):
+        """(nombre, contenido) del estado de cuenta de un residente, con el mismo
+        wizard de consulta que usa la pantalla de Estado de Cuenta.
+        `movimientos_por_residencia` es el libro ya armado para la tanda (ver
+        `_procesar_tanda`); sin él, la consulta arma el suyo."""
+        self.ensure_one()
+        consulta = self.env["asovec.cobro_mensual_consulta_wizard"].create(self._vals_consulta(residencias))
+        nombre = "".join(
+            c for c in "%s_%s" % (", ".join(residencias.mapped("name")), cliente.name or "")
+            if c not in _INVALID_FILENAME_CHARS
+        )
+        if self.formato == "xlsx_zip":
+            contenido, _filename = xlsx_en_memoria(
+                lambda workbook: consulta._escribir_excel(workbook, movimientos_por_residencia)
+            )
+            return "Estado_Cuenta_%s.xlsx" % nombre, contenido
+        pdf, _tipo = self.env["ir.actions.report"]._render_qweb_pdf(
+            "iit_asovec.action_report_estado_cuenta_pdf", res_ids=consulta.ids,
+            data={"movimientos_por_residencia": movimientos_por_residencia},
+        )
+        return "Estado_Cuenta_%s.pdf" % nombre, pdf
+
+    def _procesar_tanda(self):
+        """Genera los estados de cuenta de la siguiente tanda de residentes. Los
+        movimientos de todas las residencias de la tanda se leen una sola vez
+        (`_movimientos_residencias`) y cada estado de cuenta se arma con su parte de
+        ese libro. Cada residente va en su propio savepoint: si uno falla, se anota
+        en `detalle_errores` y se sigue con los demás."""
+        self.ensure_one()
+        if self.state == "pendiente":
+            self.write({"state": "en_proceso", "fecha_inicio": fields.Datetime.now()})
+
+        tanda = self._clientes_a_procesar(limite=self._CHUNK_SIZE)
+        if not tanda:
+            self._empaquetar()
+            return
+
+        # Este registro tiene las mismas opciones de libro que la consulta
+        # (`solo_residente_actual`, `excluir_cargos_mes_actual`). Si el libro común
+        # falla, cada residente arma el suyo y el error queda solo en el que lo causa.
+        todas = self.env["asovec.residencia"].union(*(residencias for _cliente, residencias in tanda))
+        try:
+            with self.env.cr.savepoint():
+                libro = self.env["report.iit_asovec.report_estado_cuenta_document"]._movimientos_residencias(
+                    self, todas,
+                )
+        except Exception:
+            libro = None
+
+        procesados = 0
+        errores = []
+        for cliente, residencias in tanda:
+            try:
+                with self.env.cr.savepoint():
+                    nombre, contenido = self._generar_archivo_residente(
+                        cliente, residencias,
+                        {residencia.id: libro[residencia.id] for residencia in residencias} if libro else None,
+                    )
+                    self.env["ir.attachment"].create({
+                        "name": nombre,
+                        "raw": contenido,
+                        "res_model": self._name,
+                        "res_id": self.id,
+                    })
+                procesados += 1
+            except Exception as e:
+                errores.append(_("%s: %s") % (cliente.display_name, str(e)))
+
+        vals = {
+            "cursor_cliente_id": tanda[-1][0].id,
+            "procesados": self.procesados + procesados,
+            "fallidos": self.fallidos + len(errores),
+        }
+        if errores:
+            vals["detalle_errores"] = "\n".join(filter(None, [self.detalle_errores, *errores]))
+        self.write(vals)
+
+        if not self._clientes_a_procesar(limite=1):
+            self._empaquetar()
+
+    def _empaquetar(self):
+        """Junta los archivos intermedios en el archivo final y los borra."""
+        self.ensure_one()
+        adjuntos = self._adjuntos_intermedios()
+        alcance = "".join(
+            c for c in (self.proyecto_aso_id.name or "Todos") if c not in _INVALID_FILENAME_CHARS
+        )
+        if not adjuntos:
+            if self.fallidos:
+                motivo = _("No se pudo generar ningún estado de cuenta: todos los residentes fallaron (ver detalle arriba).")
+            else:
+                motivo = _("No hay estados de cuenta para generar: no se encontró ningún residente con residencias en el alcance elegido.")
+            self.write({
+                "state": "error",
+                "fecha_fin": fields.Datetime.now(),
+                "detalle_errores": "\n".join(filter(None, [self.detalle_errores, motivo])),
+            })
+            return
+
+        if self.formato == "pdf":
+            contenido = merge_pdf([adjunto.raw for adjunto in adjuntos])
+            nombre = "Estados_Cuenta_%s.pdf" % alcance
+        else:
+            buffer = io.BytesIO()
+            usados = set()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+                for adjunto in adjuntos:
+                    nombre_archivo = adjunto.name
+                    if nombre_archivo in usados:
+                        base, extension = nombre_archivo.rsplit(".", 1)
+                        nombre_archivo = "%s_%s.%s" % (base, adjunto.id, extension)
+                    usados.add(nombre_archivo)
+                    zf.writestr(nombre_archivo, adjunto.raw)
+            contenido = buffer.getvalue()
+            nombre = "Estados_Cuenta_%s.zip" % alcance
+
+        self.write({
+            "state": "terminado",
+            "fecha_fin": fields.Datetime.now(),
+            "file_data": base64.b64encode(contenido),
+            "file_name": nombre,
+        })
+        adjuntos.unlink()
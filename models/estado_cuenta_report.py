@@ -1,10 +1,8 @@
 # -*- coding: utf-8 -*-
-import base64
 import calendar
 from datetime import date
 
 from odoo import api, fields, models
-from odoo.tools import image_process
 
 LOGO_MAX_HEIGHT = 90
 
@@ -26,8 +24,9 @@ class ReportEstadoCuenta(models.AbstractModel):
         que no pertenece a ningún período. Sin `mes`/`anio` se muestra todo el
         histórico, comportamiento por defecto."""
         bloques = []
+        contadores = residencias._get_contadores_activos()
         for residencia in residencias:
-            contador = residencia._get_contador_activo()
+            contador = contadores[residencia.id]
             lineas = contador._historial_lecturas_ordenado() if contador else self.env["asovec.contador.lines"]
             if mes and anio:
                 lineas = lineas.filtered(lambda l: not l.es_inicial and l.mes == mes and int(l.anio or 0) == int(anio))
@@ -102,39 +101,72 @@ class ReportEstadoCuenta(models.AbstractModel):
             "aplicado": True,
         }
 
+    def _pagos_aplicados_por_move(self, moves):
+        """{move_id: [(aml, monto)]} con los pagos realmente aplicados a cada uno de
+        `moves` (vía conciliación real, igual a lo que Odoo muestra en el widget
+        "Payments" de la factura), no un simple total-residual.
+
+        Se leen de la cuenta corriente por residencia (asovec.residencia_cuenta), que
+        ya tiene un renglón por cada pago o nota de crédito conciliado contra cada
+        cargo con el mismo criterio que `account.move._get_all_reconciled_invoice_partials`
+        (sin las diferencias de cambio): un solo recorrido del índice
+        (residencia_id, fecha) para todos los cargos a la vez."""
+        resultado = {move_id: [] for move_id in moves.ids}
+        residencia_ids = moves.residencia_id.ids
+        if not moves or not residencia_ids:
+            return resultado
+        self.env["asovec.residencia_cuenta"].flush_model()
+        self.env.cr.execute("""
+            SELECT c.move_id, c.haber, part.credit_move_id
+              FROM asovec_residencia_cuenta c
+              JOIN account_partial_reconcile part ON part.id = c.partial_id
+             WHERE c.residencia_id IN %(residencia_ids)s
+               AND c.tipo = 'pago'
+               AND c.move_id IN %(move_ids)s
+          ORDER BY c.residencia_id, c.fecha, c.id
+        """, {"residencia_ids": tuple(residencia_ids), "move_ids": tuple(moves.ids)})
+        filas = self.env.cr.fetchall()
+
+        contrapartidas = self.env["account.move.line"].sudo().browse(
+            {counterpart_id for _move_id, _monto, counterpart_id in filas}
+        )
+        aml_por_id = {aml.id: aml for aml in contrapartidas}
+        for move_id, monto, counterpart_id in filas:
+            resultado[move_id].append((aml_por_id[counterpart_id], monto))
+        return resultado
+
+    def _movimiento_pago(self, move, residencia, aml, monto, tiene_convenio):
+        return {
+            "date": aml.date,
+            "datetime": aml.create_date,
+            "tipo": "Pago",
+            "tipo_label": "Pago",
+            "residencia": residencia,
+            "move": move,
+            "move_name": move.name,
+            "referencia_cliente": aml.payment_id.payment_reference or aml.move_id.ref or "",
+            "pago_ref": aml.move_id.name,
+            "pago_move": aml.move_id,
+            "pago_payment": aml.payment_id,
+            "journal": aml.journal_id,
+            "convenio": (aml.payment_id.convenio_id if tiene_convenio and aml.payment_id else False),
+            "aso_cargo": False,
+            "aso_cargo_automatico": False,
+            "cliente": move.partner_id,
+            "currency": move.currency_id,
+            "debe": 0.0,
+            "haber": abs(monto),
+            "state": "posted",
+            "aplicado": True,
+        }
+
     def _movimientos_pago(self, move, residencia):
-        """Pagos realmente aplicados a `move` (vía conciliación real, igual a lo que
-        Odoo muestra en el widget "Payments" de la factura), no un simple total-residual."""
+        """Pagos realmente aplicados a `move` (ver `_pagos_aplicados_por_move`)."""
         tiene_convenio = self._payment_tiene_convenio()
-        movimientos = []
-        for reconciled in move.sudo()._get_all_reconciled_invoice_partials():
-            if reconciled.get("is_exchange"):
-                continue
-            aml = reconciled["aml"]
-            movimientos.append({
-                "date": aml.date,
-                "datetime": aml.create_date,
-                "tipo": "Pago",
-                "tipo_label": "Pago",
-                "residencia": residencia,
-                "move": move,
-                "move_name": move.name,
-                "referencia_cliente": aml.payment_id.payment_reference or aml.move_id.ref or "",
-                "pago_ref": aml.move_id.name,
-                "pago_move": aml.move_id,
-                "pago_payment": aml.payment_id,
-                "journal": aml.journal_id,
-                "convenio": (aml.payment_id.convenio_id if tiene_convenio and aml.payment_id else False),
-                "aso_cargo": False,
-                "aso_cargo_automatico": False,
-                "cliente": move.partner_id,
-                "currency": move.currency_id,
-                "debe": 0.0,
-                "haber": abs(reconciled["amount"]),
-                "state": "posted",
-                "aplicado": True,
-            })
-        return movimientos
+        return [
+            self._movimiento_pago(move, residencia, aml, monto, tiene_convenio)
+            for aml, monto in self._pagos_aplicados_por_move(move)[move.id]
+        ]
 
     def _movimientos_credito_sin_aplicar(self, wizard, residencia):
         """Recibos/pagos ya posteados que no están conciliados contra ninguna
@@ -180,51 +212,113 @@ class ReportEstadoCuenta(models.AbstractModel):
         return movimientos
 
     def _movimientos_residencia(self, wizard, residencia, incluir_creditos_sueltos=False):
-        """Arma el libro de movimientos (cargos y pagos reales) de una residencia,
-        ordenados cronológicamente (fecha y, dentro del mismo día, por hora real de
-        creación), con saldo acumulado, para poder ver todo el historial aunque el
-        saldo final sea cero."""
-        entradas = []
-        moves_incluidos = self.env["account.move"]
-
-        for line in wizard._get_cobro_lines_residencia(residencia):
+        """Libro de movimientos de una sola residencia (ver `_movimientos_residencias`)."""
+        return self._movimientos_residencias(
+            wizard, residencia, incluir_creditos_sueltos=incluir_creditos_sueltos,
+        )[residencia.id]
+
+    def _movimientos_residencias(self, wizard, residencias, incluir_creditos_sueltos=False):
+        """Arma el libro de movimientos (cargos y pagos reales) de cada una de
+        `residencias`, ordenados cronológicamente (fecha y, dentro del mismo día, por
+        hora real de creación), con saldo acumulado, para poder ver todo el historial
+        aunque el saldo final sea cero. Devuelve {residencia_id: entradas}.
+
+        Las líneas de cobro mensual, la deuda migrada y los pagos conciliados se leen
+        una sola vez para todas las residencias (un número fijo de consultas, sin
+        importar cuántas sean) y los libros se arman en memoria. Los créditos sin
+        aplicar del cliente, si se piden, van en el libro de la primera residencia."""
+        Move = self.env["account.move"]
+        moves_por_residencia = {residencia.id: Move for residencia in residencias}
+        entradas_por_residencia = {residencia.id: [] for residencia in residencias}
+
+        for line in self._cobro_lines_residencias(wizard, residencias):
             move = line.move_id
-            entradas.append(self._movimiento_cargo(move, residencia, line.cliente_id))
-            moves_incluidos |= move
+            entradas_por_residencia[line.residencia_id.id].append(
+                self._movimiento_cargo(move, line.residencia_id, line.cliente_id)
+            )
+            moves_por_residencia[line.residencia_id.id] |= move
 
         # Solo facturas reales (no notas de crédito): una nota de crédito no es un
         # cargo nuevo, es un abono/reversión que ya aparece como "Pago" al conciliarse
-        # contra la factura que afecta (más abajo, vía _movimientos_pago).
+        # contra la factura que afecta (más abajo, vía _pagos_aplicados_por_move).
         domain_migradas = [
-            ("residencia_id", "=", residencia.id),
+            ("residencia_id", "in", residencias.ids),
             ("state", "=", "posted"),
             ("move_type", "=", "out_invoice"),
-            ("id", "not in", moves_incluidos.ids),
         ]
-        if wizard.solo_residente_actual and wizard.cliente_id:
-            domain_migradas.append(("partner_id", "=", wizard.cliente_id.id))
-        moves_migrados = self.env["account.move"].search(domain_migradas, order="invoice_date, id")
-        for move in moves_migrados:
-            entradas.append(self._movimiento_cargo(move, residencia, move.partner_id))
-            moves_incluidos |= move
+        for move in Move.search(domain_migradas, order="invoice_date, id"):
+            residencia = move.residencia_id
+            if move in moves_por_residencia[residencia.id]:
+                continue
+            if not self._es_del_residente(wizard, residencia, move.partner_id):
+                continue
+            entradas_por_residencia[residencia.id].append(
+                self._movimiento_cargo(move, residencia, move.partner_id)
+            )
+            moves_por_residencia[residencia.id] |= move
 
-        for move in moves_incluidos:
-            entradas += self._movimientos_pago(move, residencia)
+        todos_los_moves = Move.union(*moves_por_residencia.values())
+        pagos_por_move = self._pagos_aplicados_por_move(todos_los_moves)
+        tiene_convenio = self._payment_tiene_convenio()
+        for residencia in residencias:
+            entradas = entradas_por_residencia[residencia.id]
+            for move in moves_por_residencia[residencia.id]:
+                entradas += [
+                    self._movimiento_pago(move, residencia, aml, monto, tiene_convenio)
+                    for aml, monto in pagos_por_move[move.id]
+                ]
 
-        if incluir_creditos_sueltos:
-            entradas += self._movimientos_credito_sin_aplicar(wizard, residencia)
+        if incluir_creditos_sueltos and residencias:
+            primera = residencias[0]
+            entradas_por_residencia[primera.id] += self._movimientos_credito_sin_aplicar(wizard, primera)
 
-        entradas.sort(key=lambda e: (e["date"] or fields.Date.today(), e["datetime"] or fields.Datetime.now()))
+        for entradas in entradas_por_residencia.values():
+            self._acumular_saldos(entradas)
 
+        return entradas_por_residencia
+
+    def _acumular_saldos(self, entradas):
+        """Ordena `entradas` cronológicamente y les pone el saldo acumulado."""
+        entradas.sort(key=lambda e: (e["date"] or fields.Date.today(), e["datetime"] or fields.Datetime.now()))
         saldo = 0.0
         for entrada in entradas:
             saldo += entrada["debe"] - entrada["haber"]
             entrada["saldo_acumulado"] = saldo
 
-        return entradas
+    def _es_del_residente(self, opciones, residencia, cliente):
+        """Con "solo movimientos del residente actual", si un movimiento de
+        `residencia` a nombre de `cliente` corresponde a su residente actual."""
+        return not (opciones.solo_residente_actual and residencia.cliente_id) or cliente == residencia.cliente_id
+
+    def _cobro_lines_residencias(self, opciones, residencias):
+        """Líneas de cobro mensual (cargos posteados) de `residencias`, según las
+        opciones de `opciones`: el wizard de consulta o un estado de cuenta masivo
+        (ambos tienen `solo_residente_actual` y `excluir_cargos_mes_actual`). El
+        filtro de residente actual se aplica por residencia, así una sola lectura
+        sirve para residencias de residentes distintos."""
+        domain = [
+            ("residencia_id", "in", residencias.ids),
+            ("cobro_id.state", "=", "posted"),
+            ("move_id", "!=", False),
+            # El estado del cobro mensual (el mes completo) no se sincroniza
+            # automáticamente si alguien resetea a borrador o cancela una factura
+            # individual desde Contabilidad, así que se revisa también el estado
+            # real de la factura de esta línea, no solo el del cobro.
+            ("move_id.state", "=", "posted"),
+        ]
+        if opciones.excluir_cargos_mes_actual:
+            hoy = fields.Date.context_today(opciones)
+            domain += [
+                "|",
+                ("month", "!=", str(hoy.month).zfill(2)),
+                ("year", "!=", hoy.year),
+            ]
+
+        lines = self.env["asovec.proyecto_cobro_mensual_line"].search(domain, order="year, month, id")
+        return lines.filtered(lambda l: self._es_del_residente(opciones, l.residencia_id, l.cliente_id))
 
     @api.model
-    def _build_estado_cuenta_data(self, wizard):
+    def _build_estado_cuenta_data(self, wizard, movimientos_por_residencia=None):
         """Arma el libro de movimientos y el resumen del estado de cuenta para el
         wizard. Se comparte entre el reporte HTML, el PDF y la exportación a Excel,
         para que los tres siempre muestren exactamente los mismos números y la misma
@@ -233,7 +327,12 @@ class ReportEstadoCuenta(models.AbstractModel):
         A diferencia de una vista de "un renglón por factura", esto explota cada
         cargo (Cargo Mensual o Deuda Migrada) y cada pago realmente conciliado contra
         él en movimientos separados con saldo acumulado, para poder revisar todo el
-        historial de un residente aunque su saldo final sea cero."""
+        historial de un residente aunque su saldo final sea cero.
+
+        `movimientos_por_residencia` es un libro ya armado con `_movimientos_residencias`
+        (sin créditos sueltos) que incluye las residencias del wizard: lo usa el
+        estado de cuenta masivo para leer una sola vez los movimientos de toda una
+        tanda de residentes."""
         wizard.ensure_one()
         residencias = wizard.residencia_ids
         periodo_activo = bool(wizard.filtrar_por_periodo and wizard.mes_periodo and wizard.anio_periodo)
@@ -243,8 +342,18 @@ class ReportEstadoCuenta(models.AbstractModel):
         movimientos = []
         saldo_inicial = 0.0
         saldo_final = 0.0
-        for index, residencia in enumerate(residencias):
-            entradas = self._movimientos_residencia(wizard, residencia, incluir_creditos_sueltos=(index == 0))
+        if movimientos_por_residencia is None:
+            entradas_por_residencia = self._movimientos_residencias(wizard, residencias, incluir_creditos_sueltos=True)
+        else:
+            entradas_por_residencia = {
+                residencia.id: list(movimientos_por_residencia[residencia.id]) for residencia in residencias
+            }
+            creditos = self._movimientos_credito_sin_aplicar(wizard, residencias[:1]) if residencias else []
+            if creditos:
+                entradas_por_residencia[residencias[0].id] += creditos
+                self._acumular_saldos(entradas_por_residencia[residencias[0].id])
+        for residencia in residencias:
+            entradas = entradas_por_residencia[residencia.id]
             s_inicial, entradas_mostradas, s_final = self._filtrar_por_periodo(
                 entradas, mes_filtro, anio_filtro
             )
@@ -302,14 +411,13 @@ class ReportEstadoCuenta(models.AbstractModel):
     def _get_report_values(self, docids, data=None):
         wizard = self.env["asovec.cobro_mensual_consulta_wizard"].browse(docids)
         wizard.ensure_one()
-        datos = self._build_estado_cuenta_data(wizard)
+        datos = self._build_estado_cuenta_data(
+            wizard, movimientos_por_residencia=(data or {}).get("movimientos_por_residencia"),
+        )
 
         company = self.env.company
-        logo_b64 = False
-        if company.logo:
-            resized = image_process(base64.b64decode(company.logo), size=(0, LOGO_MAX_HEIGHT))
-            if resized:
-                logo_b64 = base64.b64encode(resized).decode()
+        logo = company._aso_logo_miniatura(LOGO_MAX_HEIGHT)
+        logo_b64 = logo.decode() if logo else False
 
         return {
             "doc_ids": docids,
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo import api, models
+from odoo.tools.pdf import merge_pdf
+
+from .proceso_corte_servicio_report import CARTAS_POR_HOJA
+from .residencia_recibo_masivo_report import RECIBOS_POR_HOJA
+
+_logger = logging.getLogger(__name__)
+
+# Reportes masivos que se generan por tramos: report_name -> documentos por hoja.
+# Cada tramo lleva una cantidad de documentos múltiplo de los que entran en una hoja,
+# así ningún tramo deja una hoja a medio llenar en el medio del PDF final.
+REPORTES_POR_TRAMOS = {
+    "iit_asovec.report_recibo_residencia_mensual_masivo": RECIBOS_POR_HOJA,
+    "iit_asovec.report_corte_servicio_notificacion": CARTAS_POR_HOJA,
+}
+
+
+class IrActionsReport(models.Model):
+    _inherit = "ir.actions.report"
+
+    def _render_qweb_pdf(self, report_ref, res_ids=None, data=None):
+        report = self._get_report(report_ref)
+        docs_por_hoja = REPORTES_POR_TRAMOS.get(report.report_name)
+        if not docs_por_hoja or not res_ids or isinstance(res_ids, int):
+            return super()._render_qweb_pdf(report_ref, res_ids=res_ids, data=data)
+
+        company = self.env.company
+        tamanio = max(company.aso_pdf_hojas_por_tramo, 1) * docs_por_hoja
+        if len(res_ids) <= tamanio:
+            return super()._render_qweb_pdf(report_ref, res_ids=res_ids, data=data)
+
+        tramos = [res_ids[i:i + tamanio] for i in range(0, len(res_ids), tamanio)]
+        return merge_pdf(self._render_tramos(report.report_name, tramos, data, company.aso_pdf_procesos)), "pdf"
+
+    @api.model
+    def _render_tramos(self, report_name, tramos, data, procesos):
+        """PDF de cada tramo de `tramos`, en el mismo orden.
+
+        Cada tramo es una impresión independiente (QWeb + un wkhtmltopdf); con
+        `procesos` > 1 se generan en paralelo, cada hilo con su propio cursor, así los
+        wkhtmltopdf corren al mismo tiempo en lugar de uno solo con miles de hojas. Los
+        hilos solo ven lo ya confirmado en la base: las lecturas del recibo masivo y las
+        líneas del wizard de corte se guardaron en pedidos anteriores a la impresión."""
+        procesos = min(max(procesos, 1), len(tramos))
+        _logger.info(
+            "Reporte %s: %s documentos en %s tramos, %s en paralelo.",
+            report_name, sum(len(tramo) for tramo in tramos), len(tramos), procesos,
+        )
+        if procesos == 1 or self.env.registry.in_test_mode():
+            return [
+                self._render_qweb_pdf(report_name, res_ids=tramo, data=data)[0]
+                for tramo in tramos
+            ]
+
+        dbname = self.env.cr.dbname
+        uid, context, su = self.env.uid, dict(self.env.context), self.env.su
+        registry = self.env.registry
+
+        def render_tramo(tramo):
+            threading.current_thread().dbname = dbname
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context, su=su)
+                return env["ir.actions.report"]._render_qweb_pdf(report_name, res_ids=tramo, data=data)[0]
+
+        with ThreadPoolExecutor(max_workers=procesos) as pool:
+            return list(pool.map(render_tramo, tramos))
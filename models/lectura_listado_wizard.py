@@ -43,18 +43,9 @@ class LecturaListadoWizard(models.TransientModel):
         if not residencias:
             raise UserError(_("No hay residencias para ese proyecto."))
 
-        # Un solo query para los contadores de todas las residencias (con
-        # active_test=False para no perder el fallback a un contador inactivo).
-        Contador = self.env["asovec.contador"].with_context(active_test=False)
-        contadores = Contador.search([("residencia_id", "in", residencias.ids)])
-        contador_por_residencia = {}
-        for c in contadores.sorted(lambda c: (c.active, c.id), reverse=True):
-            # El primero que se ve por residencia es el preferido: activo y, si hay
-            # varios, el más reciente (mismo criterio que _get_contador_activo).
-            contador_por_residencia.setdefault(c.residencia_id.id, c)
-
-        contador_ids = list(contador_por_residencia.values())
-        contador_ids = list({c.id for c in contador_ids})
+        # Un solo query para los contadores de todas las residencias.
+        contador_por_residencia = residencias._get_contadores_activos()
+        contador_ids = list({c.id for c in contador_por_residencia.values() if c})
 
         Line = self.env["asovec.contador.lines"]
         mes_plano = str(int(self.mes))
@@ -1,8 +1,5 @@
 # -*- coding: utf-8 -*-
-import base64
-
 from odoo import models, api
-from odoo.tools import image_process
 
 LOGO_MAX_HEIGHT = 90
 
@@ -19,11 +16,7 @@ class ReportOrdenTrabajo(models.AbstractModel):
         for orden in ordenes:
             company = orden.company_id
             if company.id not in logos_cache:
-                if company.logo:
-                    resized = image_process(base64.b64decode(company.logo), size=(0, LOGO_MAX_HEIGHT))
-                    logos_cache[company.id] = base64.b64encode(resized) if resized else False
-                else:
-                    logos_cache[company.id] = False
+                logos_cache[company.id] = company._aso_logo_miniatura(LOGO_MAX_HEIGHT)
 
         return {
             "doc_ids": docids,
@@ -1,12 +1,10 @@
 # -*- coding: utf-8 -*-
 import base64
-import io
-
-import xlsxwriter
 
 from odoo import models, fields, api
 
 from .contador import MONTH_SELECTION
+from .xlsx_export import xlsx_en_memoria
 
 _INVALID_SHEET_CHARS = set('[]:*?/\\')
 
@@ -53,31 +51,49 @@ class ProcesoAnalisisMensualWizard(models.TransientModel):
         usados.add(limpio)
         return limpio
 
-    def _escribir_fila_resumen(self, worksheet, row, resumen, fmt_label, fmt_int, fmt_money):
-        filas = [
-            ("Residencias con cargo", resumen["cantidad_residencias"], fmt_int),
-            ("Total facturado", resumen["total_facturado"], fmt_money),
-            ("Total pagado", resumen["total_pagado"], fmt_money),
-            ("Saldo pendiente", resumen["total_saldo"], fmt_money),
-            ("Con lectura válida", resumen["lectura_valida"], fmt_int),
-            ("Sin lectura", resumen["sin_lectura"], fmt_int),
-            ("Inactivas", resumen["inactivo"], fmt_int),
+    def _filas_resumen(self, resumen, fmt_label, fmt_int, fmt_money):
+        """Celdas (etiqueta, formato, valor, formato) de la tabla de resumen."""
+        return [
+            ("Residencias con cargo", fmt_label, resumen["cantidad_residencias"], fmt_int),
+            ("Total facturado", fmt_label, resumen["total_facturado"], fmt_money),
+            ("Total pagado", fmt_label, resumen["total_pagado"], fmt_money),
+            ("Saldo pendiente", fmt_label, resumen["total_saldo"], fmt_money),
+            ("Con lectura válida", fmt_label, resumen["lectura_valida"], fmt_int),
+            ("Sin lectura", fmt_label, resumen["sin_lectura"], fmt_int),
+            ("Inactivas", fmt_label, resumen["inactivo"], fmt_int),
         ]
-        for label, value, fmt in filas:
-            worksheet.write(row, 0, label, fmt_label)
-            worksheet.write(row, 1, value, fmt)
-            row += 1
-        return row
+
+    def _filas_servicios(self, resumen, servicios_nombres, fmt_header, fmt_money):
+        """Celdas (etiqueta, formato, valor, formato) de la tabla de totales por
+        servicio, con su encabezado."""
+        return [("Servicio", fmt_header, "Monto", fmt_header)] + [
+            (nombre, None, resumen["por_servicio"].get(nombre, 0.0), fmt_money)
+            for nombre in servicios_nombres
+        ]
+
+    def _escribir_tablas(self, worksheet, row, *tablas):
+        """Escribe una o más tablas de 2 columnas lado a lado, dadas como (columna,
+        filas). Va fila por fila (todas las tablas a la vez) para que la hoja también
+        se pueda armar en modo constant_memory (ver xlsx_export). Devuelve la fila
+        siguiente a la tabla más larga."""
+        alto = max((len(filas) for _col, filas in tablas), default=0)
+        for i in range(alto):
+            for col, filas in tablas:
+                if i < len(filas):
+                    label, fmt_label, value, fmt_value = filas[i]
+                    worksheet.write(row + i, col, label, fmt_label)
+                    worksheet.write(row + i, col + 1, value, fmt_value)
+        return row + alto
+
+    def _escribir_fila_resumen(self, worksheet, row, resumen, fmt_label, fmt_int, fmt_money):
+        return self._escribir_tablas(
+            worksheet, row, (0, self._filas_resumen(resumen, fmt_label, fmt_int, fmt_money)),
+        )
 
     def _escribir_tabla_servicios(self, worksheet, row, resumen, servicios_nombres, fmt_header, fmt_money, col=0):
-        worksheet.write(row, col, "Servicio", fmt_header)
-        worksheet.write(row, col + 1, "Monto", fmt_header)
-        row += 1
-        for nombre in servicios_nombres:
-            worksheet.write(row, col, nombre)
-            worksheet.write(row, col + 1, resumen["por_servicio"].get(nombre, 0.0), fmt_money)
-            row += 1
-        return row
+        return self._escribir_tablas(
+            worksheet, row, (col, self._filas_servicios(resumen, servicios_nombres, fmt_header, fmt_money)),
+        )
 
     def _escribir_hoja_resumen(self, workbook, datos, formatos):
         worksheet = workbook.add_worksheet(self._sheet_name("Resumen General", set()))
@@ -152,17 +168,18 @@ class ProcesoAnalisisMensualWizard(models.TransientModel):
         # debajo del otro) para que el encabezado de la hoja no quede tan largo.
         row_titulos = 3
         worksheet.write(row_titulos, 0, "Resumen del proyecto", formatos["seccion"])
-        fin_resumen = self._escribir_fila_resumen(
-            worksheet, row_titulos + 1, proy_data["resumen"], formatos["label"], formatos["entero"], formatos["dinero"]
-        )
-
         worksheet.write(row_titulos, col_servicios, "Totales por servicio", formatos["seccion"])
-        fin_servicios = self._escribir_tabla_servicios(
-            worksheet, row_titulos + 1, proy_data["resumen"], servicios_nombres,
-            formatos["header"], formatos["dinero"], col=col_servicios,
+        fin_tablas = self._escribir_tablas(
+            worksheet, row_titulos + 1,
+            (0, self._filas_resumen(
+                proy_data["resumen"], formatos["label"], formatos["entero"], formatos["dinero"],
+            )),
+            (col_servicios, self._filas_servicios(
+                proy_data["resumen"], servicios_nombres, formatos["header"], formatos["dinero"],
+            )),
         )
 
-        row = max(fin_resumen, fin_servicios) + 1
+        row = fin_tablas + 1
         worksheet.write(row, 0, "Detalle de residencias", formatos["seccion"])
         row += 1
 
@@ -199,13 +216,12 @@ class ProcesoAnalisisMensualWizard(models.TransientModel):
 
         worksheet.freeze_panes(header_row + 1, 2)
 
-    def action_generar_excel(self):
+    def _escribir_excel(self, workbook):
+        """Llena `workbook` con el análisis mensual (hoja de resumen y una hoja por
+        proyecto) y devuelve el nombre de archivo."""
         self.ensure_one()
         datos = self.env["report.iit_asovec.report_analisis_mensual_document"]._build_analisis_data(self)
 
-        buffer = io.BytesIO()
-        workbook = xlsxwriter.Workbook(buffer, {"in_memory": True})
-
         formatos = {
             "titulo": workbook.add_format({"bold": True, "font_size": 14}),
             "subtitulo": workbook.add_format({"italic": True, "font_color": "#666666"}),
@@ -225,12 +241,13 @@ class ProcesoAnalisisMensualWizard(models.TransientModel):
             nombre_hoja = self._sheet_name(proy_data["proyecto"].name, nombres_usados)
             self._escribir_hoja_proyecto(workbook, proy_data, datos, nombre_hoja, formatos)
 
-        workbook.close()
-        buffer.seek(0)
+        return "Analisis_Mensual_%s_%s.xlsx" % (datos["mes_label"], self.anio)
 
-        filename = "Analisis_Mensual_%s_%s.xlsx" % (datos["mes_label"], self.anio)
+    def action_generar_excel(self):
+        self.ensure_one()
+        contenido, filename = xlsx_en_memoria(self._escribir_excel)
         self.write({
-            "file_data": base64.b64encode(buffer.read()),
+            "file_data": base64.b64encode(contenido),
             "file_name": filename,
         })
 
@@ -242,3 +259,13 @@ class ProcesoAnalisisMensualWizard(models.TransientModel):
             "target": "new",
             "context": self.env.context,
         }
+
+    def action_descargar_excel(self):
+        """Descarga el Excel en modo streaming (ver xlsx_export): se arma en el
+        controlador y no se guarda en el wizard."""
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_url",
+            "url": "/asovec/analisis_mensual/%s/xlsx" % self.id,
+            "target": "self",
+        }
@@ -1,8 +1,5 @@
 # -*- coding: utf-8 -*-
-import base64
-
 from odoo import models, fields, api
-from odoo.tools import image_process
 
 CARTAS_POR_HOJA = 2
 LOGO_MAX_HEIGHT = 140
@@ -21,11 +18,7 @@ class ReportCorteServicioNotificacion(models.AbstractModel):
             company = residencia.proyecto_aso_id.company_id or self.env.company
 
             if company.id not in logos_cache:
-                if company.logo:
-                    resized = image_process(base64.b64decode(company.logo), size=(0, LOGO_MAX_HEIGHT))
-                    logos_cache[company.id] = base64.b64encode(resized) if resized else False
-                else:
-                    logos_cache[company.id] = False
+                logos_cache[company.id] = company._aso_logo_miniatura(LOGO_MAX_HEIGHT)
 
             cartas.append({
                 "proyecto": linea.proyecto_aso_id,
@@ -1,14 +1,12 @@
 # -*- coding: utf-8 -*-
 import base64
-import io
 from datetime import date, timedelta
 
-import xlsxwriter
-
 from odoo import api, models, fields, _
 from odoo.exceptions import UserError
 
 from .contador import MONTH_SELECTION
+from .xlsx_export import xlsx_en_memoria
 
 _INVALID_FILENAME_CHARS = set('\\/:*?"<>|')
 
@@ -54,6 +52,12 @@ class ProcesoCorteServicioWizard(models.TransientModel):
         "asovec.proceso_corte_servicio_wizard_line", "wizard_id", string="Residencias",
     )
     line_count = fields.Integer(string="Residencias encontradas", compute="_compute_line_count")
+    atraso_actualizado = fields.Datetime(
+        string="Deuda actualizada al", readonly=True,
+        help="Último refresco de la antigüedad de deuda (asovec.residencia_atraso) con "
+             "el que se hizo la búsqueda: pagos conciliados después todavía no se "
+             "reflejan.",
+    )
 
     file_data = fields.Binary(string="Archivo Excel", readonly=True)
     file_name = fields.Char(string="Nombre de archivo", readonly=True)
@@ -92,21 +96,6 @@ class ProcesoCorteServicioWizard(models.TransientModel):
             "context": self.env.context,
         }
 
-    # -------------------------
-    # Deuda migrada (facturas sueltas, sin línea de cobro mensual)
-    # -------------------------
-    def _get_moves_migrados(self, residencias):
-        """Facturas de "Deuda Migrada" (cargadas con el proceso de Migración de Deuda):
-        no tienen asovec.proyecto_cobro_mensual_line (son facturas sueltas), así que no
-        las ve la búsqueda normal por línea. Mismo criterio que ya usa
-        proceso_estado_cuenta_csv_wizard._get_moves_migrados_por_residencia."""
-        return self.env["account.move"].search([
-            ("residencia_id", "in", residencias.ids),
-            ("state", "=", "posted"),
-            ("amount_residual", ">", 0),
-            ("invoice_line_ids.product_id.product_tmpl_id.tipo_servicio_aso_id.aso_migrado", "=", True),
-        ])
-
     # -------------------------
     # Buscar residencias atrasadas
     # -------------------------
@@ -127,51 +116,26 @@ class ProcesoCorteServicioWizard(models.TransientModel):
             return self._reload_form()
 
         anio_ref, mes_ref = int(self.anio), int(self.mes)
-        primer_dia_mes_ref = date(anio_ref, mes_ref, 1)
-        limite = primer_dia_mes_ref.strftime("%Y-%m-%d 00:00:00")
-
-        # Cargos normales (Cobros Mensuales): el mes se determina por create_date (la
-        # fecha real de creación del cargo en el sistema), no por su período contable.
-        lineas_cobro = self.env["asovec.proyecto_cobro_mensual_line"].search([
-            ("residencia_id", "in", residencias.ids),
-            ("move_id.state", "=", "posted"),
-            ("amount_balance", ">", 0),
-            ("create_date", "<", limite),
-        ])
-
-        # Deuda migrada: no tiene línea de cobro mensual, así que create_date no sirve
-        # para ubicarla en el mes correcto (todo un lote de migración se crea el mismo
-        # día, aunque represente meses distintos). Para esta sí se usa invoice_date, la
-        # fecha que se asignó manualmente a cada mes histórico al migrarlo.
-        moves_migrados = self._get_moves_migrados(residencias)
-        moves_migrados = moves_migrados.filtered(
-            lambda m: m.invoice_date and m.invoice_date < primer_dia_mes_ref
+
+        # La antigüedad de cada mes impago (cargos de cobro mensual por create_date,
+        # deuda migrada por invoice_date) ya está agregada por residencia y mes en
+        # asovec.residencia_atraso; aquí solo se filtra por el mes de referencia y los
+        # meses de atraso mínimos, todo en una consulta.
+        atrasos = self.env["asovec.residencia_atraso"]._atrasos(
+            residencias.ids,
+            antes_de=date(anio_ref, mes_ref, 1),
+            meses_minimos=self.meses_atraso,
+            mes_referencia=anio_ref * 12 + mes_ref,
         )
 
-        por_residencia = {}
-        for linea in lineas_cobro:
-            por_residencia.setdefault(linea.residencia_id.id, []).append(
-                (linea.create_date.year, linea.create_date.month, linea.amount_balance)
-            )
-        for move in moves_migrados:
-            por_residencia.setdefault(move.residencia_id.id, []).append(
-                (move.invoice_date.year, move.invoice_date.month, move.amount_residual)
-            )
+        self.atraso_actualizado = self.env["asovec.residencia_atraso"]._ultimo_refresco()
 
         meses_nombre = dict(MONTH_SELECTION)
         vals_list = []
-        for residencia_id, periodos_residencia in por_residencia.items():
-            periodos = sorted({(y, m) for (y, m, _monto) in periodos_residencia})
-            anio_mas_antiguo, mes_mas_antiguo = periodos[0]
-            atraso = (anio_ref * 12 + mes_ref) - (anio_mas_antiguo * 12 + mes_mas_antiguo)
-            if atraso < self.meses_atraso:
-                continue
-
-            monto_total = sum(monto for (_y, _m, monto) in periodos_residencia)
+        for residencia_id, atraso, monto_total, periodos in atrasos:
             meses_detalle = ", ".join(
-                "%s %s" % (meses_nombre.get(str(m), m), y) for (y, m) in periodos
+                "%s %s" % (meses_nombre.get(str(p.month), p.month), p.year) for p in periodos
             )
-
             vals_list.append({
                 "wizard_id": self.id,
                 "residencia_id": residencia_id,
@@ -199,14 +163,18 @@ class ProcesoCorteServicioWizard(models.TransientModel):
     # -------------------------
     # Excel (agrupado por proyecto)
     # -------------------------
-    def action_generar_excel(self):
-        self.ensure_one()
+    def _lineas_excel(self):
         lineas = self.line_ids.filtered("seleccionado")
         if not lineas:
             raise UserError(_("Seleccione al menos una residencia para generar el Excel."))
+        return lineas
+
+    def _escribir_excel(self, workbook):
+        """Llena `workbook` con las residencias seleccionadas (agrupadas por proyecto)
+        y devuelve el nombre de archivo."""
+        self.ensure_one()
+        lineas = self._lineas_excel()
 
-        buffer = io.BytesIO()
-        workbook = xlsxwriter.Workbook(buffer, {"in_memory": True})
         worksheet = workbook.add_worksheet("Cortes de Servicio")
 
         fmt_titulo = workbook.add_format({"bold": True, "font_size": 14})
@@ -254,18 +222,30 @@ class ProcesoCorteServicioWizard(models.TransientModel):
                 row += 1
             row += 1
 
-        workbook.close()
-        buffer.seek(0)
-
         nombre_proyecto = "".join(c for c in (proyecto_label or "Proyectos") if c not in _INVALID_FILENAME_CHARS)
-        filename = "Cortes_Servicio_%s.xlsx" % nombre_proyecto
+        return "Cortes_Servicio_%s.xlsx" % nombre_proyecto
+
+    def action_generar_excel(self):
+        self.ensure_one()
+        contenido, filename = xlsx_en_memoria(self._escribir_excel)
         self.write({
-            "file_data": base64.b64encode(buffer.read()),
+            "file_data": base64.b64encode(contenido),
             "file_name": filename,
         })
 
         return self._reload_form()
 
+    def action_descargar_excel(self):
+        """Descarga el Excel en modo streaming (ver xlsx_export): se arma en el
+        controlador y no se guarda en el wizard."""
+        self.ensure_one()
+        self._lineas_excel()
+        return {
+            "type": "ir.actions.act_url",
+            "url": "/asovec/corte_servicio/%s/xlsx" % self.id,
+            "target": "self",
+        }
+
     # -------------------------
     # PDF (cartas de aviso, 2 por hoja)
     # -------------------------
@@ -2,7 +2,6 @@
 import base64
 import csv
 import io
-from collections import defaultdict
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
@@ -54,80 +53,126 @@ class ProcesoEstadoCuentaCsvWizard(models.TransientModel):
     def _get_direccion(self, residencia):
         return residencia.direccion_real
 
-    def _get_moves_migrados_por_residencia(self):
-        """Facturas de deuda migrada (cargadas con 'Cargar Deudas/Facturas Anteriores'),
-        agrupadas por residencia (campo `residencia_id` del cargo). No están ligadas a
-        una residencia mediante proyecto_cobro_mensual_line (son facturas sueltas), así
-        que se usa ese campo directo en vez de agrupar por cliente: un mismo cliente
-        puede ser dueño de varias residencias, y agrupar por cliente mezclaba la deuda
-        de una residencia con la de otra."""
-        Move = self.env["account.move"]
-        moves = Move.search([
-            ("journal_id", "in", self.journal_ids.ids),
-            ("state", "=", "posted"),
-            ("invoice_line_ids.product_id.product_tmpl_id.tipo_servicio_aso_id.aso_migrado", "=", True),
+    def _saldos_por_residencia(self, residencias):
+        """{residencia_id: (saldo_mes, saldo_anterior)} de `residencias`, en una sola
+        consulta agregada:
+
+        - Cargos de cobro mensual (posteados, en los diarios elegidos, de cobros no
+          cancelados): del mes según el período del cobro, anteriores si el período es
+          menor.
+        - Facturas de deuda migrada (cargadas con 'Cargar Deudas/Facturas Anteriores'):
+          no tienen línea de cobro mensual (son facturas sueltas), así que se toman por
+          el campo `residencia_id` del cargo y no por cliente, porque un mismo cliente
+          puede ser dueño de varias residencias. Del mes si la fecha de factura es el
+          primer día del mes, anteriores si es menor.
+
+        El saldo de cada cargo sale de la cuenta corriente por residencia
+        (asovec.residencia_cuenta: cargo menos pagos aplicados). Igual que las
+        búsquedas del ORM a las que reemplaza, solo cuentan los productos no archivados
+        para reconocer la deuda migrada, y solo las residencias que devuelve la
+        búsqueda de `_build_rows`. Residencias sin saldo no aparecen en el resultado."""
+        self.ensure_one()
+        self.env["asovec.proyecto_cobro_mensual_line"].flush_model()
+        self.env["asovec.proyecto_cobro_mensual"].flush_model(["state"])
+        self.env["account.move"].flush_model([
+            "journal_id", "state", "residencia_id", "invoice_date",
         ])
-        por_residencia = defaultdict(lambda: Move)
-        for move in moves:
-            if move.residencia_id:
-                por_residencia[move.residencia_id.id] |= move
-        return por_residencia
+        self.env["account.move.line"].flush_model(["move_id", "product_id", "display_type"])
+        self.env["product.product"].flush_model(["active", "product_tmpl_id"])
+        self.env["product.template"].flush_model(["active", "tipo_servicio_aso_id"])
+        self.env["asovec.residencia_cuenta"].flush_model()
+
+        if not residencias:
+            return {}
+        mes_int = int(self.mes)
+        params = {
+            "residencia_ids": tuple(residencias.ids),
+            "journal_ids": tuple(self.journal_ids.ids),
+            "anio": self.anio,
+            "mes": mes_int,
+            "fecha_mes": fields.Date.from_string("%s-%02d-01" % (self.anio, mes_int)),
+        }
+        self.env.cr.execute("""
+            WITH pendiente AS (
+                SELECT move_id, SUM(debe - haber) AS saldo
+                  FROM asovec_residencia_cuenta
+                 WHERE residencia_id IN %(residencia_ids)s
+              GROUP BY move_id
+            ), saldos AS (
+                SELECT l.residencia_id,
+                       CASE WHEN c.year = %(anio)s AND c.month::int = %(mes)s
+                            THEN p.saldo ELSE 0 END AS saldo_mes,
+                       CASE WHEN (c.year, c.month::int) < (%(anio)s, %(mes)s)
+                            THEN p.saldo ELSE 0 END AS saldo_anterior
+                  FROM asovec_proyecto_cobro_mensual_line l
+                  JOIN asovec_proyecto_cobro_mensual c ON c.id = l.cobro_id
+                  JOIN account_move m ON m.id = l.move_id
+                  JOIN pendiente p ON p.move_id = m.id
+                 WHERE l.residencia_id IN %(residencia_ids)s
+                   AND m.journal_id IN %(journal_ids)s
+                   AND m.state = 'posted'
+                   AND c.state != 'cancel'
+                UNION ALL
+                SELECT m.residencia_id,
+                       CASE WHEN m.invoice_date = %(fecha_mes)s
+                            THEN p.saldo ELSE 0 END,
+                       CASE WHEN m.invoice_date < %(fecha_mes)s
+                            THEN p.saldo ELSE 0 END
+                  FROM account_move m
+                  JOIN pendiente p ON p.move_id = m.id
+                 WHERE m.residencia_id IN %(residencia_ids)s
+                   AND m.journal_id IN %(journal_ids)s
+                   AND m.state = 'posted'
+                   AND EXISTS (
+                        SELECT 1
+                          FROM account_move_line aml
+                          JOIN product_product pp ON pp.id = aml.product_id
+                          JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                          JOIN asovec_tipo_servicio_aso t ON t.id = pt.tipo_servicio_aso_id
+                         WHERE aml.move_id = m.id
+                           AND aml.display_type IN ('product', 'line_section', 'line_note')
+                           AND pp.active IS TRUE
+                           AND pt.active IS TRUE
+                           AND t.aso_migrado IS TRUE
+                   )
+            )
+            SELECT residencia_id, SUM(saldo_mes), SUM(saldo_anterior)
+              FROM saldos
+          GROUP BY residencia_id
+        """, params)
+        return {
+            residencia_id: (float(saldo_mes or 0.0), float(saldo_anterior or 0.0))
+            for residencia_id, saldo_mes, saldo_anterior in self.env.cr.fetchall()
+        }
 
     def _build_rows(self):
+        """Genera las filas del archivo, una por residencia (ordenadas por proyecto y
+        nombre), a partir de los saldos ya agregados de `_saldos_por_residencia`."""
         self.ensure_one()
         if not self.journal_ids:
             raise UserError(_("Debes seleccionar al menos un Diario."))
 
-        mes_padded = str(self.mes).zfill(2)
-        mes_int = int(self.mes)
-        fecha_mes = fields.Date.from_string("%s-%02d-01" % (self.anio, mes_int))
-
-        CobroLine = self.env["asovec.proyecto_cobro_mensual_line"]
         residencias = self.env["asovec.residencia"].search([], order="proyecto_aso_id, name")
-        migradas_por_residencia = self._get_moves_migrados_por_residencia()
-
-        rows = []
+        saldos = self._saldos_por_residencia(residencias)
         for residencia in residencias:
-            lineas = CobroLine.search([
-                ("residencia_id", "=", residencia.id),
-                ("move_id.journal_id", "in", self.journal_ids.ids),
-                ("move_id.state", "=", "posted"),
-                ("cobro_id.state", "!=", "cancel"),
-            ])
-
-            del_mes = lineas.filtered(lambda l: l.month == mes_padded and l.year == self.anio)
-            anteriores = lineas.filtered(lambda l: (l.year, int(l.month)) < (self.anio, mes_int))
-
-            saldo_mes = sum(del_mes.mapped("amount_residual"))
-            saldo_anterior = sum(anteriores.mapped("amount_residual"))
-
-            moves_migrados = migradas_por_residencia.get(residencia.id)
-            if moves_migrados:
-                del_mes_migrado = moves_migrados.filtered(lambda m: m.invoice_date == fecha_mes)
-                anteriores_migrado = moves_migrados.filtered(lambda m: m.invoice_date and m.invoice_date < fecha_mes)
-                saldo_mes += sum(del_mes_migrado.mapped("amount_residual"))
-                saldo_anterior += sum(anteriores_migrado.mapped("amount_residual"))
-
-            rows.append([
+            saldo_mes, saldo_anterior = saldos.get(residencia.id, (0.0, 0.0))
+            yield [
                 residencia.name,
                 residencia.cliente_id.name or "",
                 self._get_direccion(residencia),
                 _format_monto(saldo_mes),
                 _format_monto(saldo_anterior),
                 "0",
-            ])
-
-        return rows
+            ]
 
     def action_generar(self):
         self.ensure_one()
 
-        rows = self._build_rows()
-
         buffer = io.StringIO()
         writer = csv.writer(buffer, delimiter=",", lineterminator="\r\n")
-        for row in rows:
-            writer.writerow([str(v).replace(",", " ") for v in row])
+        writer.writerows(
+            [str(v).replace(",", " ") for v in row] for row in self._build_rows()
+        )
 
         csv_bytes = buffer.getvalue().encode("cp1252", errors="replace")
 
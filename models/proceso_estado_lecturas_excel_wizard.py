@@ -1,13 +1,11 @@
 # -*- coding: utf-8 -*-
 import base64
-import io
-
-import xlsxwriter
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
 from .contador import MONTH_SELECTION
+from .xlsx_export import xlsx_en_memoria
 
 ALCANCE_A_ESTADO = {
     "con_lectura": "Lectura Valida",
@@ -121,9 +119,7 @@ class ProcesoEstadoLecturasExcelWizard(models.TransientModel):
 
         return rows
 
-    def _build_workbook(self, rows, proyecto_label):
-        buffer = io.BytesIO()
-        workbook = xlsxwriter.Workbook(buffer, {"in_memory": True})
+    def _build_workbook(self, workbook, rows, proyecto_label):
         sheet = workbook.add_worksheet("Estado de Lecturas")
 
         title_fmt = workbook.add_format({"bold": True, "font_size": 12})
@@ -172,28 +168,37 @@ class ProcesoEstadoLecturasExcelWizard(models.TransientModel):
         for col, width in enumerate(column_widths):
             sheet.set_column(col, col, width)
 
-        workbook.close()
-        buffer.seek(0)
-        return buffer.read()
-
-    def action_generar(self):
-        self.ensure_one()
-
+    def _validar_alcance(self):
         if not self.todos_los_proyectos and not self.proyecto_aso_id:
             raise UserError(_("Selecciona un proyecto, o marca 'Todos los proyectos'."))
 
+    def _rows_validadas(self):
+        self._validar_alcance()
+
         rows = self._build_rows()
         if not rows:
             raise UserError(_("No hay residencias para ese alcance seleccionado."))
+        return rows
+
+    def _escribir_excel(self, workbook):
+        """Llena `workbook` con el estado de lecturas del alcance elegido y devuelve
+        el nombre de archivo."""
+        self.ensure_one()
+        rows = self._rows_validadas()
 
         proyecto_label = "Todos" if self.todos_los_proyectos else self.proyecto_aso_id.name
-        xlsx_bytes = self._build_workbook(rows, proyecto_label)
+        self._build_workbook(workbook, rows, proyecto_label)
 
         mes_label = dict(MONTH_SELECTION).get(self.mes, self.mes)
         nombre_archivo_proyecto = proyecto_label.replace(" ", "_")
+        return "Estado_Lecturas_%s_%s_%s.xlsx" % (nombre_archivo_proyecto, mes_label, self.anio)
+
+    def action_generar(self):
+        self.ensure_one()
+        contenido, filename = xlsx_en_memoria(self._escribir_excel)
         self.write({
-            "file_data": base64.b64encode(xlsx_bytes),
-            "file_name": "Estado_Lecturas_%s_%s_%s.xlsx" % (nombre_archivo_proyecto, mes_label, self.anio),
+            "file_data": base64.b64encode(contenido),
+            "file_name": filename,
         })
 
         return {
@@ -204,3 +209,14 @@ class ProcesoEstadoLecturasExcelWizard(models.TransientModel):
             "target": "new",
             "context": self.env.context,
         }
+
+    def action_descargar_excel(self):
+        """Descarga el Excel en modo streaming (ver xlsx_export): se arma en el
+        controlador y no se guarda en el wizard."""
+        self.ensure_one()
+        self._validar_alcance()
+        return {
+            "type": "ir.actions.act_url",
+            "url": "/asovec/estado_lecturas/%s/xlsx" % self.id,
+            "target": "self",
+        }
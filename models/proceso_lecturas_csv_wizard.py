@@ -130,9 +130,11 @@ class ProcesoLecturasCsvWizard(models.TransientModel):
         buffer = io.StringIO()
         writer = csv.writer(buffer, delimiter=";")
         writer.writerow(Line._csv_header(servicios))
+        contadores = residencias._get_contadores_activos()
         for residencia, lectura, move, con_lectura, amount_total, move_state, payment_state in rows:
             writer.writerow(Line._csv_row(
                 residencia, lectura, move, con_lectura, amount_total, move_state, payment_state, servicios,
+                contadores.get(residencia.id),
             ))
 
         csv_data = ("﻿" + buffer.getvalue()).encode("utf-8")
@@ -30,11 +30,7 @@ class ProcesoReciboMasivoWizard(models.TransientModel):
             ("proyecto_aso_id", "=", self.proyecto_aso_id.id),
         ], order="name")
 
-        contadores = self.env["asovec.contador"]
-        for residencia in residencias:
-            contador = residencia._get_contador_activo()
-            if contador:
-                contadores |= contador
+        contadores = self.env["asovec.contador"].union(*residencias._get_contadores_activos().values())
 
         if not contadores:
             raise UserError(_("Ninguna residencia de este proyecto tiene un contador activo."))
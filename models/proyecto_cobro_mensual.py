@@ -6,8 +6,13 @@ import io
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 from .account_move import CTX_SKIP_CARGO_AUTOMATICO_CHECK
+from .batch_run import MedicionLote
 from .contador import mes_anio_anterior
 
+# Clave en `cr.precommit.data` con los ids de cobros cuyos indicadores hay que
+# recalcular antes del commit (ver `_programar_indicadores`).
+_INDICADORES_PENDIENTES = "asovec.proyecto_cobro_mensual.indicadores"
+
 
 class ProyectoCobroMensual(models.Model):
     _name = "asovec.proyecto_cobro_mensual"
@@ -116,21 +121,28 @@ class ProyectoCobroMensual(models.Model):
     # --------------------
     # Indicadores de avance (encabezado)
     # --------------------
-    total_residencias = fields.Integer(string="Total residencias", compute="_compute_indicadores")
-    residencias_con_lectura = fields.Integer(string="Con lectura", compute="_compute_indicadores")
-    pct_con_lectura = fields.Float(string="% Con lectura", compute="_compute_indicadores")
-    residencias_sin_lectura = fields.Integer(string="Sin lectura", compute="_compute_residencias_sin_lectura")
-    pct_sin_lectura = fields.Float(string="% Sin lectura", compute="_compute_residencias_sin_lectura")
-    residencias_inactivas = fields.Integer(string="Inactivas", compute="_compute_indicadores")
-    pct_inactivas = fields.Float(string="% Inactivas", compute="_compute_indicadores")
-    residencias_cargo_generado = fields.Integer(string="Cargos generados", compute="_compute_indicadores")
-    pct_cargo_generado = fields.Float(string="% Cargos generados", compute="_compute_indicadores")
+    # Guardados (no computados al vuelo): calcularlos en cada lectura del formulario y
+    # en cada fila de la lista costaba O(cobros x residencias). Se mantienen con
+    # `_recalcular_indicadores`, que se programa (`_programar_indicadores`) solo para
+    # los cobros afectados cuando cambia una línea de cobro, la cancelación de un
+    # cargo o los flags de una residencia (ver los create/write/unlink de esos
+    # modelos) y corre una sola vez al cerrar la transacción, más la acción de
+    # mantenimiento "Recalcular indicadores" por si algo quedara desfasado.
+    total_residencias = fields.Integer(string="Total residencias", readonly=True)
+    residencias_con_lectura = fields.Integer(string="Con lectura", readonly=True)
+    pct_con_lectura = fields.Float(string="% Con lectura", readonly=True)
+    residencias_sin_lectura = fields.Integer(string="Sin lectura", readonly=True)
+    pct_sin_lectura = fields.Float(string="% Sin lectura", readonly=True)
+    residencias_inactivas = fields.Integer(string="Inactivas", readonly=True)
+    pct_inactivas = fields.Float(string="% Inactivas", readonly=True)
+    residencias_cargo_generado = fields.Integer(string="Cargos generados", readonly=True)
+    pct_cargo_generado = fields.Float(string="% Cargos generados", readonly=True)
     # Distinto de "residencias_cargo_generado" (que exige un move_id real): una
     # residencia con lectura pero sin nada que cobrar ese mes (p. ej. proyecto que
     # solo cobra cuando hay exceso, y no hubo) también queda "resuelta" sin factura.
     # Usa el mismo criterio que "Completar Faltantes" (_residencias_pendientes_generar)
     # para no duplicar la definición de qué falta.
-    residencias_pendientes = fields.Integer(string="Pendientes por generar", compute="_compute_indicadores")
+    residencias_pendientes = fields.Integer(string="Pendientes por generar", readonly=True)
 
     # Uso interno de "Regenerar Cargos": recuerda hasta qué residencia (por id) ya se
     # regeneró en la tanda en curso, para que el siguiente click continúe justo donde
@@ -139,6 +151,22 @@ class ProyectoCobroMensual(models.Model):
     # normal -devuelve vacío siempre-, así que -1 es el valor real de "sin cursor").
     regenerar_cargos_cursor = fields.Integer(string="Cursor de regeneración", default=-1)
 
+    # --------------------
+    # Generación / confirmación en segundo plano (ver asovec.proyecto_cobro_mensual_job)
+    # --------------------
+    generacion_job_ids = fields.One2many(
+        comodel_name="asovec.proyecto_cobro_mensual_job",
+        inverse_name="cobro_id",
+        string="Procesos en segundo plano",
+        copy=False,
+    )
+    generacion_job_id = fields.Many2one(
+        comodel_name="asovec.proyecto_cobro_mensual_job",
+        string="Último proceso en segundo plano",
+        compute="_compute_generacion_job",
+    )
+    generacion_en_curso = fields.Boolean(string="Proceso en segundo plano en curso", compute="_compute_generacion_job")
+
     # --------------------
     # Leyenda de progreso (para el botón Confirmar): la operación se considera
     # completa cuando ya no queda ninguna residencia pendiente por generar.
@@ -163,6 +191,13 @@ class ProyectoCobroMensual(models.Model):
                 rec.progreso_label = _("Total de Residencias con información, puedes confirmar")
                 rec.progreso_tipo = "success"
 
+    @api.depends("generacion_job_ids.state")
+    def _compute_generacion_job(self):
+        for rec in self:
+            job = rec.generacion_job_ids.sorted("id", reverse=True)[:1]
+            rec.generacion_job_id = job
+            rec.generacion_en_curso = job.state in ("pendiente", "en_proceso")
+
     def init(self):
         # Índice único parcial: solo cuando state != 'cancel'
         self._cr.execute("""
@@ -215,52 +250,117 @@ class ProyectoCobroMensual(models.Model):
         lines = self.line_ids.filtered(lambda l: l.con_lectura == "Lectura Valida")
         return lines.mapped("residencia_id")
 
-    @api.depends(
-        "proyecto_aso_id", "line_ids.con_lectura", "line_ids.move_id",
-        "line_ids.move_id.state", "line_ids.residencia_id",
-    )
-    def _compute_indicadores(self):
-        for rec in self:
-            residencias = rec._residencias_scope()
-            total = len(residencias)
-
-            inactivas = residencias.filtered(lambda r: not r.activo)
-            activas = residencias - inactivas
-
-            con_lectura = rec._residencias_con_lectura_ids() & activas
-
-            cargo_generado = rec.line_ids.filtered(lambda l: l.move_id).mapped("residencia_id") & residencias
-
-            rec.total_residencias = total
-            rec.residencias_con_lectura = len(con_lectura)
-            rec.residencias_inactivas = len(inactivas)
-            rec.residencias_cargo_generado = len(cargo_generado)
-            rec.residencias_pendientes = len(rec._residencias_pendientes_generar())
-
-            total_activas = len(activas)
-            rec.pct_con_lectura = (len(con_lectura) / total_activas) if total_activas else 0.0
-            rec.pct_inactivas = (len(inactivas) / total) if total else 0.0
-            rec.pct_cargo_generado = (len(cargo_generado) / total) if total else 0.0
-
-    @api.depends("state", "proyecto_aso_id", "line_ids.con_lectura", "line_ids.residencia_id")
-    def _compute_residencias_sin_lectura(self):
-        """Separado de _compute_indicadores a propósito: una vez posteado o
-        cancelado, 'sin lectura' ya no aporta nada (el ciclo quedó cerrado) y
-        calcularlo de todas formas sería costoso para una lista con muchos cobros
-        mensuales (columna "Lecturas pendientes"). Por eso corta ANTES de tocar
-        residencias en vez de solo poner el resultado en cero al final."""
+    def _recalcular_indicadores(self):
+        """Recalcula y guarda los indicadores de avance de estos cobros con una sola
+        consulta agregada por cobro (residencias del proyecto x líneas de este cobro),
+        con los mismos criterios que `_residencias_scope`, `_residencias_con_lectura_ids`
+        y `_residencias_pendientes_generar`. Solo escribe si algo cambió."""
+        if not self:
+            return
+        self.env["asovec.residencia"].flush_model(["proyecto_aso_id", "no_paga_servicios", "activo"])
+        self.env["asovec.proyecto_cobro_mensual_line"].flush_model(
+            ["cobro_id", "residencia_id", "con_lectura", "move_id"]
+        )
+        self.env["account.move"].flush_model(["state"])
+        self.flush_model(["proyecto_aso_id", "state"])
+
         for rec in self:
-            if rec.state != "draft":
-                rec.residencias_sin_lectura = 0
-                rec.pct_sin_lectura = 0.0
-                continue
-            residencias = rec._residencias_scope()
-            activas = residencias.filtered(lambda r: r.activo)
-            con_lectura = rec._residencias_con_lectura_ids() & activas
-            sin_lectura = activas - con_lectura
-            rec.residencias_sin_lectura = len(sin_lectura)
-            total_activas = len(activas)
-            rec.pct_sin_lectura = (len(sin_lectura) / total_activas) if total_activas else 0.0
+            total = inactivas = con_lectura = cargo_generado = pendientes = 0
+            if rec.proyecto_aso_id:
+                self.env.cr.execute("""
+                    SELECT r.activo,
+                           BOOL_OR(l.con_lectura = 'Lectura Valida') AS con_lectura,
+                           BOOL_OR(l.move_id IS NOT NULL) AS con_cargo,
+                           COUNT(l.id) = 0
+                               OR BOOL_OR(COALESCE(m.state = 'cancel', FALSE)) AS pendiente
+                      FROM asovec_residencia r
+                 LEFT JOIN asovec_proyecto_cobro_mensual_line l
+                        ON l.residencia_id = r.id AND l.cobro_id = %s
+                 LEFT JOIN account_move m ON m.id = l.move_id
+                     WHERE r.proyecto_aso_id = %s
+                       AND r.no_paga_servicios IS NOT TRUE
+                  GROUP BY r.id, r.activo
+                """, (rec.id, rec.proyecto_aso_id.id))
+                for activo, tiene_lectura, con_cargo, pendiente in self.env.cr.fetchall():
+                    total += 1
+                    if not activo:
+                        inactivas += 1
+                    elif tiene_lectura:
+                        con_lectura += 1
+                    if con_cargo:
+                        cargo_generado += 1
+                    if pendiente:
+                        pendientes += 1
+
+            activas = total - inactivas
+            # Una vez posteado o cancelado, 'sin lectura' ya no aporta nada (el ciclo
+            # quedó cerrado): se deja en cero, como antes.
+            sin_lectura = activas - con_lectura if rec.state == "draft" else 0
+            vals = {
+                "total_residencias": total,
+                "residencias_con_lectura": con_lectura,
+                "residencias_inactivas": inactivas,
+                "residencias_cargo_generado": cargo_generado,
+                "residencias_pendientes": pendientes,
+                "residencias_sin_lectura": sin_lectura,
+                "pct_con_lectura": (con_lectura / activas) if activas else 0.0,
+                "pct_sin_lectura": (sin_lectura / activas) if activas else 0.0,
+                "pct_inactivas": (inactivas / total) if total else 0.0,
+                "pct_cargo_generado": (cargo_generado / total) if total else 0.0,
+            }
+            cambios = {k: v for k, v in vals.items() if rec[k] != v}
+            if cambios:
+                rec.write(cambios)
+
+    def _programar_indicadores(self):
+        """Deja estos cobros marcados para recalcular sus indicadores una sola vez,
+        antes del commit de la transacción, en lugar de en cada create/write/unlink:
+        generar o confirmar una tanda toca cientos de líneas y cargos del mismo cobro
+        y cada recálculo es una consulta agregada sobre todo el proyecto."""
+        if not self:
+            return
+        pendientes = self.env.cr.precommit.data.setdefault(_INDICADORES_PENDIENTES, set())
+        if not pendientes:
+            self.env.cr.precommit.add(self.sudo()._recalcular_indicadores_programados)
+        pendientes.update(self.ids)
+
+    def _recalcular_indicadores_programados(self):
+        cobro_ids = self.env.cr.precommit.data.pop(_INDICADORES_PENDIENTES, set())
+        self.browse(cobro_ids).exists()._recalcular_indicadores()
+        # Corre dentro del flush previo al commit: lo escrito aquí no se volvería a
+        # enviar a la base por sí solo.
+        self.env.flush_all()
+
+    @api.model
+    def _recalcular_indicadores_proyectos(self, proyecto_ids):
+        """Programa el recálculo de los indicadores de los cobros en Borrador de esos
+        proyectos (los únicos cuyo avance sigue moviéndose; un cobro cerrado conserva
+        la foto del momento en que se confirmó)."""
+        proyecto_ids = [pid for pid in proyecto_ids if pid]
+        if proyecto_ids:
+            self.search([
+                ("proyecto_aso_id", "in", proyecto_ids),
+                ("state", "=", "draft"),
+            ])._programar_indicadores()
+
+    def action_recalcular_indicadores(self):
+        """Mantenimiento: recalcula los indicadores guardados de los cobros
+        seleccionados (o de todos, si se llama sin registros)."""
+        cobros = self or self.search([])
+        cobros._recalcular_indicadores()
+        return True
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._recalcular_indicadores()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if any(k in vals for k in ("proyecto_aso_id", "state")):
+            self._recalcular_indicadores()
+        return res
 
     def _action_ver_residencias(self, residencias, nombre):
         return {
@@ -306,6 +406,7 @@ class ProyectoCobroMensual(models.Model):
         """Vuelve a abrir este mismo registro (recalcula indicadores y estados de las
         líneas) sin recargar toda la página del navegador."""
         self.ensure_one()
+        self._recalcular_indicadores()
         return self._reabrir_form_action()
 
     def action_exportar_csv(self):
@@ -341,9 +442,11 @@ class ProyectoCobroMensual(models.Model):
         buffer = io.StringIO()
         writer = csv.writer(buffer, delimiter=";")
         writer.writerow(Line._csv_header(servicios))
+        contadores = residencias._get_contadores_activos()
         for residencia, lectura, move, con_lectura, amount_total, move_state, payment_state in rows:
             writer.writerow(Line._csv_row(
                 residencia, lectura, move, con_lectura, amount_total, move_state, payment_state, servicios,
+                contadores.get(residencia.id),
             ))
 
         csv_data = ("﻿" + buffer.getvalue()).encode("utf-8")
@@ -433,16 +536,80 @@ class ProyectoCobroMensual(models.Model):
         )
         return detalle[:1].cuenta_contable_id
 
-    def _build_invoice_lines_residencia(self, residencia, servicios, lectura, productos_especiales=None):
+    def _indices_precios(self, residencias, servicios, productos_especiales):
+        """Carga de una sola vez, para todas las `residencias`, la configuración de precios
+        que usa `_build_invoice_lines_residencia`:
+
+        - "especiales": {(residencia_id, product_tmpl_id): precio} con los servicios
+          especiales por residencia (asovec.residencia.lines).
+        - "detalles": {(tipo_servicio_aso_id, proyecto_aso_id): detalle} con el precio/
+          cuenta por proyecto (asovec.tipo_servicio_aso.proyecto) de los servicios
+          automáticos y de los productos de agua base/exceso/inactivo.
+
+        Así el armado de líneas ya no hace una búsqueda por residencia y servicio, ni
+        vuelve a filtrar `proyecto_ids` en Python en cada vuelta."""
+        especiales = {}
+        if residencias and servicios:
+            overrides = self.env["asovec.residencia.lines"].search([
+                ("residencia_id", "in", residencias.ids),
+                ("producto_id", "in", servicios.ids),
+            ], order="id")
+            for o in overrides:
+                # Si por error hubiera más de un override del mismo servicio para la
+                # misma residencia, se respeta el primero creado.
+                especiales.setdefault((o.residencia_id.id, o.producto_id.id), o.precio)
+
+        tipos = servicios.mapped("tipo_servicio_aso_id")
+        for servicio in productos_especiales.values():
+            tipos |= servicio.tipo_servicio_aso_id
+        detalles = {}
+        proyectos = residencias.mapped("proyecto_aso_id")
+        if tipos and proyectos:
+            registros = self.env["asovec.tipo_servicio_aso.proyecto"].search([
+                ("tipo_servicio_aso_id", "in", tipos.ids),
+                ("proyecto_aso_id", "in", proyectos.ids),
+            ], order="id")
+            for d in registros:
+                detalles.setdefault((d.tipo_servicio_aso_id.id, d.proyecto_aso_id.id), d)
+
+        return {"especiales": especiales, "detalles": detalles}
+
+    def _build_invoice_lines_lote(self, residencias, servicios, lectura_por_residencia, productos_especiales=None,
+                                  indices=None):
+        """Versión por lote de `_build_invoice_lines_residencia`: devuelve
+        {residencia_id: (invoice_lines, con_lectura)} para todas las `residencias`,
+        cargando la configuración de precios una sola vez (`_indices_precios`)."""
+        productos_especiales = productos_especiales or self._get_productos_especiales()
+        if indices is None:
+            indices = self._indices_precios(residencias, servicios, productos_especiales)
+        return {
+            r.id: self._build_invoice_lines_residencia(
+                r, servicios, lectura_por_residencia.get(r.id),
+                productos_especiales=productos_especiales, indices=indices,
+            )
+            for r in residencias
+        }
+
+    def _build_invoice_lines_residencia(self, residencia, servicios, lectura, productos_especiales=None, indices=None):
         """Devuelve (invoice_lines, con_lectura) para una residencia, igual a la lógica
-        original de action_generate."""
-        ResidenciaLines = self.env["asovec.residencia.lines"]
+        original de action_generate. `indices` (ver `_indices_precios`) puede venir ya
+        cargado para todo un lote; si no, se carga solo para esta residencia."""
         productos_especiales = productos_especiales or self._get_productos_especiales()
 
-        invoice_lines = []
         # "Sin contador": solo debe generarse la cuota de contador inactivo, sin los
         # servicios automáticos (basura, mantenimiento, etc.).
         servicios = servicios if not residencia.sin_contador else self.env["product.template"]
+        if indices is None:
+            indices = self._indices_precios(residencia, servicios, productos_especiales)
+        especiales = indices["especiales"]
+        detalles = indices["detalles"]
+        proyecto_id = residencia.proyecto_aso_id.id
+
+        def cuenta_override(servicio):
+            detalle = detalles.get((servicio.tipo_servicio_aso_id.id, proyecto_id))
+            return detalle.cuenta_contable_id if detalle else False
+
+        invoice_lines = []
         for t in servicios:
             product = t.product_variant_id
             if not product:
@@ -452,20 +619,15 @@ class ProyectoCobroMensual(models.Model):
                 # Este tipo de servicio no se cobra para residencias inactivas.
                 continue
 
-            detalle_proyecto = t.tipo_servicio_aso_id.proyecto_ids.filtered(
-                lambda d: d.proyecto_aso_id.id == residencia.proyecto_aso_id.id
-            )
+            detalle_proyecto = detalles.get((t.tipo_servicio_aso_id.id, proyecto_id))
 
-            servicio_especial = ResidenciaLines.search([
-                ("residencia_id", "=", residencia.id), ("producto_id", "=", t.id)
-            ])
-            if servicio_especial:
-                precio = servicio_especial.precio
+            if (residencia.id, t.id) in especiales:
+                precio = especiales[(residencia.id, t.id)]
             else:
                 if not detalle_proyecto:
                     # No aplica a este proyecto: no hay precio configurado para él.
                     continue
-                precio = detalle_proyecto[0].precio
+                precio = detalle_proyecto.precio
 
             if precio > 0:
                 vals_line = {
@@ -475,7 +637,7 @@ class ProyectoCobroMensual(models.Model):
                     "price_unit": precio,
                     "tax_ids": [(6, 0, [])],   # sin impuestos
                 }
-                cuenta = detalle_proyecto[:1].cuenta_contable_id
+                cuenta = detalle_proyecto.cuenta_contable_id if detalle_proyecto else False
                 if cuenta:
                     vals_line["account_id"] = cuenta.id
                 invoice_lines.append((0, 0, vals_line))
@@ -491,7 +653,7 @@ class ProyectoCobroMensual(models.Model):
                 "price_unit": residencia.proyecto_aso_id.cobro_inactivas,
                 "tax_ids": [(6, 0, [])],   # sin impuestos
             }
-            cuenta = self._cuenta_override_tipo_servicio(servicio.tipo_servicio_aso_id, residencia.proyecto_aso_id)
+            cuenta = cuenta_override(servicio)
             if cuenta:
                 vals_line_inactivo["account_id"] = cuenta.id
             invoice_lines.append((0, 0, vals_line_inactivo))
@@ -519,7 +681,7 @@ class ProyectoCobroMensual(models.Model):
                 }
                 if lectura:
                     vals_line["contador_line_id"] = lectura.id
-                cuenta = self._cuenta_override_tipo_servicio(servicio.tipo_servicio_aso_id, residencia.proyecto_aso_id)
+                cuenta = cuenta_override(servicio)
                 if cuenta:
                     vals_line["account_id"] = cuenta.id
                 invoice_lines.append((0, 0, vals_line))
@@ -539,18 +701,21 @@ class ProyectoCobroMensual(models.Model):
                     # La cuota base no generó línea: enlazar la lectura aquí para que
                     # el seguimiento de facturación/pago siga funcionando.
                     vals_line_exceso["contador_line_id"] = lectura.id
-                cuenta = self._cuenta_override_tipo_servicio(servicio.tipo_servicio_aso_id, residencia.proyecto_aso_id)
+                cuenta = cuenta_override(servicio)
                 if cuenta:
                     vals_line_exceso["account_id"] = cuenta.id
                 invoice_lines.append((0, 0, vals_line_exceso))
 
         return invoice_lines, con_lectura
 
-    def _generar_cargo_residencia(self, residencia, lectura=None, journal=None, servicios=None, productos_especiales=None):
+    def _generar_cargo_residencia(self, residencia, lectura=None, journal=None, servicios=None,
+                                  productos_especiales=None, indices=None):
         """Crea (o recrea) el cargo en borrador de una residencia dentro de este cobro mensual.
 
         Si ya existe un cargo posteado para esa residencia, lanza error (no se puede regenerar).
         Si existe uno en borrador, se borra y se vuelve a crear con los valores actuales.
+        `indices` (ver `_indices_precios`) permite reutilizar la configuración de precios
+        ya cargada para todo el lote en que se está generando esta residencia.
         """
         self.ensure_one()
 
@@ -583,7 +748,7 @@ class ProyectoCobroMensual(models.Model):
             lectura._refrescar_calculo_con_precio_actual()
 
         invoice_lines, con_lectura = self._build_invoice_lines_residencia(
-            residencia, servicios, lectura, productos_especiales=productos_especiales
+            residencia, servicios, lectura, productos_especiales=productos_especiales, indices=indices,
         )
 
         if not invoice_lines:
@@ -607,17 +772,7 @@ class ProyectoCobroMensual(models.Model):
         # "Cargo Automatico Asociacion", así que nunca aplica aquí.
         move = self.env["account.move"].with_context(**{
             CTX_SKIP_CARGO_AUTOMATICO_CHECK: True,
-        }).create({
-            "move_type": "out_invoice",
-            "company_id": self.company_id.id,
-            "journal_id": journal.id,
-            "partner_id": residencia.cliente_id.id,
-            "residencia_id": residencia.id,
-            "invoice_date": fields.Date.context_today(self),
-            "invoice_origin": self.name or "",
-            "ref": f"{self.name or ''} - {residencia.display_name}",
-            "invoice_line_ids": invoice_lines,
-        })
+        }).create(self._vals_cargo_residencia(residencia, journal, invoice_lines))
 
         self.env["asovec.proyecto_cobro_mensual_line"].create({
             "cobro_id": self.id,
@@ -630,6 +785,95 @@ class ProyectoCobroMensual(models.Model):
 
         return move
 
+    def _vals_cargo_residencia(self, residencia, journal, invoice_lines):
+        self.ensure_one()
+        return {
+            "move_type": "out_invoice",
+            "company_id": self.company_id.id,
+            "journal_id": journal.id,
+            "partner_id": residencia.cliente_id.id,
+            "residencia_id": residencia.id,
+            "invoice_date": fields.Date.context_today(self),
+            "invoice_origin": self.name or "",
+            "ref": f"{self.name or ''} - {residencia.display_name}",
+            "invoice_line_ids": invoice_lines,
+        }
+
+    def _generar_cargos_lote(self, residencias, lectura_por_residencia, journal, servicios, productos_especiales,
+                             indices=None):
+        """Igual que llamar `_generar_cargo_residencia` para cada una de `residencias`,
+        pero creando TODOS los account.move del lote con un solo `create(vals_list)` (Odoo
+        comparte el cálculo de impuestos/totales y los flush entre los registros de un
+        mismo create) y luego todas las líneas de cobro mensual con un segundo create,
+        enlazando cada residencia con su cargo por posición.
+
+        Es todo o nada: si cualquier residencia del lote falla, la excepción se propaga
+        y quien llama decide cómo reintentar (ver `_generar_lote`). Devuelve la cantidad
+        de residencias generadas."""
+        self.ensure_one()
+        Line = self.env["asovec.proyecto_cobro_mensual_line"]
+
+        sin_cliente = residencias.filtered(lambda r: not r.cliente_id)
+        if sin_cliente:
+            raise UserError(_(
+                "La residencia '%s' no tiene un cliente (partner_id) asignado."
+            ) % sin_cliente[0].display_name)
+
+        existentes = self.line_ids.filtered(lambda l: l.residencia_id in residencias)
+        posteado = existentes.filtered(lambda l: l.move_id.state == "posted")[:1]
+        if posteado:
+            raise UserError(_(
+                "Ya existe un cargo posteado (%s) para la residencia '%s' en %s/%s. "
+                "No se puede regenerar."
+            ) % (posteado.move_id.name, posteado.residencia_id.display_name, self.month, self.year))
+        if existentes:
+            # En borrador o cancelado: se puede borrar y recrear sin problema.
+            moves = existentes.mapped("move_id")
+            existentes.unlink()
+            moves.unlink()
+
+        # Mismo refresco de precio vigente que en _generar_cargo_residencia, para todas
+        # las lecturas del lote a la vez.
+        lecturas = self.env["asovec.contador.lines"].union(*lectura_por_residencia.values())
+        lecturas.filtered(lambda l: l.residencia_id in residencias)._refrescar_calculo_con_precio_actual()
+
+        lineas_por_residencia = self._build_invoice_lines_lote(
+            residencias, servicios, lectura_por_residencia,
+            productos_especiales=productos_especiales, indices=indices,
+        )
+
+        con_cargo = []
+        line_vals_list = []
+        for residencia in residencias:
+            invoice_lines, con_lectura = lineas_por_residencia[residencia.id]
+            lectura = lectura_por_residencia.get(residencia.id)
+            line_vals = {
+                "cobro_id": self.id,
+                "residencia_id": residencia.id,
+                "con_lectura": con_lectura,
+                "contador_line_id": lectura.id if lectura else False,
+            }
+            if invoice_lines:
+                con_cargo.append((residencia, invoice_lines, line_vals))
+            else:
+                # Sin nada que cobrar: solo la constancia (ver _generar_cargo_residencia).
+                line_vals_list.append(line_vals)
+
+        if con_cargo:
+            # Ver comentario en _generar_cargo_residencia sobre este contexto.
+            moves = self.env["account.move"].with_context(**{
+                CTX_SKIP_CARGO_AUTOMATICO_CHECK: True,
+            }).create([
+                self._vals_cargo_residencia(residencia, journal, invoice_lines)
+                for residencia, invoice_lines, _line_vals in con_cargo
+            ])
+            for (_residencia, _invoice_lines, line_vals), move in zip(con_cargo, moves):
+                line_vals.update({"move_id": move.id, "amount_total": move.amount_total})
+                line_vals_list.append(line_vals)
+
+        Line.create(line_vals_list)
+        return len(residencias)
+
     # --------------------
     # Acciones
     # --------------------
@@ -687,12 +931,53 @@ class ProyectoCobroMensual(models.Model):
         self._check_puede_generar()
         return self._generar_lote(self._residencias_pendientes_generar(solo_inactivas=True))
 
+    def action_generate_background(self):
+        """Igual que "Completar Faltantes", pero encola TODAS las residencias pendientes
+        en una sola corrida que procesa el cron en segundo plano (ver
+        asovec.proyecto_cobro_mensual_job): la petición web termina de inmediato y el
+        avance queda visible en el formulario."""
+        self.ensure_one()
+        self._check_puede_generar()
+        self.env["asovec.proyecto_cobro_mensual_job"]._encolar(self)
+        return self._notificar_y_reabrir(
+            _("Generación encolada en segundo plano. Usa 'Refrescar' para ver el avance."),
+            notif_type="info",
+        )
+
+    def action_generate_inactivas_background(self):
+        self.ensure_one()
+        self._check_puede_generar()
+        self.env["asovec.proyecto_cobro_mensual_job"]._encolar(self, solo_inactivas=True)
+        return self._notificar_y_reabrir(
+            _("Generación de inactivas encolada en segundo plano. Usa 'Refrescar' para ver el avance."),
+            notif_type="info",
+        )
+
     def _check_puede_generar(self):
         self.ensure_one()
         if self.state != "draft":
             raise UserError(_("Solo puedes generar en estado Borrador."))
         if not self.proyecto_aso_id:
             raise UserError(_("Debes seleccionar un Proyecto."))
+        if self.generacion_en_curso:
+            # Generar a mano mientras el cron procesa la misma residencia crearía dos
+            # cargos para ella (o agregaría cargos a un cobro que se está confirmando).
+            raise UserError(_(
+                "Hay un proceso en segundo plano en curso para este cobro mensual. "
+                "Espera a que termine antes de generar manualmente."
+            ))
+
+    def _lecturas_por_residencia(self, residencias):
+        """{residencia_id: lectura} de las lecturas mensuales de este período para
+        `residencias`, en una sola búsqueda."""
+        self.ensure_one()
+        lecturas = self.env["asovec.contador.lines"].search([
+            ("residencia_id", "in", residencias.ids),
+            ("anio", "=", self.year),
+            ("mes", "=", str(int(self.month))),
+            ("es_inicial", "=", False),
+        ])
+        return {l.residencia_id.id: l for l in lecturas}
 
     def _generar_lote(self, pendientes):
         """Genera el cargo de un lote acotado (`_GENERATE_CHUNK_SIZE`) de `pendientes`.
@@ -705,32 +990,46 @@ class ProyectoCobroMensual(models.Model):
             return self._notificar_y_reabrir(_("No hay residencias pendientes por generar."))
 
         lote = pendientes[: self._GENERATE_CHUNK_SIZE]
+        medicion = MedicionLote(self, "generar")
 
         journal = self._get_journal_cargo()
         servicios = self._get_servicios_automaticos()
         productos_especiales = self._get_productos_especiales()
-        mes_plano = str(int(self.month))
-
-        lecturas = self.env["asovec.contador.lines"].search([
-            ("residencia_id", "in", lote.ids),
-            ("anio", "=", self.year),
-            ("mes", "=", mes_plano),
-            ("es_inicial", "=", False),
-        ])
-        lectura_por_residencia = {l.residencia_id.id: l for l in lecturas}
+        lectura_por_residencia = self._lecturas_por_residencia(lote)
+        indices = self._indices_precios(lote, servicios, productos_especiales)
 
+        # Primero se intenta el lote completo con creación masiva; si algo falla, se
+        # revierte solo ese intento y se repite residencia por residencia, que es lo
+        # que permite detenerse en la que falló con lo anterior ya guardado.
         generados = 0
+        etiqueta_lote = _("Lote de %s residencias") % len(lote)
         try:
-            for r in lote:
-                self._generar_cargo_residencia(
-                    r,
-                    lectura=lectura_por_residencia.get(r.id),
-                    journal=journal,
-                    servicios=servicios,
-                    productos_especiales=productos_especiales,
+            with medicion.medir(etiqueta_lote), self.env.cr.savepoint():
+                generados = self._generar_cargos_lote(
+                    lote, lectura_por_residencia, journal, servicios, productos_especiales,
+                    indices=indices,
                 )
+            pendientes_uno_a_uno = []
+        except Exception as e:
+            # Se anota aunque después todas pasen una por una: la corrida tomó el
+            # camino lento y eso es lo que debe verse en asovec.batch_run.
+            medicion.fallo(etiqueta_lote, e)
+            pendientes_uno_a_uno = lote
+        try:
+            for r in pendientes_uno_a_uno:
+                with medicion.medir(r.display_name):
+                    self._generar_cargo_residencia(
+                        r,
+                        lectura=lectura_por_residencia.get(r.id),
+                        journal=journal,
+                        servicios=servicios,
+                        productos_especiales=productos_especiales,
+                        indices=indices,
+                    )
                 generados += 1
         except Exception as e:
+            medicion.fallo(r.display_name, e)
+            medicion.registrar(generados)
             self.env.cr.commit()
             raise UserError(_(
                 "Se generaron %s residencias antes de encontrar un error (había %s "
@@ -738,6 +1037,7 @@ class ProyectoCobroMensual(models.Model):
                 "y vuelve a presionar el botón para continuar con el resto.\n\nDetalle: %s"
             ) % (generados, total_pendientes, str(e)))
 
+        medicion.registrar(generados)
         self.env.cr.commit()
 
         faltan = total_pendientes - generados
@@ -760,7 +1060,9 @@ class ProyectoCobroMensual(models.Model):
         """Regenera (borra y vuelve a crear) el cargo de las residencias de este cobro
         mensual, con la configuración vigente (precios, cuentas contables por
         proyecto, etc.) - útil después de cambiar esa configuración para que los
-        cargos ya generados la reflejen, sin corregir residencia por residencia.
+        cargos ya generados la reflejen, sin corregir residencia por residencia. Solo
+        se borran y recrean los cargos cuyo contenido cambiaría (`_cargo_sin_cambios`);
+        los demás se dejan intactos y se cuentan aparte en el resumen.
 
         Blindado en dos frentes:
         - Por tiempo: procesa en tandas de `_REGENERAR_CARGOS_CHUNK_SIZE` residencias
@@ -774,6 +1076,11 @@ class ProyectoCobroMensual(models.Model):
         self.ensure_one()
         if self.state != "draft":
             raise UserError(_("Solo puedes regenerar cargos en estado Borrador."))
+        if self.generacion_en_curso:
+            raise UserError(_(
+                "Hay un proceso en segundo plano en curso para este cobro mensual. "
+                "Espera a que termine antes de regenerar cargos."
+            ))
 
         Line = self.env["asovec.proyecto_cobro_mensual_line"]
         lineas = Line.search([
@@ -791,29 +1098,40 @@ class ProyectoCobroMensual(models.Model):
             )
 
         # Capturar todo ANTES de regenerar: cada regeneración borra y recrea la línea.
-        a_procesar = [(l.residencia_id, l.contador_line_id, l.move_id) for l in lineas]
-        ultimo_residencia_id = max(r.id for r, _, _ in a_procesar)
+        a_procesar = [(l.residencia_id, l.contador_line_id, l.move_id, l.con_lectura) for l in lineas]
+        ultimo_residencia_id = max(lineas.mapped("residencia_id").ids)
 
         journal = self._get_journal_cargo()
         servicios = self._get_servicios_automaticos()
         productos_especiales = self._get_productos_especiales()
+        indices = self._indices_precios(lineas.mapped("residencia_id"), servicios, productos_especiales)
 
+        medicion = MedicionLote(self, "regenerar")
         regenerados = 0
+        sin_cambios = 0
         saltados = 0
         fallidos = []
-        for residencia, lectura, move in a_procesar:
+        for residencia, lectura, move, con_lectura in a_procesar:
             if move and move.state == "posted":
                 saltados += 1
                 continue
             try:
-                with self.env.cr.savepoint():
+                with medicion.medir(residencia.display_name), self.env.cr.savepoint():
+                    if self._cargo_sin_cambios(
+                        residencia, lectura, move, con_lectura, journal, servicios,
+                        productos_especiales, indices,
+                    ):
+                        sin_cambios += 1
+                        continue
                     self._generar_cargo_residencia(
                         residencia, lectura=lectura, journal=journal,
                         servicios=servicios, productos_especiales=productos_especiales,
+                        indices=indices,
                     )
                 regenerados += 1
             except Exception as e:
                 fallidos.append(_("%s: %s") % (residencia.display_name, str(e)))
+                medicion.fallo(residencia.display_name, e)
 
         restantes = Line.search_count([
             ("cobro_id", "=", self.id),
@@ -821,9 +1139,12 @@ class ProyectoCobroMensual(models.Model):
             ("residencia_id", ">", ultimo_residencia_id),
         ])
         self.regenerar_cargos_cursor = ultimo_residencia_id if restantes else -1
+        medicion.registrar(len(a_procesar) - saltados)
         self.env.cr.commit()
 
         message = _("Se regeneraron %s cargos.") % regenerados
+        if sin_cambios:
+            message += _(" %s no tenían cambios y se dejaron intactos.") % sin_cambios
         if saltados:
             message += _(" %s ya estaban posteados y se saltaron.") % saltados
         if restantes:
@@ -836,6 +1157,58 @@ class ProyectoCobroMensual(models.Model):
         notif_type = "warning" if (restantes or fallidos) else "success"
         return self._notificar_y_reabrir(message, notif_type=notif_type, sticky=bool(fallidos))
 
+    def _cargo_sin_cambios(self, residencia, lectura, move, con_lectura, journal, servicios,
+                           productos_especiales, indices):
+        """True si regenerar el cargo de `residencia` daría exactamente lo mismo que ya
+        tiene `move` (mismos productos, precios, cuentas y lectura enlazada, mismo
+        cliente): en ese caso "Regenerar Cargos" no lo toca, evitando borrar/recrear el
+        borrador (huecos de secuencia, ruido en el seguimiento) sin necesidad. Un cargo
+        cancelado, o una residencia sin cargo que ahora sí tendría algo que cobrar, se
+        considera siempre con cambios."""
+        self.ensure_one()
+        if lectura:
+            # Mismo refresco que haría _generar_cargo_residencia antes de armar las líneas.
+            lectura._refrescar_calculo_con_precio_actual()
+        invoice_lines, con_lectura_nuevo = self._build_invoice_lines_residencia(
+            residencia, servicios, lectura, productos_especiales=productos_especiales, indices=indices,
+        )
+        if con_lectura_nuevo != con_lectura:
+            return False
+        if not move:
+            return not invoice_lines
+        if move.state != "draft" or move.partner_id != residencia.cliente_id:
+            return False
+        return self._firma_invoice_lines(invoice_lines, journal, move.fiscal_position_id) == self._firma_move(move)
+
+    def _firma_invoice_lines(self, invoice_lines, journal, fiscal_position):
+        """(producto, precio, cuenta, lectura) de cada línea que se crearía con
+        `invoice_lines`, ordenado, para comparar contra `_firma_move`. Las líneas sin
+        cuenta de excepción se comparan contra la cuenta de ingreso que Odoo asignaría
+        a partir del producto (o la del diario)."""
+        Product = self.env["product.product"]
+        digits = self.currency_id.decimal_places
+        firma = []
+        for _command, _id, vals in invoice_lines:
+            cuenta_id = vals.get("account_id")
+            if not cuenta_id:
+                product = Product.browse(vals["product_id"])
+                cuenta = product.product_tmpl_id.get_product_accounts(fiscal_pos=fiscal_position)["income"]
+                cuenta_id = (cuenta or journal.default_account_id).id
+            firma.append((
+                vals["product_id"],
+                round(vals["price_unit"], digits),
+                cuenta_id,
+                vals.get("contador_line_id") or False,
+            ))
+        return sorted(firma)
+
+    def _firma_move(self, move):
+        digits = self.currency_id.decimal_places
+        return sorted(
+            (l.product_id.id, round(l.price_unit, digits), l.account_id.id, l.contador_line_id.id or False)
+            for l in move.invoice_line_ids
+        )
+
     def _reabrir_form_action(self):
         """Reabre este mismo registro en su vista de formulario. Se usa en vez de una
         acción de recarga genérica (p.ej. 'soft_reload') porque esa depende de que el
@@ -883,33 +1256,22 @@ class ProyectoCobroMensual(models.Model):
         Confirmar para continuar solo con los cargos que faltan.
         """
         for rec in self:
-            if rec.state != "draft":
-                raise UserError(_("Solo puedes confirmar desde Borrador."))
-
-            if rec.residencias_pendientes:
-                raise UserError(_(
-                    "Todavía faltan %s residencias por generar. Usa "
-                    "'Completar Faltantes' antes de confirmar."
-                ) % rec.residencias_pendientes)
-
-            moves = rec.line_ids.mapped("move_id").filtered(lambda m: m)
-            if not moves:
-                raise UserError(_("No hay cargos relacionados para confirmar."))
-
-            cancelled = moves.filtered(lambda m: m.state == "cancel")
-            if cancelled:
-                raise UserError(_(
-                    "Hay cargos cancelados y no se pueden confirmar desde aquí:\n%s"
-                ) % "\n".join(cancelled.mapped("name")))
-
-            pendientes = moves.filtered(lambda m: m.state == "draft")
+            pendientes = rec._cargos_por_confirmar()
+            medicion = MedicionLote(rec, "confirmar")
 
             total = len(pendientes)
             for i in range(0, total, self._CONFIRM_CHUNK_SIZE):
                 lote = pendientes[i:i + self._CONFIRM_CHUNK_SIZE]
+                etiqueta = _("Cargos %s a %s") % (i + 1, i + len(lote))
                 try:
-                    lote.action_post()
+                    # Savepoint para poder dejar registrada la corrida aunque esta
+                    # tanda falle (la tanda se revierte igual que antes).
+                    with medicion.medir(etiqueta), self.env.cr.savepoint():
+                        lote.action_post()
                 except Exception as e:
+                    medicion.fallo(etiqueta, e)
+                    medicion.registrar(i)
+                    self.env.cr.commit()
                     raise UserError(_(
                         "Se confirmaron %s de %s cargos pendientes antes de encontrar un "
                         "error. Los ya confirmados quedan posteados: corrige el problema y "
@@ -918,11 +1280,62 @@ class ProyectoCobroMensual(models.Model):
                     ) % (i, total, str(e)))
                 self.env.cr.commit()
 
-            rec.state = "posted"
-            rec.fecha_confirmacion = fields.Date.context_today(rec)
+            rec._marcar_confirmado()
+            medicion.registrar(total)
 
         return True
 
+    def action_confirm_background(self):
+        """Igual que "Confirmar", pero el posteo lo hace el cron en segundo plano (ver
+        asovec.proyecto_cobro_mensual_job): postea los cargos en tandas de
+        `_CONFIRM_CHUNK_SIZE`, dejando el avance y los errores de cada tanda en la
+        pestaña "Segundo Plano". El cobro pasa a Publicado solo cuando ya no queda
+        ningún cargo en borrador."""
+        self.ensure_one()
+        self._cargos_por_confirmar()
+        self.env["asovec.proyecto_cobro_mensual_job"]._encolar(self, tipo="confirmar")
+        return self._notificar_y_reabrir(
+            _("Confirmación encolada en segundo plano. Usa 'Refrescar' para ver el avance."),
+            notif_type="info",
+        )
+
+    def _cargos_por_confirmar(self):
+        """Valida que el cobro se pueda confirmar y devuelve sus cargos en borrador."""
+        self.ensure_one()
+        if self.state != "draft":
+            raise UserError(_("Solo puedes confirmar desde Borrador."))
+
+        if self.generacion_en_curso:
+            raise UserError(_(
+                "Hay un proceso en segundo plano en curso para %s. Espera a que "
+                "termine antes de confirmar."
+            ) % self.name)
+
+        if self.residencias_pendientes:
+            raise UserError(_(
+                "Todavía faltan %s residencias por generar. Usa "
+                "'Completar Faltantes' antes de confirmar."
+            ) % self.residencias_pendientes)
+
+        moves = self.line_ids.mapped("move_id").filtered(lambda m: m)
+        if not moves:
+            raise UserError(_("No hay cargos relacionados para confirmar."))
+
+        cancelled = moves.filtered(lambda m: m.state == "cancel")
+        if cancelled:
+            raise UserError(_(
+                "Hay cargos cancelados y no se pueden confirmar desde aquí:\n%s"
+            ) % "\n".join(cancelled.mapped("name")))
+
+        return moves.filtered(lambda m: m.state == "draft")
+
+    def _marcar_confirmado(self):
+        self.ensure_one()
+        self.write({
+            "state": "posted",
+            "fecha_confirmacion": fields.Date.context_today(self),
+        })
+
     def action_set_draft(self):
         """Regresa el cobro mensual y sus cargos a borrador (solo desde publicado)."""
         for rec in self:
@@ -971,6 +1384,7 @@ class ProyectoCobroMensualLine(models.Model):
         string="Cargo",
         help="Cargo contable asociado (se creará luego).",
         ondelete="set null",
+        index="btree_not_null",
     )
 
     # ✅ lo conservamos como lo tenías
@@ -991,6 +1405,14 @@ class ProyectoCobroMensualLine(models.Model):
              "Mensuales o el de Cargo Migrado.",
     )
 
+    def init(self):
+        # Cargo de una residencia en un período (_lecturas_rows, _check_no_cargo_posteado,
+        # _cobro_line_for_period): siempre residencia + año + mes.
+        self._cr.execute("""
+            CREATE INDEX IF NOT EXISTS asovec_cobro_line_residencia_periodo
+            ON asovec_proyecto_cobro_mensual_line (residencia_id, year, month)
+        """)
+
     @api.depends("journal_id.aso_cargo_automatico", "journal_id.aso_cargo_migrado")
     def _compute_aso_cargo(self):
         for rec in self:
@@ -1043,7 +1465,7 @@ class ProyectoCobroMensualLine(models.Model):
     )
     lectura_anterior = fields.Float(related="contador_line_id.lectura_anterior", string="Lectura anterior", readonly=True)
     # No editable aquí: corregir la lectura regenera el cargo (borra y recrea ESTA
-    # misma línea vía _generar_cargo_mensual -> _generar_cargo_residencia), así que
+    # misma línea vía _generar_cargos_mensuales -> _generar_cargos_lote), así que
     # escribir sobre este propio registro lo borra a mitad de su propio write() y
     # revierte toda la transacción. Ver action_corregir_lectura: la corrección se
     # hace desde el formulario normal de asovec.contador.lines, que sí sobrevive a
@@ -1081,12 +1503,33 @@ class ProyectoCobroMensualLine(models.Model):
 
     @api.model_create_multi
     def create(self, vals_list):
+        # El cliente se toma de la residencia dentro de los mismos vals (en vez de un
+        # write por registro después del create), para que la creación masiva de
+        # líneas de `_generar_cargos_lote` siga siendo un solo INSERT.
+        residencia_ids = {vals["residencia_id"] for vals in vals_list if vals.get("residencia_id")}
+        residencias = self.env["asovec.residencia"].browse(residencia_ids)
+        cliente_por_residencia = {r.id: r.cliente_id.id for r in residencias}
+        for vals in vals_list:
+            cliente_id = cliente_por_residencia.get(vals.get("residencia_id"))
+            if cliente_id:
+                vals["cliente_id"] = cliente_id
         records = super().create(vals_list)
-        for rec in records:
-            if rec.residencia_id and rec.residencia_id.cliente_id:
-                rec.cliente_id = rec.residencia_id.cliente_id.id
+        records.cobro_id._programar_indicadores()
         return records
 
+    def write(self, vals):
+        cobros = self.cobro_id
+        res = super().write(vals)
+        if any(k in vals for k in ("cobro_id", "residencia_id", "con_lectura", "move_id")):
+            (cobros | self.cobro_id)._programar_indicadores()
+        return res
+
+    def unlink(self):
+        cobros = self.cobro_id
+        res = super().unlink()
+        cobros._programar_indicadores()
+        return res
+
     def action_imprimir_recibo(self):
         self.ensure_one()
         if not self.contador_line_id:
@@ -1178,11 +1621,12 @@ class ProyectoCobroMensualLine(models.Model):
         return header
 
     @api.model
-    def _csv_row(self, residencia, lectura, move, con_lectura, amount_total, move_state, payment_state, servicios):
+    def _csv_row(self, residencia, lectura, move, con_lectura, amount_total, move_state, payment_state, servicios, contador):
+        """Fila del CSV de lecturas. `contador` es el de la residencia según
+        Residencia._get_contadores_activos, resuelto una vez para todas las filas."""
         def fmt2(value):
             return f"{value or 0.0:.2f}"
 
-        contador = residencia._get_contador_activo()
         row = [
             residencia.name,
             residencia.cliente_id.name or "",
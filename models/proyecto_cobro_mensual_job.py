@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+import traceback
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from .batch_run import MedicionLote
+
+_logger = logging.getLogger(__name__)
+
+
+class ProyectoCobroMensualJob(models.Model):
+    """Procesos de un cobro mensual en segundo plano, sin depender de la petición
+    web: generación de cargos ("Completar Faltantes") o confirmación ("Confirmar").
+    Cada registro es UNA corrida encolada para un cobro; el cron
+    `ir_cron_asovec_generar_cargos` la procesa por tandas (`_GENERATE_CHUNK_SIZE`
+    residencias o `_CONFIRM_CHUNK_SIZE` cargos), con commit después de cada tanda, y
+    deja aquí el avance (procesadas/fallidas/restantes) para que el formulario del
+    cobro lo muestre. Cada tanda queda además medida en asovec.batch_run."""
+    _name = "asovec.proyecto_cobro_mensual_job"
+    _description = "Proceso en segundo plano (Cobro Mensual)"
+    _order = "id desc"
+
+    cobro_id = fields.Many2one(
+        comodel_name="asovec.proyecto_cobro_mensual",
+        string="Cobro mensual",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    tipo = fields.Selection(
+        selection=[
+            ("generar", "Generación de cargos"),
+            ("confirmar", "Confirmación de cargos"),
+        ],
+        string="Proceso",
+        default="generar",
+        required=True,
+    )
+    solo_inactivas = fields.Boolean(
+        string="Solo inactivas",
+        default=False,
+        help="Igual que 'Completar Inactivas': solo procesa las residencias inactivas pendientes.",
+    )
+    state = fields.Selection(
+        selection=[
+            ("pendiente", "En cola"),
+            ("en_proceso", "En proceso"),
+            ("terminado", "Terminado"),
+            ("error", "Error"),
+            ("cancelado", "Cancelado"),
+        ],
+        string="Estado",
+        default="pendiente",
+        required=True,
+        index=True,
+    )
+    user_id = fields.Many2one("res.users", string="Solicitado por", default=lambda self: self.env.user, readonly=True)
+    fecha_inicio = fields.Datetime(string="Inicio", readonly=True)
+    fecha_fin = fields.Datetime(string="Fin", readonly=True)
+
+    total = fields.Integer(string="Total pendientes", readonly=True)
+    generados = fields.Integer(string="Procesadas", readonly=True)
+    fallidos = fields.Integer(string="Fallidas", readonly=True)
+    restantes = fields.Integer(string="Restantes", readonly=True)
+    progreso = fields.Float(string="Avance", compute="_compute_progreso")
+    detalle_errores = fields.Text(string="Detalle de errores", readonly=True)
+
+    # Mismo papel que `regenerar_cargos_cursor` en el cobro: id de la última
+    # residencia ya procesada. Una residencia que falla sigue "pendiente" para
+    # `_residencias_pendientes_generar`, así que sin este cursor la siguiente tanda
+    # la volvería a intentar para siempre en vez de avanzar con las demás.
+    cursor_residencia_id = fields.Integer(string="Cursor", default=-1, readonly=True)
+    # Lo mismo para la confirmación, por id de cargo: un cargo que no se pudo postear
+    # sigue en borrador y no debe bloquear a los siguientes.
+    cursor_move_id = fields.Integer(string="Cursor de cargos", default=-1, readonly=True)
+
+    # Tiempo máximo (segundos) que una sola ejecución del cron sigue tomando tandas
+    # antes de soltar el worker y volver a dispararse; queda holgado bajo el
+    # `limit_time_real_cron` habitual del servidor.
+    _TIEMPO_MAXIMO_CORRIDA = 240
+
+    @api.depends("total", "generados", "fallidos")
+    def _compute_progreso(self):
+        for rec in self:
+            procesadas = rec.generados + rec.fallidos
+            rec.progreso = (procesadas * 100.0 / rec.total) if rec.total else 100.0
+
+    @api.model
+    def _encolar(self, cobro, solo_inactivas=False, tipo="generar"):
+        """Crea la corrida en segundo plano para `cobro` y dispara el cron de inmediato.
+        Solo puede haber una corrida activa (en cola o en proceso) por cobro, sea de
+        generación o de confirmación."""
+        activo = self.search([
+            ("cobro_id", "=", cobro.id),
+            ("state", "in", ("pendiente", "en_proceso")),
+        ], limit=1)
+        if activo:
+            raise UserError(_(
+                "Ya hay un proceso en segundo plano en curso para %s. Espera a que "
+                "termine (usa 'Refrescar' para ver el avance)."
+            ) % cobro.name)
+
+        if tipo == "confirmar":
+            total = len(cobro._cargos_por_confirmar())
+        else:
+            total = len(cobro._residencias_pendientes_generar(solo_inactivas=solo_inactivas))
+        job = self.create({
+            "cobro_id": cobro.id,
+            "tipo": tipo,
+            "solo_inactivas": solo_inactivas,
+            "total": total,
+            "restantes": total,
+        })
+        self.env.ref("iit_asovec.ir_cron_asovec_generar_cargos")._trigger()
+        return job
+
+    @api.model
+    def _cron_procesar_trabajos(self):
+        """Procesa las corridas en cola, una tanda a la vez y con commit después de cada
+        una, hasta agotar `_TIEMPO_MAXIMO_CORRIDA`; si queda trabajo, el cron se vuelve
+        a disparar solo en vez de ocupar el worker indefinidamente."""
+        inicio = time.monotonic()
+        while time.monotonic() - inicio < self._TIEMPO_MAXIMO_CORRIDA:
+            job = self.search([("state", "in", ("pendiente", "en_proceso"))], order="id asc", limit=1)
+            if not job:
+                return
+            try:
+                job._procesar_tanda()
+            except Exception:
+                # Un error fuera de los savepoints por residencia/cargo (búsqueda de
+                # pendientes, índices de precios, serialización, etc.) no puede dejar la
+                # corrida en cola: el cron la volvería a tomar primero para siempre y
+                # bloquearía a todas las demás. Se revierte la tanda y la corrida queda
+                # en Error con el detalle.
+                self.env.cr.rollback()
+                _logger.exception("Falló la corrida en segundo plano %s del cobro mensual.", job.id)
+                job._terminar("error", detalle_errores="\n".join(filter(None, [
+                    job.detalle_errores, traceback.format_exc(),
+                ])))
+            self.env.cr.commit()
+        self.env.ref("iit_asovec.ir_cron_asovec_generar_cargos")._trigger()
+
+    def action_cancelar(self):
+        """Cancela corridas en cola o en proceso (p.ej. una que quedó trabada): el cron
+        deja de tomarlas y el cobro vuelve a habilitar sus botones. Lo ya procesado en
+        tandas anteriores queda como está."""
+        self.filtered(lambda j: j.state in ("pendiente", "en_proceso")).write({
+            "state": "cancelado",
+            "fecha_fin": fields.Datetime.now(),
+        })
+        return True
+
+    def _terminar(self, state, **vals):
+        self.ensure_one()
+        vals.update({"state": state, "fecha_fin": fields.Datetime.now()})
+        self.write(vals)
+
+    def _procesar_tanda(self):
+        self.ensure_one()
+        if self.tipo == "confirmar":
+            return self._procesar_tanda_confirmacion()
+        return self._procesar_tanda_generacion()
+
+    def _procesar_tanda_generacion(self):
+        """Genera la siguiente tanda de residencias pendientes de esta corrida. Igual
+        que 'Regenerar Cargos', cada residencia va dentro de su propio savepoint: si
+        una falla se revierte solo esa, se anota en `detalle_errores` y se sigue con
+        las demás."""
+        self.ensure_one()
+        cobro = self.cobro_id.with_company(self.cobro_id.company_id)
+
+        if cobro.state != "draft":
+            self._terminar("error", detalle_errores=_("El cobro mensual ya no está en Borrador."))
+            return
+        if self.state == "pendiente":
+            self.write({"state": "en_proceso", "fecha_inicio": fields.Datetime.now()})
+
+        cursor = self.cursor_residencia_id
+        pendientes = cobro._residencias_pendientes_generar(solo_inactivas=self.solo_inactivas)
+        pendientes = pendientes.filtered(lambda r: r.id > cursor)
+        lote = pendientes[: cobro._GENERATE_CHUNK_SIZE]
+        if not lote:
+            self._terminar("terminado", restantes=0)
+            return
+
+        try:
+            journal = cobro._get_journal_cargo()
+            servicios = cobro._get_servicios_automaticos()
+            productos_especiales = cobro._get_productos_especiales()
+        except UserError as e:
+            # Falta configuración general (diario, servicios, productos de agua): no
+            # tiene sentido seguir intentando residencia por residencia.
+            self._terminar("error", detalle_errores=str(e))
+            return
+
+        medicion = MedicionLote(cobro, "generar_fondo")
+        lectura_por_residencia = cobro._lecturas_por_residencia(lote)
+        indices = cobro._indices_precios(lote, servicios, productos_especiales)
+
+        # Igual que en `_generar_lote`: primero el lote completo con creación masiva y,
+        # solo si algo falla, residencia por residencia para aislar las que fallan.
+        generados = 0
+        errores = []
+        etiqueta_lote = _("Lote de %s residencias") % len(lote)
+        try:
+            with medicion.medir(etiqueta_lote), self.env.cr.savepoint():
+                generados = cobro._generar_cargos_lote(
+                    lote, lectura_por_residencia, journal, servicios, productos_especiales,
+                    indices=indices,
+                )
+            pendientes_uno_a_uno = []
+        except Exception as e:
+            # Queda anotado aunque después todas pasen una por una: la corrida tomó
+            # el camino lento y eso es lo que debe verse en asovec.batch_run.
+            medicion.fallo(etiqueta_lote, e)
+            pendientes_uno_a_uno = lote
+        for residencia in pendientes_uno_a_uno:
+            try:
+                with medicion.medir(residencia.display_name), self.env.cr.savepoint():
+                    cobro._generar_cargo_residencia(
+                        residencia,
+                        lectura=lectura_por_residencia.get(residencia.id),
+                        journal=journal,
+                        servicios=servicios,
+                        productos_especiales=productos_especiales,
+                        indices=indices,
+                    )
+                generados += 1
+            except Exception as e:
+                medicion.fallo(residencia.display_name, e)
+                errores.append(_("%s: %s") % (residencia.display_name, str(e)))
+        medicion.registrar(generados)
+
+        restantes = len(pendientes) - len(lote)
+        vals = {
+            "cursor_residencia_id": max(lote.ids),
+            "generados": self.generados + generados,
+            "fallidos": self.fallidos + len(errores),
+            "restantes": restantes,
+        }
+        if errores:
+            vals["detalle_errores"] = "\n".join(filter(None, [self.detalle_errores, *errores]))
+        if restantes:
+            self.write(vals)
+        else:
+            self._terminar("terminado", **vals)
+
+    def _procesar_tanda_confirmacion(self):
+        """Postea la siguiente tanda de cargos en borrador del cobro. Cada tanda se
+        postea completa dentro de un savepoint (`action_post` numera solo los cargos de
+        esa tanda, así un borrador que no llega a postearse nunca queda con número
+        definitivo); si falla, se reintenta cargo por cargo para postear los que sí se
+        puedan y anotar el resto en `detalle_errores`. El cobro pasa a Publicado solo
+        si al final no quedó ningún cargo en borrador."""
+        self.ensure_one()
+        cobro = self.cobro_id.with_company(self.cobro_id.company_id)
+
+        if cobro.state != "draft":
+            self._terminar("error", detalle_errores=_("El cobro mensual ya no está en Borrador."))
+            return
+
+        borradores = cobro.line_ids.mapped("move_id").filtered(lambda m: m.state == "draft")
+        if self.state == "pendiente":
+            self.write({"state": "en_proceso", "fecha_inicio": fields.Datetime.now()})
+
+        cursor = self.cursor_move_id
+        pendientes = borradores.filtered(lambda m: m.id > cursor).sorted("id")
+        lote = pendientes[: cobro._CONFIRM_CHUNK_SIZE]
+        if not lote:
+            self._terminar_confirmacion(cobro, restantes=0)
+            return
+
+        medicion = MedicionLote(cobro, "confirmar_fondo")
+        confirmados = 0
+        errores = []
+        etiqueta_tanda = _("Tanda de %s cargos") % len(lote)
+        try:
+            with medicion.medir(etiqueta_tanda), self.env.cr.savepoint():
+                lote.action_post()
+            confirmados = len(lote)
+        except Exception as e:
+            medicion.fallo(etiqueta_tanda, e)
+            for move in lote:
+                # Un borrador todavía no tiene número ("/"): se identifica por su
+                # residencia.
+                etiqueta = move.residencia_id.display_name or _("Cargo %s") % move.id
+                try:
+                    with medicion.medir(etiqueta), self.env.cr.savepoint():
+                        move.action_post()
+                    confirmados += 1
+                except Exception as e:
+                    medicion.fallo(etiqueta, e)
+                    errores.append(_("%s: %s") % (etiqueta, str(e)))
+        medicion.registrar(confirmados)
+
+        restantes = len(pendientes) - len(lote)
+        vals = {
+            "cursor_move_id": max(lote.ids),
+            "generados": self.generados + confirmados,
+            "fallidos": self.fallidos + len(errores),
+            "restantes": restantes,
+        }
+        if errores:
+            vals["detalle_errores"] = "\n".join(filter(None, [self.detalle_errores, *errores]))
+        if restantes:
+            self.write(vals)
+        else:
+            self._terminar_confirmacion(cobro, **vals)
+
+    def _terminar_confirmacion(self, cobro, **vals):
+        """Cierra la corrida de confirmación; publica el cobro si ya no le queda ningún
+        cargo en borrador (los que fallaron se corrigen y se vuelve a confirmar)."""
+        self.ensure_one()
+        self._terminar("terminado", **vals)
+        if not cobro.line_ids.mapped("move_id").filtered(lambda m: m.state == "draft"):
+            cobro._marcar_confirmado()
@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields
+import base64
+
+from odoo import models, fields, tools
+from odoo.tools import image_process
+
 from .contador import MONTH_SELECTION
 
 
@@ -15,3 +19,46 @@ class ResCompany(models.Model):
              "deja vacío, no aplica ninguna restricción.",
     )
     aso_calculos_anio = fields.Integer(string="Cálculos a partir de (Año)")
+
+    aso_pdf_hojas_por_tramo = fields.Integer(
+        string="Hojas por tramo (PDF masivos)", default=50,
+        help="Los recibos masivos y los avisos de corte se imprimen por tramos de esta "
+             "cantidad de hojas, que luego se unen en un único PDF. Tramos más chicos "
+             "reparten mejor el trabajo entre procesos; más grandes, menos archivos "
+             "intermedios.",
+    )
+    aso_pdf_procesos = fields.Integer(
+        string="Procesos en paralelo (PDF masivos)", default=2,
+        help="Cantidad de tramos que se generan al mismo tiempo (un wkhtmltopdf y una "
+             "conexión a la base por tramo). Con 1 los tramos se generan uno tras otro.",
+    )
+
+    def _aso_logo_miniatura(self, altura):
+        """Logo de la compañía reducido a `altura` px de alto, en base64 (bytes), o
+        False si no tiene logo. Es el único punto donde los reportes de la Asociación
+        arman la miniatura del logo (recibos, cargos, estados de cuenta, etc.).
+
+        La miniatura queda en caché por (compañía, checksum del logo, altura): el
+        recibo masivo y los reportes HTML la reutilizan entre impresiones en lugar de
+        decodificar y redimensionar el logo cada vez. Al cambiar el logo cambia su
+        checksum, así que la miniatura anterior deja de usarse sola (no hace falta
+        limpiar la caché)."""
+        self.ensure_one()
+        # `logo` es related a partner_id.image_1920: el adjunto es el de la imagen del
+        # partner de la compañía. Solo se lee su checksum, no el contenido.
+        checksum = self.env["ir.attachment"].sudo().search([
+            ("res_model", "=", "res.partner"),
+            ("res_field", "=", "image_1920"),
+            ("res_id", "=", self.partner_id.id),
+        ], limit=1).checksum
+        if not checksum:
+            return False
+        return self._aso_logo_miniatura_cacheada(self.id, checksum, altura)
+
+    @tools.ormcache("company_id", "checksum", "altura")
+    def _aso_logo_miniatura_cacheada(self, company_id, checksum, altura):
+        logo = self.browse(company_id).sudo().logo
+        if not logo:
+            return False
+        resized = image_process(base64.b64decode(logo), size=(0, altura))
+        return base64.b64encode(resized) if resized else False
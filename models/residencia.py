@@ -13,8 +13,8 @@ class Residencia(models.Model):
     calle = fields.Char(string="Calle")
     no_casa = fields.Char(string="No. Casa")
     detalle = fields.Text(string="Informacion Detallada")
-    proyecto_aso_id = fields.Many2one(string="Proyecto", comodel_name='asovec.proyecto_aso', required=True)
-    cliente_id = fields.Many2one(comodel_name='res.partner', string="Contacto", required=False)
+    proyecto_aso_id = fields.Many2one(string="Proyecto", comodel_name='asovec.proyecto_aso', required=True, index=True)
+    cliente_id = fields.Many2one(comodel_name='res.partner', string="Contacto", required=False, index=True)
     residencia_lines = fields.One2many(comodel_name="asovec.residencia.lines", inverse_name="residencia_id")
     contadores_ids = fields.One2many(comodel_name='asovec.contador', inverse_name='residencia_id', string='Contadores')
     contador_count = fields.Integer(string="Contadores", compute="_compute_contador_count")
@@ -165,7 +165,11 @@ class Residencia(models.Model):
                 vals['activo'] = True
             elif vals.get('sin_contador'):
                 vals['activo'] = False
-        return super().create(vals_list)
+        records = super().create(vals_list)
+        self.env['asovec.proyecto_cobro_mensual']._recalcular_indicadores_proyectos(
+            records.mapped('proyecto_aso_id').ids
+        )
+        return records
 
     def _aplicar_jerarquia_flags(self):
         """Garantiza la jerarquía No paga servicios > Sin contador > Activo sin importar
@@ -217,6 +221,8 @@ class Residencia(models.Model):
                                     "La residencia tiene cobros pendientes.\n"
                                     "Liquide el saldo antes de realizar el cambio.")
 
+        proyectos_previos = set(self.mapped('proyecto_aso_id').ids) if 'proyecto_aso_id' in vals else set()
+
         contadores_a_desactivar = self.env['asovec.contador']
         if vals.get('activo') is False:
             residencias_previamente_activas = self.filtered(lambda r: r.activo)
@@ -234,51 +240,96 @@ class Residencia(models.Model):
         if 'no_paga_servicios' in vals or 'sin_contador' in vals:
             self._aplicar_jerarquia_flags()
 
+        if any(k in vals for k in ('activo', 'no_paga_servicios', 'sin_contador', 'proyecto_aso_id')):
+            # Indicadores de avance guardados en los cobros mensuales en borrador (ver
+            # asovec.proyecto_cobro_mensual._recalcular_indicadores).
+            self.env['asovec.proyecto_cobro_mensual']._recalcular_indicadores_proyectos(
+                proyectos_previos | set(self.mapped('proyecto_aso_id').ids)
+            )
+
+        return res
+
+    def unlink(self):
+        proyecto_ids = self.mapped('proyecto_aso_id').ids
+        res = super().unlink()
+        self.env['asovec.proyecto_cobro_mensual']._recalcular_indicadores_proyectos(proyecto_ids)
         return res
 
+    def _conteos_por_residencia(self, model, domain):
+        """{residencia_id: cantidad} de registros de `model` que cumplen `domain`, para
+        todas las residencias de `self` con un solo read_group (GROUP BY residencia_id)
+        en lugar de un search_count por residencia: los botones inteligentes también se
+        calculan en listas y exportaciones."""
+        residencia_ids = self._origin.ids
+        if not residencia_ids:
+            return {}
+        grupos = self.env[model].sudo().read_group(
+            domain + [('residencia_id', 'in', residencia_ids)], ['residencia_id'], ['residencia_id'],
+        )
+        return {g['residencia_id'][0]: g['residencia_id_count'] for g in grupos}
+
     def _compute_contador_count(self):
-        Contador = self.env['asovec.contador'].sudo()
+        conteos = self._conteos_por_residencia('asovec.contador', [])
         for rec in self:
-            rec.contador_count = Contador.search_count([('residencia_id', '=', rec.id)])
+            rec.contador_count = conteos.get(rec._origin.id, 0)
 
     def _compute_lectura_count(self):
-        Line = self.env['asovec.contador.lines'].sudo()
+        conteos = self._conteos_por_residencia('asovec.contador.lines', [('contador_id.active', '=', True)])
         for rec in self:
-            rec.lectura_count = Line.search_count([
-                ('residencia_id', '=', rec.id), ('contador_id.active', '=', True),
-            ])
+            rec.lectura_count = conteos.get(rec._origin.id, 0)
 
     def _compute_movimiento_count(self):
         """Cuenta los apuntes de la cuenta por cobrar (una línea por cargo y una por
         pago aplicado, igual al criterio que usa el Estado de Cuenta) ligados a esta
-        residencia, ya sea a través de la factura (cargo) o del pago (abono)."""
-        Line = self.env['account.move.line'].sudo()
+        residencia, ya sea a través de la factura (cargo) o del pago (abono): el mismo
+        OR que el dominio de `action_ver_movimientos`, para todas las residencias en
+        una sola consulta. El UNION cuenta una vez el apunte cuya factura y pago son
+        de la misma residencia, y en ambas el que las liga a residencias distintas."""
+        residencia_ids = self._origin.ids
+        conteos = {}
+        if residencia_ids:
+            self.env['account.move'].flush_model(['residencia_id'])
+            self.env['account.payment'].flush_model(['residencia_id'])
+            self.env['account.move.line'].flush_model(['move_id', 'payment_id', 'account_id'])
+            self.env.cr.execute("""
+                SELECT residencia_id, COUNT(*)
+                  FROM (
+                        SELECT aml.id, m.residencia_id
+                          FROM account_move_line aml
+                          JOIN account_move m ON m.id = aml.move_id
+                          JOIN account_account acc ON acc.id = aml.account_id
+                         WHERE m.residencia_id IN %(residencia_ids)s
+                           AND acc.account_type = 'asset_receivable'
+                        UNION
+                        SELECT aml.id, p.residencia_id
+                          FROM account_move_line aml
+                          JOIN account_payment p ON p.id = aml.payment_id
+                          JOIN account_account acc ON acc.id = aml.account_id
+                         WHERE p.residencia_id IN %(residencia_ids)s
+                           AND acc.account_type = 'asset_receivable'
+                       ) apuntes
+              GROUP BY residencia_id
+            """, {'residencia_ids': tuple(residencia_ids)})
+            conteos = dict(self.env.cr.fetchall())
         for rec in self:
-            rec.movimiento_count = Line.search_count([
-                ('account_id.account_type', '=', 'asset_receivable'),
-                '|',
-                ('move_id.residencia_id', '=', rec.id),
-                ('payment_id.residencia_id', '=', rec.id),
-            ])
+            rec.movimiento_count = conteos.get(rec._origin.id, 0)
 
     def _compute_cargo_pendiente_count(self):
-        Move = self.env['account.move'].sudo()
+        conteos = self._conteos_por_residencia('account.move', [
+            ('move_type', '=', 'out_invoice'),
+            ('state', '=', 'posted'),
+            ('amount_residual', '>', 0),
+        ])
         for rec in self:
-            rec.cargo_pendiente_count = Move.search_count([
-                ('residencia_id', '=', rec.id),
-                ('move_type', '=', 'out_invoice'),
-                ('state', '=', 'posted'),
-                ('amount_residual', '>', 0),
-            ])
+            rec.cargo_pendiente_count = conteos.get(rec._origin.id, 0)
 
     def _compute_pago_count(self):
-        Payment = self.env['account.payment'].sudo()
+        conteos = self._conteos_por_residencia('account.payment', [
+            ('state', '=', 'posted'),
+            ('payment_type', '=', 'inbound'),
+        ])
         for rec in self:
-            rec.pago_count = Payment.search_count([
-                ('residencia_id', '=', rec.id),
-                ('state', '=', 'posted'),
-                ('payment_type', '=', 'inbound'),
-            ])
+            rec.pago_count = conteos.get(rec._origin.id, 0)
 
     def action_ver_movimientos(self):
         self.ensure_one()
@@ -423,11 +474,11 @@ class Residencia(models.Model):
 class ResidenciaLines(models.Model):
     _name = 'asovec.residencia.lines'
 
-    producto_id = fields.Many2one(string="Servicio", comodel_name='product.template', required=True, domain=[('aso_es_servicio_aso', '=', True), ('aso_automatico', '=', True), ('aso_activo', '=', True)])
+    producto_id = fields.Many2one(string="Servicio", comodel_name='product.template', required=True, index=True, domain=[('aso_es_servicio_aso', '=', True), ('aso_automatico', '=', True), ('aso_activo', '=', True)])
     company_id = fields.Many2one("res.company", string="Compañía", required=True, default=lambda self: self.env.company, index=True)
     currency_id = fields.Many2one("res.currency", string="Moneda", related="company_id.currency_id", store=True, readonly=True)
     precio = fields.Monetary(string="Precio", default=0, currency_field="currency_id", required=True)
-    residencia_id = fields.Many2one(comodel_name='asovec.residencia')
+    residencia_id = fields.Many2one(comodel_name='asovec.residencia', index=True)
 
     @api.onchange('producto_id')
     def _onchange_product_id(self):
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+# Parámetro del sistema con la fecha/hora (UTC) del último refresco de la vista.
+PARAM_ULTIMO_REFRESCO = "iit_asovec.residencia_atraso_refrescado"
+
+
+class ResidenciaAtraso(models.Model):
+    """Antigüedad de la deuda por residencia y mes, para la Notificación de Corte de
+    Servicio (asovec.proceso_corte_servicio_wizard).
+
+    Vista materializada de PostgreSQL con un renglón por (residencia, mes adeudado) y
+    el saldo impago de ese mes. El saldo de cada cargo sale de la cuenta corriente por
+    residencia (asovec.residencia_cuenta: cargo menos pagos aplicados); el mes, con el
+    mismo criterio que usaba el wizard al recorrer los cargos en Python:
+
+    - Cargos de cobro mensual posteados con saldo: el mes es el de `create_date` de la
+      línea de cobro (la fecha real de creación del cargo, no su período contable).
+    - Deuda migrada (facturas sueltas sin línea de cobro mensual): el mes es el de
+      `invoice_date`, la fecha asignada a cada mes histórico al migrarlo. Igual que en
+      el CSV del banco, solo se reconoce por líneas de factura con productos no
+      archivados.
+
+    El wizard solo agrega los meses anteriores al mes de referencia elegido y filtra
+    por `meses_atraso` en la misma consulta (`_atrasos`). La vista se refresca por
+    cron: conciliar/desconciliar pagos y postear/cancelar cargos lo disparan de
+    inmediato (`_programar_refresco`). Al buscar se usa tal cual y el wizard muestra
+    la hora del último refresco; solo se refresca en el momento si hay uno pendiente
+    y la vista tiene más de `_MINUTOS_DESACTUALIZADA` minutos (ver
+    `_asegurar_actualizado`)."""
+    _name = "asovec.residencia_atraso"
+    _description = "Antigüedad de Deuda por Residencia"
+    _auto = False
+    _order = "residencia_id, periodo"
+
+    residencia_id = fields.Many2one("asovec.residencia", string="Residencia", readonly=True)
+    periodo = fields.Date(string="Mes adeudado", readonly=True, help="Primer día del mes adeudado.")
+    monto = fields.Float(string="Saldo", readonly=True)
+
+    # Antigüedad máxima (minutos) con la que la búsqueda acepta la vista cuando hay un
+    # refresco pendiente: el cron lo toma enseguida, así que refrescar en la petición
+    # del usuario solo vale la pena si el cron viene atrasado.
+    _MINUTOS_DESACTUALIZADA = 15
+
+    def init(self):
+        # Se vuelve a crear en cada actualización del módulo: CREATE ... IF NOT EXISTS
+        # dejaría la definición vieja cuando cambia la consulta. CREATE MATERIALIZED
+        # VIEW ya la llena, así que queda refrescada.
+        self.env.cr.execute("DROP MATERIALIZED VIEW IF EXISTS asovec_residencia_atraso")
+        self.env.cr.execute("""
+            CREATE MATERIALIZED VIEW asovec_residencia_atraso AS
+            WITH pendiente AS (
+                SELECT move_id, residencia_id, SUM(debe - haber) AS saldo
+                  FROM asovec_residencia_cuenta
+              GROUP BY move_id, residencia_id
+                HAVING SUM(debe - haber) > 0
+            )
+            SELECT ROW_NUMBER() OVER (ORDER BY residencia_id, periodo) AS id,
+                   residencia_id, periodo, SUM(monto) AS monto
+              FROM (
+                    SELECT l.residencia_id,
+                           DATE_TRUNC('month', l.create_date)::date AS periodo,
+                           p.saldo AS monto
+                      FROM pendiente p
+                      JOIN asovec_proyecto_cobro_mensual_line l ON l.move_id = p.move_id
+                    UNION ALL
+                    SELECT p.residencia_id,
+                           DATE_TRUNC('month', m.invoice_date)::date,
+                           p.saldo
+                      FROM pendiente p
+                      JOIN account_move m ON m.id = p.move_id
+                     WHERE m.invoice_date IS NOT NULL
+                       AND EXISTS (
+                            SELECT 1
+                              FROM account_move_line aml
+                              JOIN product_product pp ON pp.id = aml.product_id
+                              JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                              JOIN asovec_tipo_servicio_aso t ON t.id = pt.tipo_servicio_aso_id
+                             WHERE aml.move_id = m.id
+                               AND aml.display_type IN ('product', 'line_section', 'line_note')
+                               AND pp.active IS TRUE
+                               AND pt.active IS TRUE
+                               AND t.aso_migrado IS TRUE
+                       )
+                   ) deuda
+          GROUP BY residencia_id, periodo
+        """)
+        # Único requerido por REFRESH ... CONCURRENTLY (el refresco no bloquea las
+        # lecturas del wizard mientras corre).
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX asovec_residencia_atraso_residencia_periodo
+            ON asovec_residencia_atraso (residencia_id, periodo)
+        """)
+        self.env["ir.config_parameter"].sudo().set_param(PARAM_ULTIMO_REFRESCO, fields.Datetime.now())
+
+    @api.model
+    def _refrescar(self):
+        self.env["asovec.proyecto_cobro_mensual_line"].flush_model(["residencia_id", "move_id"])
+        self.env["account.move"].flush_model(["invoice_date"])
+        self.env["account.move.line"].flush_model(["move_id", "product_id", "display_type"])
+        self.env["product.product"].flush_model(["active", "product_tmpl_id"])
+        self.env["product.template"].flush_model(["active", "tipo_servicio_aso_id"])
+        self.env["asovec.residencia_cuenta"].flush_model()
+        self.env.cr.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY asovec_residencia_atraso")
+        self.env["ir.config_parameter"].sudo().set_param(PARAM_ULTIMO_REFRESCO, fields.Datetime.now())
+        self.invalidate_model()
+
+    @api.model
+    def _cron(self):
+        return self.env.ref("iit_asovec.ir_cron_asovec_refrescar_atraso", raise_if_not_found=False)
+
+    @api.model
+    def _programar_refresco(self):
+        """Pide al cron un refresco lo antes posible. Solo agrega un disparo
+        (ir.cron.trigger): varios pagos seguidos terminan en un único refresco, y no
+        bloquea la transacción que concilia."""
+        cron = self._cron()
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def _ultimo_refresco(self):
+        """Fecha/hora (UTC) del último refresco de la vista, o None si nunca se hizo."""
+        return fields.Datetime.to_datetime(
+            self.env["ir.config_parameter"].sudo().get_param(PARAM_ULTIMO_REFRESCO)
+        )
+
+    @api.model
+    def _asegurar_actualizado(self):
+        """Refresca en el momento solo si el cron tiene un refresco pendiente (se
+        concilió un pago o se posteó un cargo) y el último refresco tiene más de
+        `_MINUTOS_DESACTUALIZADA` minutos, o si nunca se refrescó. En otro caso la
+        búsqueda usa la vista tal cual, sin esperar un REFRESH de toda la tabla."""
+        ultimo = self._ultimo_refresco()
+        if ultimo and ultimo >= fields.Datetime.now() - timedelta(minutes=self._MINUTOS_DESACTUALIZADA):
+            return
+        cron = self._cron()
+        pendiente = cron and self.env["ir.cron.trigger"].sudo().search_count(
+            [("cron_id", "=", cron.id)], limit=1,
+        )
+        if pendiente or not ultimo:
+            self._refrescar()
+
+    @api.model
+    def _atrasos(self, residencia_ids, antes_de, meses_minimos, mes_referencia):
+        """[(residencia_id, meses_atraso, monto_total, [periodos])] de las residencias
+        de `residencia_ids` con deuda de meses anteriores a `antes_de` (primer día del
+        mes de referencia) cuyo mes impago más antiguo está al menos `meses_minimos`
+        meses antes de `mes_referencia` (anio * 12 + mes), en una sola consulta."""
+        if not residencia_ids:
+            return []
+        self._asegurar_actualizado()
+        self.env.cr.execute("""
+            SELECT residencia_id,
+                   %(mes_referencia)s - MIN(EXTRACT(YEAR FROM periodo)::int * 12
+                                            + EXTRACT(MONTH FROM periodo)::int) AS atraso,
+                   SUM(monto),
+                   ARRAY_AGG(periodo ORDER BY periodo)
+              FROM asovec_residencia_atraso
+             WHERE residencia_id IN %(residencia_ids)s
+               AND periodo < %(antes_de)s
+          GROUP BY residencia_id
+            HAVING %(mes_referencia)s - MIN(EXTRACT(YEAR FROM periodo)::int * 12
+                                            + EXTRACT(MONTH FROM periodo)::int) >= %(meses_minimos)s
+        """, {
+            "residencia_ids": tuple(residencia_ids),
+            "antes_de": antes_de,
+            "meses_minimos": meses_minimos,
+            "mes_referencia": mes_referencia,
+        })
+        return self.env.cr.fetchall()
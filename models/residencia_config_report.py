@@ -1,8 +1,5 @@
 # -*- coding: utf-8 -*-
-import base64
-
 from odoo import api, fields, models
-from odoo.tools import image_process
 
 LOGO_MAX_HEIGHT = 90
 
@@ -44,7 +41,7 @@ class ReportResidenciaConfig(models.AbstractModel):
             return {"estado": "no_paga", "precio": 0.0}
         return {"estado": "paga", "precio": precio}
 
-    def _residencia_row(self, residencia, servicios):
+    def _residencia_row(self, residencia, servicios, contador):
         proyecto = residencia.proyecto_aso_id
 
         if residencia.cobro_base_especial:
@@ -65,7 +62,6 @@ class ReportResidenciaConfig(models.AbstractModel):
             canon_estado = "no_paga"
 
         servicios_vals = {s.name: self._precio_servicio(residencia, s) for s in servicios}
-        contador = residencia._get_contador_activo()
 
         return {
             "proyecto": proyecto,
@@ -95,7 +91,8 @@ class ReportResidenciaConfig(models.AbstractModel):
         servicios = self._servicios_automaticos()
         servicios_nombres = servicios.mapped("name")
 
-        filas = [self._residencia_row(r, servicios) for r in residencias]
+        contadores = residencias._get_contadores_activos()
+        filas = [self._residencia_row(r, servicios, contadores[r.id]) for r in residencias]
 
         resumen = {
             "cantidad_residencias": len(filas),
@@ -124,11 +121,8 @@ class ReportResidenciaConfig(models.AbstractModel):
         datos = self._build_residencia_config_data(wizard)
 
         company = self.env.company
-        logo_b64 = False
-        if company.logo:
-            resized = image_process(base64.b64decode(company.logo), size=(0, LOGO_MAX_HEIGHT))
-            if resized:
-                logo_b64 = base64.b64encode(resized).decode()
+        logo = company._aso_logo_miniatura(LOGO_MAX_HEIGHT)
+        logo_b64 = logo.decode() if logo else False
 
         return {
             "doc_ids": docids,
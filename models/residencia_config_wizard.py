@@ -1,11 +1,10 @@
 # -*- coding: utf-8 -*-
 import base64
-import io
-
-import xlsxwriter
 
 from odoo import api, models, fields
 
+from .xlsx_export import xlsx_en_memoria
+
 _INVALID_FILENAME_CHARS = set('\\/:*?"<>|')
 
 
@@ -38,12 +37,12 @@ class ResidenciaConfigWizard(models.TransientModel):
     # -------------------------
     # Exportación a Excel
     # -------------------------
-    def action_generar_excel(self):
+    def _escribir_excel(self, workbook):
+        """Llena `workbook` con la configuración de residencias y devuelve el nombre
+        de archivo."""
         self.ensure_one()
         datos = self.env["report.iit_asovec.report_residencia_config_document"]._build_residencia_config_data(self)
 
-        buffer = io.BytesIO()
-        workbook = xlsxwriter.Workbook(buffer, {"in_memory": True})
         worksheet = workbook.add_worksheet("Configuración Residencias")
 
         fmt_titulo = workbook.add_format({"bold": True, "font_size": 14})
@@ -112,13 +111,15 @@ class ResidenciaConfigWizard(models.TransientModel):
             row += 1
 
         worksheet.freeze_panes(header_row + 1, 2)
-        workbook.close()
-        buffer.seek(0)
 
         filename = "Configuracion_Residencias_%s.xlsx" % datos["generated_at"].replace("/", "-").replace(":", "-").replace(" ", "_")
-        filename = "".join(c for c in filename if c not in _INVALID_FILENAME_CHARS)
+        return "".join(c for c in filename if c not in _INVALID_FILENAME_CHARS)
+
+    def action_generar_excel(self):
+        self.ensure_one()
+        contenido, filename = xlsx_en_memoria(self._escribir_excel)
         self.write({
-            "file_data": base64.b64encode(buffer.read()),
+            "file_data": base64.b64encode(contenido),
             "file_name": filename,
         })
 
@@ -130,3 +131,13 @@ class ResidenciaConfigWizard(models.TransientModel):
             "target": "new",
             "context": self.env.context,
         }
+
+    def action_descargar_excel(self):
+        """Descarga el Excel en modo streaming (ver xlsx_export): se arma en el
+        controlador y no se guarda en el wizard."""
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_url",
+            "url": "/asovec/residencia_config/%s/xlsx" % self.id,
+            "target": "self",
+        }
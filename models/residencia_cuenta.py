@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class ResidenciaCuenta(models.Model):
+    """Cuenta corriente por residencia: un renglón por cada cargo posteado (Debe) y
+    por cada pago/nota de crédito realmente conciliado contra él (Haber), con el saldo
+    acumulado ya calculado, ordenado por (fecha, tipo, id).
+
+    Es una tabla derivada de la contabilidad, no un documento: nadie la edita. Se
+    reconstruye por residencia (`_reconstruir`) cada vez que cambia algo que la afecta
+    (postear/cancelar un cargo, conciliar/desconciliar un pago; ver los hooks en
+    account_move.py y account_partial_reconcile.py) y el cron nocturno `_cron_verificar_consistencia` la compara
+    contra los saldos pendientes de los cargos y corrige lo que no cuadre.
+
+    Mismo criterio que el Estado de Cuenta (estado_cuenta_report._movimientos_residencias):
+    solo facturas reales como cargo (las notas de crédito entran como abono al
+    conciliarse) y los pagos según account.partial.reconcile, sin las diferencias de
+    cambio. Así el saldo de la residencia es siempre la suma de `amount_residual` de
+    sus cargos posteados, y leerlo (o los movimientos de un rango de fechas) es un
+    solo recorrido del índice (residencia_id, fecha).
+
+    La leen los pagos aplicados del Estado de Cuenta
+    (estado_cuenta_report._pagos_aplicados_por_move), el saldo de cada cargo en el CSV
+    del banco (proceso_estado_cuenta_csv_wizard) y la antigüedad de deuda de la
+    Notificación de Corte (asovec.residencia_atraso)."""
+    _name = "asovec.residencia_cuenta"
+    _description = "Cuenta Corriente por Residencia"
+    _order = "residencia_id, fecha, tipo, id"
+    _rec_name = "move_id"
+
+    residencia_id = fields.Many2one(
+        "asovec.residencia", string="Residencia", required=True, readonly=True, ondelete="cascade",
+    )
+    proyecto_aso_id = fields.Many2one(
+        related="residencia_id.proyecto_aso_id", string="Proyecto", store=True, readonly=True,
+    )
+    fecha = fields.Date(string="Fecha", required=True, readonly=True)
+    tipo = fields.Selection(
+        [("cargo", "Cargo"), ("pago", "Pago")], string="Tipo", required=True, readonly=True,
+    )
+    move_id = fields.Many2one(
+        "account.move", string="Cargo", required=True, readonly=True, ondelete="cascade",
+    )
+    pago_move_id = fields.Many2one(
+        "account.move", string="Pago", readonly=True, ondelete="cascade",
+        help="Asiento del pago o nota de crédito conciliado contra el cargo (solo en "
+             "renglones de tipo Pago).",
+    )
+    partial_id = fields.Many2one(
+        "account.partial.reconcile", string="Conciliación", readonly=True, ondelete="cascade",
+    )
+    journal_id = fields.Many2one("account.journal", string="Diario", readonly=True)
+    currency_id = fields.Many2one("res.currency", string="Moneda", readonly=True)
+    debe = fields.Monetary(string="Debe", currency_field="currency_id", readonly=True)
+    haber = fields.Monetary(string="Haber", currency_field="currency_id", readonly=True)
+    saldo = fields.Monetary(string="Saldo", currency_field="currency_id", readonly=True)
+
+    def init(self):
+        # Lecturas de estado de cuenta y antigüedad de saldos: siempre por residencia y
+        # rango de fechas, en el mismo orden en que se acumula el saldo.
+        self._cr.execute("""
+            CREATE INDEX IF NOT EXISTS asovec_residencia_cuenta_residencia_fecha
+            ON asovec_residencia_cuenta (residencia_id, fecha, tipo, id)
+        """)
+
+    # -------------------------
+    # Mantenimiento
+    # -------------------------
+    @api.model
+    def _reconstruir(self, residencia_ids):
+        """Vuelve a armar la cuenta corriente de `residencia_ids` desde la
+        contabilidad: borra sus renglones, inserta cargos y pagos aplicados con dos
+        INSERT ... SELECT y recalcula el saldo acumulado con una función de ventana. Un
+        número fijo de consultas sin importar cuántas residencias sean."""
+        residencia_ids = tuple({rid for rid in residencia_ids if rid})
+        if not residencia_ids:
+            return
+        self.env["account.move"].flush_model([
+            "residencia_id", "state", "move_type", "invoice_date", "date", "journal_id",
+            "currency_id", "amount_total",
+        ])
+        self.env["account.move.line"].flush_model(["move_id", "account_id", "date", "journal_id"])
+        self.env["account.partial.reconcile"].flush_model()
+        self.flush_model()
+
+        params = {"residencia_ids": residencia_ids, "uid": self.env.uid}
+        cr = self.env.cr
+        cr.execute("DELETE FROM asovec_residencia_cuenta WHERE residencia_id IN %(residencia_ids)s", params)
+        cr.execute("""
+            INSERT INTO asovec_residencia_cuenta (
+                residencia_id, proyecto_aso_id, fecha, tipo, move_id, journal_id,
+                currency_id, debe, haber, saldo,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT m.residencia_id, r.proyecto_aso_id, COALESCE(m.invoice_date, m.date), 'cargo',
+                   m.id, m.journal_id, m.currency_id, m.amount_total, 0, 0,
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM account_move m
+              JOIN asovec_residencia r ON r.id = m.residencia_id
+             WHERE m.residencia_id IN %(residencia_ids)s
+               AND m.state = 'posted'
+               AND m.move_type = 'out_invoice'
+        """, params)
+        cr.execute("""
+            INSERT INTO asovec_residencia_cuenta (
+                residencia_id, proyecto_aso_id, fecha, tipo, move_id, pago_move_id,
+                partial_id, journal_id, currency_id, debe, haber, saldo,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT m.residencia_id, r.proyecto_aso_id, pago.date, 'pago',
+                   m.id, pago.move_id, part.id, pago.journal_id, m.currency_id,
+                   0, ABS(part.debit_amount_currency), 0,
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM account_move m
+              JOIN asovec_residencia r ON r.id = m.residencia_id
+              JOIN account_move_line aml ON aml.move_id = m.id
+              JOIN account_account acc ON acc.id = aml.account_id
+              JOIN account_partial_reconcile part ON part.debit_move_id = aml.id
+              JOIN account_move_line pago ON pago.id = part.credit_move_id
+             WHERE m.residencia_id IN %(residencia_ids)s
+               AND m.state = 'posted'
+               AND m.move_type = 'out_invoice'
+               AND acc.account_type = 'asset_receivable'
+               AND NOT EXISTS (
+                    SELECT 1 FROM account_partial_reconcile ex WHERE ex.exchange_move_id = pago.move_id
+               )
+        """, params)
+        cr.execute("""
+            UPDATE asovec_residencia_cuenta c
+               SET saldo = s.saldo
+              FROM (
+                    SELECT id, SUM(debe - haber) OVER (
+                               PARTITION BY residencia_id ORDER BY fecha, tipo, id
+                           ) AS saldo
+                      FROM asovec_residencia_cuenta
+                     WHERE residencia_id IN %(residencia_ids)s
+                   ) s
+             WHERE s.id = c.id
+        """, params)
+        self.invalidate_model()
+
+    @api.model
+    def _reconstruir_todo(self):
+        """Cuenta corriente de todas las residencias (instalación/migración)."""
+        self._reconstruir(self.env["asovec.residencia"].with_context(active_test=False).search([]).ids)
+
+    @api.model
+    def _residencias_de_moves(self, moves):
+        """Residencias afectadas por cambios en `moves`: las de los propios cargos y
+        las de los cargos contra los que están conciliados (p.ej. al cancelar un pago
+        cambia la cuenta corriente de la residencia de la factura que pagaba)."""
+        if not moves.ids:
+            return set()
+        self.env["account.move"].flush_model(["residencia_id"])
+        self.env["account.move.line"].flush_model(["move_id"])
+        self.env["account.partial.reconcile"].flush_model()
+        self.env.cr.execute("""
+            SELECT m.residencia_id
+              FROM account_move m
+             WHERE m.id IN %(move_ids)s AND m.residencia_id IS NOT NULL
+            UNION
+            SELECT cargo.residencia_id
+              FROM account_move_line aml
+              JOIN account_partial_reconcile part ON part.credit_move_id = aml.id
+              JOIN account_move_line cargo_aml ON cargo_aml.id = part.debit_move_id
+              JOIN account_move cargo ON cargo.id = cargo_aml.move_id
+             WHERE aml.move_id IN %(move_ids)s AND cargo.residencia_id IS NOT NULL
+        """, {"move_ids": tuple(moves.ids)})
+        return {residencia_id for (residencia_id,) in self.env.cr.fetchall()}
+
+    # -------------------------
+    # Verificación nocturna
+    # -------------------------
+    @api.model
+    def _cron_verificar_consistencia(self):
+        """Compara el saldo final de cada residencia en la cuenta corriente con la
+        contabilidad (suma de `amount_residual` de sus cargos posteados) y reconstruye
+        las que no cuadren, p.ej. por un cambio hecho por SQL o por un módulo que no
+        pase por los hooks de account.move/account.partial.reconcile."""
+        self.env["account.move"].flush_model(["residencia_id", "state", "move_type", "amount_residual"])
+        self.flush_model()
+        self.env.cr.execute("""
+            WITH contable AS (
+                SELECT residencia_id, SUM(amount_residual) AS saldo
+                  FROM account_move
+                 WHERE residencia_id IS NOT NULL
+                   AND state = 'posted'
+                   AND move_type = 'out_invoice'
+              GROUP BY residencia_id
+            ), cuenta AS (
+                SELECT residencia_id, SUM(debe - haber) AS saldo
+                  FROM asovec_residencia_cuenta
+              GROUP BY residencia_id
+            )
+            SELECT COALESCE(contable.residencia_id, cuenta.residencia_id)
+              FROM contable
+              FULL OUTER JOIN cuenta ON cuenta.residencia_id = contable.residencia_id
+             WHERE ABS(COALESCE(contable.saldo, 0) - COALESCE(cuenta.saldo, 0)) >= 0.01
+        """)
+        descuadradas = [residencia_id for (residencia_id,) in self.env.cr.fetchall()]
+        if descuadradas:
+            _logger.warning(
+                "Cuenta corriente por residencia descuadrada con la contabilidad en %s "
+                "residencia(s) %s; se reconstruyen.", len(descuadradas), descuadradas[:50],
+            )
+            self._reconstruir(descuadradas)
+        return len(descuadradas)
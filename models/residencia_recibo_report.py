@@ -1,10 +1,8 @@
 # -*- coding: utf-8 -*-
-import base64
 import calendar
 from datetime import date
 
 from odoo import models, fields, api
-from odoo.tools import image_process
 
 from .contador import MONTH_SELECTION
 
@@ -44,6 +42,7 @@ class ReportReciboResidenciaMensual(models.AbstractModel):
         meses = dict(MONTH_SELECTION)
         recibos = []
         logos_cache = {}
+        facturas = lecturas._facturas_y_pagos()
 
         for lectura in lecturas:
             residencia = lectura.residencia_id
@@ -51,21 +50,17 @@ class ReportReciboResidenciaMensual(models.AbstractModel):
             company = lectura.company_id
 
             if company.id not in logos_cache:
-                if company.logo:
-                    resized = image_process(base64.b64decode(company.logo), size=(0, LOGO_MAX_HEIGHT))
-                    logos_cache[company.id] = base64.b64encode(resized) if resized else False
-                else:
-                    logos_cache[company.id] = False
+                logos_cache[company.id] = company._aso_logo_miniatura(LOGO_MAX_HEIGHT)
 
             direccion = residencia.direccion_real
 
-            move = lectura.invoice_move_id
+            move, payment_state = facturas[lectura.id]
             agua = lectura.pago_total
             total = move.amount_total if move else agua
             otros = total - agua
 
             move_state = move.state if move else False
-            payment_state = lectura.payment_status_badge if move else False
+            payment_state = payment_state if move else False
             fecha_pago_disponible = self._get_fecha_pago_disponible(lectura, proyecto) if proyecto else False
 
             recibos.append({
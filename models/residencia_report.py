@@ -7,15 +7,37 @@ class Residencia(models.Model):
 
     def _get_contador_activo(self):
         self.ensure_one()
-        # 'contadores_ids' filtra automáticamente los inactivos (campo 'active' del
-        # modelo), por lo que hay que buscar con active_test=False para poder llegar
-        # al fallback cuando el único contador que existe está inactivo.
+        return self._get_contadores_activos()[self.id]
+
+    def _get_contadores_activos(self):
+        """{residencia_id: contador} para todas las residencias de `self` con una sola
+        consulta: el contador activo o, si no hay ninguno activo, el último (id más
+        alto). Residencias sin ningún contador quedan con un recordset vacío.
+
+        Es el único lugar donde se decide cuál es el contador de una residencia: los
+        reportes y exportaciones que recorren muchas residencias lo llaman una vez
+        para todas en lugar de `_get_contador_activo` por residencia. Todos los
+        contadores devueltos comparten el prefetch, así que leer sus campos después
+        también es una sola consulta."""
+        # Sin filtrar por 'active' (el ORM descartaría los inactivos): hace falta poder
+        # llegar al fallback cuando el único contador que existe está inactivo.
         Contador = self.env['asovec.contador'].with_context(active_test=False)
-        contador = Contador.search([('residencia_id', '=', self.id), ('active', '=', True)], limit=1)
-        if contador:
-            return contador
-        # fallback: el último si no hay activo
-        return Contador.search([('residencia_id', '=', self.id)], order='id desc', limit=1)
+        resultado = {residencia_id: Contador for residencia_id in self.ids}
+        if not self:
+            return resultado
+        Contador.flush_model(['residencia_id', 'active'])
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (residencia_id) residencia_id, id
+              FROM asovec_contador
+             WHERE residencia_id IN %s
+          ORDER BY residencia_id, active IS TRUE DESC, id DESC
+        """, [tuple(self.ids)])
+        elegidos = dict(self.env.cr.fetchall())
+        # Al iterar el recordset cada contador conserva el prefetch de todos.
+        por_id = {contador.id: contador for contador in Contador.browse(list(elegidos.values()))}
+        for residencia_id, contador_id in elegidos.items():
+            resultado[residencia_id] = por_id[contador_id]
+        return resultado
 
     def action_print_estado_cuenta_lecturas(self):
         self.ensure_one()
@@ -30,10 +52,11 @@ class ReportEstadoCuentaResidenciaLecturas(models.AbstractModel):
     def _get_report_values(self, docids, data=None):
         residencias = self.env["asovec.residencia"].browse(docids)
 
+        contadores = residencias._get_contadores_activos()
         report_docs = []
 
         for res in residencias:
-            contador = res._get_contador_activo()
+            contador = contadores[res.id]
 
             lecturas = (
                 contador._historial_lecturas_ordenado()
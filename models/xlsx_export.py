@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Armado de los Excel de exportación en dos modos, con el mismo código de escritura.
+
+Cada wizard expone `_escribir_excel(workbook)`, que llena el libro y devuelve el
+nombre de archivo. Hay dos formas de producir el libro:
+
+- `xlsx_en_memoria`: el libro completo en memoria. El wizard lo guarda en su campo
+  `file_data` para el enlace de descarga del formulario; es el modo de siempre, y lo
+  usan también los procesos que necesitan el archivo (p.ej. Estado de Cuenta Masivo).
+- `xlsx_en_archivo_temporal`: modo `constant_memory` de xlsxwriter. Cada fila se
+  escribe a disco al pasar a la siguiente y el libro queda en un archivo temporal, que
+  el controlador (controllers/estado_cuenta_controller.py) envía tal cual en la
+  respuesta HTTP. No se guarda en el wizard ni en ir_attachment. Por eso
+  `_escribir_excel` debe escribir cada hoja fila por fila, de arriba hacia abajo: en
+  este modo se ignora cualquier celda de una fila que ya quedó atrás."""
+import io
+import tempfile
+
+import xlsxwriter
+
+
+def xlsx_en_memoria(escribir):
+    """(contenido, nombre de archivo) del libro que arma `escribir(workbook)`."""
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {"in_memory": True})
+    filename = escribir(workbook)
+    workbook.close()
+    return buffer.getvalue(), filename
+
+
+def xlsx_en_archivo_temporal(escribir):
+    """(archivo temporal abierto y rebobinado, nombre de archivo) del libro que arma
+    `escribir(workbook)` en modo constant_memory. El archivo se borra solo al cerrarlo;
+    quien lo recibe es responsable de cerrarlo."""
+    archivo = tempfile.TemporaryFile()
+    try:
+        workbook = xlsxwriter.Workbook(archivo, {"constant_memory": True})
+        filename = escribir(workbook)
+        workbook.close()
+    except Exception:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return archivo, filename
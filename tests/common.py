@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import os
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+def config_benchmark(nombre, defecto):
+    """Valor entero de la variable de entorno ASOVEC_BENCHMARK_<nombre>, o `defecto`:
+    permite correr la misma suite con una asociación más grande (o con otro
+    presupuesto de consultas) sin tocar el código."""
+    valor = os.environ.get("ASOVEC_BENCHMARK_%s" % nombre)
+    return int(valor) if valor else defecto
+
+
+class AsovecCommon(AccountTestInvoicingCommon):
+    """Asociación sintética para las pruebas: `PROYECTOS` proyectos con
+    `RESIDENCIAS` residencias cada uno, contadores con `MESES` meses de historial
+    de lecturas, servicios automáticos con precio por proyecto y algunas
+    excepciones (servicio especial por residencia, canon propio, residencias sin
+    contador).
+
+    El historial queda antes del umbral 'Cálculos a partir de' de la compañía, así
+    que no genera cargos; `periodo` es el mes siguiente al historial, para el que
+    las pruebas cargan las lecturas y generan el cobro mensual."""
+
+    PROYECTOS = config_benchmark("PROYECTOS", 2)
+    RESIDENCIAS = config_benchmark("RESIDENCIAS", 40)
+    MESES = config_benchmark("MESES", 6)
+    # Cada cuántas residencias una queda sin contador (inactiva), una tiene un
+    # servicio con precio especial y una tiene su propio canon de agua.
+    CADA_SIN_CONTADOR = 10
+    CADA_SERVICIO_ESPECIAL = 7
+    CADA_CANON_PROPIO = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env.user.groups_id += cls.env.ref("iit_asovec.asovec_group_administrador")
+        cls.company = cls.company_data["company"]
+
+        cls.periodo = date(2024, 6, 1)
+        cls.inicio_historial = cls.periodo - relativedelta(months=cls.MESES)
+        # Historial y lecturas del período se guardan sin generar cargos; las pruebas
+        # bajan el umbral al período cuando quieren generarlos (ver `_habilitar_periodo`).
+        siguiente = cls.periodo + relativedelta(months=1)
+        cls.company.write({
+            "aso_calculos_mes": str(siguiente.month),
+            "aso_calculos_anio": siguiente.year,
+        })
+
+        cls.journal_cargo = cls.company_data["default_journal_sale"]
+        cls.journal_cargo.aso_cargo_automatico = "Si"
+        cls.cuenta_ingreso = cls.company_data["default_account_revenue"]
+
+        cls.servicio_agua_base = cls._servicio_agua("aso_agua_base", "Canon de Agua")
+        cls.servicio_agua_exceso = cls._servicio_agua("aso_agua_exceso", "Exceso de Agua")
+        cls.servicio_agua_inactivo = cls._servicio_agua("aso_agua_inactivo", "Cuota Contador Inactivo")
+
+        cls.tipo_mantenimiento = cls.env["asovec.tipo_servicio_aso"].create({
+            "name": "Mantenimiento (pruebas)",
+            "aso_automatico": True,
+        })
+        cls.servicio_mantenimiento = cls._crear_servicio("Mantenimiento", cls.tipo_mantenimiento)
+        cls.tipo_seguridad = cls.env["asovec.tipo_servicio_aso"].create({
+            "name": "Seguridad (pruebas)",
+            "aso_automatico": True,
+            "aso_cobra_inactivas": False,
+        })
+        cls.servicio_seguridad = cls._crear_servicio("Seguridad", cls.tipo_seguridad)
+
+        cls.proyectos = cls.env["asovec.proyecto_aso"].create([{
+            "name": "Proyecto Pruebas %s" % (i + 1),
+            "cobro_base": 75.0,
+            "precio_metro": 6.5,
+            "metro_base": 20,
+            "cobro_inactivas": 35.0,
+        } for i in range(cls.PROYECTOS)])
+        cls.env["asovec.tipo_servicio_aso.proyecto"].create([{
+            "tipo_servicio_aso_id": tipo.id,
+            "proyecto_aso_id": proyecto.id,
+            "precio": precio,
+        } for proyecto in cls.proyectos
+            for tipo, precio in ((cls.tipo_mantenimiento, 50.0), (cls.tipo_seguridad, 40.0))])
+
+        cls.residencias = cls._crear_residencias()
+        cls.contadores = cls._crear_contadores(cls.residencias.filtered("activo"))
+        cls._crear_historial(cls.contadores)
+
+    @classmethod
+    def _servicio_agua(cls, campo, nombre):
+        """Producto de agua (base/exceso/inactivo). Solo puede existir un tipo de
+        servicio con cada uno de esos flags (índice único parcial), así que se reusa
+        el que ya tenga la base de datos."""
+        producto = cls.env["product.template"].search([(campo, "=", True)], limit=1)
+        if producto:
+            return producto
+        tipo = cls.env["asovec.tipo_servicio_aso"].search([(campo, "=", True)], limit=1)
+        if not tipo:
+            tipo = cls.env["asovec.tipo_servicio_aso"].create({
+                "name": "%s (pruebas)" % nombre,
+                "aso_agua": True,
+                campo: True,
+            })
+        return cls._crear_servicio(nombre, tipo)
+
+    @classmethod
+    def _crear_servicio(cls, nombre, tipo):
+        return cls.env["product.template"].create({
+            "name": nombre,
+            "detailed_type": "service",
+            "aso_es_servicio_aso": True,
+            "tipo_servicio_aso_id": tipo.id,
+            "property_account_income_id": cls.cuenta_ingreso.id,
+        })
+
+    @classmethod
+    def _crear_residencias(cls):
+        clientes = cls.env["res.partner"].create([
+            {"name": "Residente %s-%s" % (p + 1, i + 1)}
+            for p in range(cls.PROYECTOS) for i in range(cls.RESIDENCIAS)
+        ])
+        vals_list = []
+        for p, proyecto in enumerate(cls.proyectos):
+            for i in range(cls.RESIDENCIAS):
+                vals = {
+                    "name": "P%s-R%04d" % (p + 1, i + 1),
+                    "proyecto_aso_id": proyecto.id,
+                    "cliente_id": clientes[p * cls.RESIDENCIAS + i].id,
+                }
+                if i % cls.CADA_SIN_CONTADOR == cls.CADA_SIN_CONTADOR - 1:
+                    vals["sin_contador"] = True
+                if i % cls.CADA_CANON_PROPIO == 1:
+                    vals.update({"cobro_base_especial": True, "cobro_base_especial_valor": 60.0})
+                vals_list.append(vals)
+        residencias = cls.env["asovec.residencia"].create(vals_list)
+
+        especiales = residencias.filtered(lambda r: r.activo)[::cls.CADA_SERVICIO_ESPECIAL]
+        cls.env["asovec.residencia.lines"].create([{
+            "residencia_id": residencia.id,
+            "producto_id": cls.servicio_mantenimiento.id,
+            "precio": 25.0,
+        } for residencia in especiales])
+        return residencias
+
+    @classmethod
+    def _crear_contadores(cls, residencias):
+        contadores = cls.env["asovec.contador"].create([{
+            "name": "C-%s" % residencia.name,
+            "residencia_id": residencia.id,
+        } for residencia in residencias])
+        cls.env["asovec.contador.lines"].create([{
+            "contador_id": contador.id,
+            "es_inicial": True,
+            "lectura": 100.0,
+        } for contador in contadores])
+        return contadores
+
+    @classmethod
+    def _crear_historial(cls, contadores):
+        """`MESES` lecturas mensuales por contador, en un solo create (como una
+        importación), con consumos distintos para que haya exceso en algunas."""
+        vals_list = []
+        for n, contador in enumerate(contadores):
+            lectura = 100.0
+            for m in range(cls.MESES):
+                periodo = cls.inicio_historial + relativedelta(months=m)
+                lectura += 15 + (n + m) % 12
+                vals_list.append({
+                    "contador_id": contador.id,
+                    "mes": str(periodo.month),
+                    "anio": periodo.year,
+                    "lectura": lectura,
+                })
+        cls.env["asovec.contador.lines"].create(vals_list)
+
+    @classmethod
+    def _vals_lecturas_periodo(cls, contadores, periodo=None):
+        """Lecturas del `periodo` (por defecto el del cobro de las pruebas) para
+        `contadores`, a partir de su última lectura guardada."""
+        periodo = periodo or cls.periodo
+        return [{
+            "contador_id": contador.id,
+            "mes": str(periodo.month),
+            "anio": periodo.year,
+            "lectura": contador.ultima_lectura + 12 + n % 15,
+        } for n, contador in enumerate(contadores)]
+
+    @classmethod
+    def _habilitar_periodo(cls, periodo=None):
+        """Baja el umbral 'Cálculos a partir de' al `periodo`: desde ahí sus lecturas
+        generan cargo y 'Completar Faltantes' las factura."""
+        periodo = periodo or cls.periodo
+        cls.company.write({
+            "aso_calculos_mes": str(periodo.month),
+            "aso_calculos_anio": periodo.year,
+        })
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import tempfile
+import time
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import AsovecCommon, config_benchmark
+
+_logger = logging.getLogger(__name__)
+
+# Presupuesto de consultas SQL por residencia de cada proceso (más una base fija por
+# corrida). Se puede ajustar sin tocar el código con ASOVEC_BENCHMARK_CONSULTAS_<PROCESO>;
+# la prueba falla si un proceso lo excede, así una regresión de rendimiento (una
+# búsqueda por residencia que vuelve a aparecer, un recálculo de todo el cobro por
+# cada cargo, etc.) se detecta antes de llegar a producción.
+PRESUPUESTO_POR_RESIDENCIA = {
+    "lecturas": config_benchmark("CONSULTAS_LECTURAS", 10),
+    "generar": config_benchmark("CONSULTAS_GENERAR", 40),
+    "regenerar": config_benchmark("CONSULTAS_REGENERAR", 90),
+    "confirmar": config_benchmark("CONSULTAS_CONFIRMAR", 45),
+    "csv_banco": config_benchmark("CONSULTAS_CSV_BANCO", 10),
+    "analisis_mensual": config_benchmark("CONSULTAS_ANALISIS_MENSUAL", 10),
+    "estado_cuenta_masivo": config_benchmark("CONSULTAS_ESTADO_CUENTA_MASIVO", 40),
+    "corte_servicio": config_benchmark("CONSULTAS_CORTE_SERVICIO", 10),
+}
+CONSULTAS_BASE = config_benchmark("CONSULTAS_BASE", 150)
+
+
+@tagged("post_install", "-at_install", "asovec_benchmark")
+class TestBenchmarkCobroMensual(AsovecCommon):
+    """Mide el ciclo de cobro mensual de un proyecto de la asociación sintética
+    (`AsovecCommon`): importación de lecturas, 'Completar Faltantes', 'Regenerar
+    Cargos' y 'Confirmar', y con el cobro ya confirmado los procesos que leen la
+    deuda: CSV del banco, Análisis Mensual, estado de cuenta masivo y Notificación
+    de Corte de Servicio. Por cada proceso guarda consultas SQL y tiempo en un
+    reporte JSON (ASOVEC_BENCHMARK_REPORTE, o asovec_benchmark.json en el directorio
+    temporal) y exige que las consultas queden dentro de su presupuesto."""
+
+    def setUp(self):
+        super().setUp()
+        # Los procesos hacen commit por tanda para no perder el avance; dentro de la
+        # prueba todo debe quedar en la transacción que se revierte al final.
+        self.patch(self.env.cr, "commit", lambda: None)
+        self.reporte = []
+
+    def _medir(self, proceso, residencias, funcion):
+        """Corre `funcion` dentro de `assertQueryCount` con el presupuesto de
+        `proceso` para `residencias` residencias, y agrega al reporte las consultas
+        y el tiempo que tomó."""
+        presupuesto = CONSULTAS_BASE + PRESUPUESTO_POR_RESIDENCIA[proceso] * residencias
+        consultas_inicio = self.env.cr.sql_log_count
+        inicio = time.monotonic()
+        with self.assertQueryCount(presupuesto):
+            resultado = funcion()
+        duracion = time.monotonic() - inicio
+        consultas = self.env.cr.sql_log_count - consultas_inicio
+        self.reporte.append({
+            "proceso": proceso,
+            "residencias": residencias,
+            "consultas": consultas,
+            "presupuesto": presupuesto,
+            "consultas_por_residencia": round(consultas / residencias, 2) if residencias else 0.0,
+            "duracion_s": round(duracion, 3),
+            "ms_por_residencia": round(duracion * 1000 / residencias, 1) if residencias else 0.0,
+        })
+        return resultado
+
+    def _escribir_reporte(self):
+        ruta = os.environ.get("ASOVEC_BENCHMARK_REPORTE") or os.path.join(
+            tempfile.gettempdir(), "asovec_benchmark.json",
+        )
+        contenido = {
+            "proyectos": self.PROYECTOS,
+            "residencias_por_proyecto": self.RESIDENCIAS,
+            "meses_historial": self.MESES,
+            "procesos": self.reporte,
+        }
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump(contenido, archivo, ensure_ascii=False, indent=2)
+        _logger.info("Benchmark cobro mensual (%s): %s", ruta, json.dumps(contenido, ensure_ascii=False))
+
+    def test_ciclo_cobro_mensual(self):
+        proyecto = self.proyectos[0]
+        residencias = self.residencias.filtered(lambda r: r.proyecto_aso_id == proyecto)
+        contadores = self.contadores.filtered(lambda c: c.residencia_id.proyecto_aso_id == proyecto)
+        Lectura = self.env["asovec.contador.lines"]
+
+        vals_lecturas = self._vals_lecturas_periodo(contadores)
+        lecturas = self._medir("lecturas", len(contadores), lambda: Lectura.create(vals_lecturas))
+        self.assertEqual(len(lecturas), len(contadores))
+
+        self._habilitar_periodo()
+        cobro = self.env["asovec.proyecto_cobro_mensual"]._get_or_create_cobro(
+            proyecto, str(self.periodo.month), self.periodo.year,
+        )
+        pendientes = cobro._residencias_pendientes_generar()
+        self.assertEqual(pendientes, residencias)
+        self.assertLessEqual(len(pendientes), cobro._GENERATE_CHUNK_SIZE,
+                             "Subir _GENERATE_CHUNK_SIZE o bajar ASOVEC_BENCHMARK_RESIDENCIAS.")
+        self._medir("generar", len(pendientes), lambda: cobro._generar_lote(pendientes))
+        self.assertFalse(cobro._residencias_pendientes_generar())
+        self.assertEqual(len(cobro.line_ids.move_id), len(residencias))
+
+        # Cambia el precio del proyecto: todos los cargos con mantenimiento se rehacen.
+        detalle = self.tipo_mantenimiento.proyecto_ids.filtered(lambda d: d.proyecto_aso_id == proyecto)
+        detalle.precio = 55.0
+        self._medir("regenerar", len(residencias), cobro.action_regenerar_cargos)
+        self.assertEqual(cobro.regenerar_cargos_cursor, -1)
+
+        # Los indicadores del encabezado se recalculan al cerrar la transacción.
+        self.env.cr.flush()
+        self._medir("confirmar", len(residencias), cobro.action_confirm)
+        self.assertEqual(cobro.state, "posted")
+        self.assertEqual(set(cobro.line_ids.move_id.mapped("state")), {"posted"})
+
+        corridas = self.env["asovec.batch_run"].search([("cobro_id", "=", cobro.id)])
+        self.assertEqual(set(corridas.mapped("proceso")), {"generar", "regenerar", "confirmar"})
+
+        # CSV del banco y Análisis Mensual: recorren todas las residencias de la
+        # asociación, no solo las del proyecto cobrado.
+        csv_banco = self.env["asovec.proceso_estado_cuenta_csv_wizard"].create({
+            "mes": str(self.periodo.month),
+            "anio": self.periodo.year,
+            "journal_ids": [(6, 0, self.journal_cargo.ids)],
+        })
+        self._medir("csv_banco", len(self.residencias), csv_banco.action_generar)
+        self.assertTrue(csv_banco.file_data)
+
+        analisis = self.env["asovec.proceso_analisis_mensual_wizard"].create({
+            "mes": str(self.periodo.month),
+            "anio": self.periodo.year,
+        })
+        Analisis = self.env["report.iit_asovec.report_analisis_mensual_document"]
+        self._medir("analisis_mensual", len(self.residencias), lambda: Analisis._build_analisis_data(analisis))
+
+        masivo = self.env["asovec.estado_cuenta_masivo"].create({
+            "proyecto_aso_id": proyecto.id,
+            "formato": "xlsx_zip",
+        })
+        masivo.action_generar()
+
+        def estado_cuenta_masivo():
+            while masivo.state in ("pendiente", "en_proceso"):
+                masivo._procesar_tanda()
+
+        self._medir("estado_cuenta_masivo", len(residencias), estado_cuenta_masivo)
+        self.assertEqual(masivo.state, "terminado")
+        self.assertEqual(masivo.procesados, len(residencias))
+
+        # Los cargos cuentan por la fecha real de creación (hoy): con el mes siguiente
+        # como referencia, todos quedan con un mes de atraso. El refresco de la vista
+        # lo hace el cron, fuera de la búsqueda.
+        self.env["asovec.residencia_atraso"]._refrescar()
+        referencia = fields.Date.today() + relativedelta(months=1)
+        corte = self.env["asovec.proceso_corte_servicio_wizard"].create({
+            "proyecto_aso_id": proyecto.id,
+            "mes": str(referencia.month),
+            "anio": referencia.year,
+            "meses_atraso": 1,
+        })
+        self._medir("corte_servicio", len(residencias), corte.action_buscar)
+        self.assertEqual(corte.line_count, len(residencias))
+
+        self._escribir_reporte()
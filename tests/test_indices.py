@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from dateutil.relativedelta import relativedelta
+
+from odoo.tests import tagged
+from odoo.tools import SQL
+
+from .common import AsovecCommon
+
+
+@tagged("post_install", "-at_install")
+class TestIndices(AsovecCommon):
+    """Las búsquedas que corren en cada generación y en cada reporte (residencias
+    del proyecto, lecturas de un mes, cargo de una residencia en un período, detalle
+    de un cargo) deben resolverse con el índice pensado para cada una, no con uno de
+    una sola columna que igual obliga a revisar todo el historial de la residencia o
+    del contador.
+
+    Con `enable_seqscan` apagado PostgreSQL nunca recorre la tabla completa si algún
+    índice sirve, y con las estadísticas al día (ANALYZE) elige entre los índices por
+    su selectividad real: por eso cada prueba exige el nombre del índice creado en
+    `init()` (o por `index=True`), no solo que no haya un Seq Scan."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._habilitar_periodo()
+        cls.lecturas = cls.env["asovec.contador.lines"].create(cls._vals_lecturas_periodo(cls.contadores))
+        cls.cobro_lines = cls.env["asovec.proyecto_cobro_mensual_line"].search([
+            ("residencia_id", "in", cls.residencias.ids),
+        ])
+        # Historial de cobros: con un solo período por residencia el índice de
+        # residencia_id solo sería tan selectivo como el de (residencia, año, mes).
+        cls._crear_cobros_historial()
+        cls.env.flush_all()
+        for tabla in ("asovec_residencia", "asovec_contador_lines", "asovec_proyecto_cobro_mensual_line"):
+            cls.env.cr.execute("ANALYZE %s" % tabla)
+
+    @classmethod
+    def _crear_cobros_historial(cls):
+        """Un cobro mensual por proyecto y mes del historial, con la línea de cada
+        residencia (sin cargo: solo importa la fila para el índice)."""
+        Cobro = cls.env["asovec.proyecto_cobro_mensual"]
+        vals_list = []
+        for m in range(cls.MESES):
+            periodo = cls.inicio_historial + relativedelta(months=m)
+            for proyecto in cls.proyectos:
+                cobro = Cobro._get_or_create_cobro(proyecto, str(periodo.month), periodo.year)
+                vals_list += [{
+                    "cobro_id": cobro.id,
+                    "residencia_id": residencia.id,
+                    "con_lectura": "Sin Lectura",
+                } for residencia in cls.residencias if residencia.proyecto_aso_id == proyecto]
+        cls.env["asovec.proyecto_cobro_mensual_line"].create(vals_list)
+
+    def setUp(self):
+        super().setUp()
+        self.env.cr.execute("SET enable_seqscan = off")
+        self.addCleanup(self.env.cr.execute, "RESET enable_seqscan")
+
+    def _plan(self, model, domain):
+        query = self.env[model]._search(domain)
+        self.env.cr.execute(SQL("EXPLAIN %s", query.select()))
+        return "\n".join(fila[0] for fila in self.env.cr.fetchall())
+
+    def assertUsaIndice(self, model, domain, indice):
+        tabla = self.env[model]._table
+        plan = self._plan(model, domain)
+        self.assertNotIn("Seq Scan on %s" % tabla, plan, "%s %s recorre toda la tabla:\n%s" % (model, domain, plan))
+        self.assertIn(indice, plan, "%s %s no usa %s:\n%s" % (model, domain, indice, plan))
+
+    def test_residencias_del_proyecto(self):
+        """_residencias_pendientes_generar / _residencias_scope: residencias de un
+        proyecto que pagan servicios (el ORDER BY id ordena después solo las del
+        proyecto)."""
+        self.assertUsaIndice("asovec.residencia", [
+            ("proyecto_aso_id", "=", self.proyectos[0].id),
+            ("no_paga_servicios", "=", False),
+        ], "asovec_residencia__proyecto_aso_id_index")
+
+    def test_lecturas_del_periodo(self):
+        """_lecturas_por_residencia / _lecturas_rows: lecturas de un mes de un lote de
+        residencias."""
+        self.assertUsaIndice("asovec.contador.lines", [
+            ("residencia_id", "in", self.residencias[:20].ids),
+            ("anio", "=", self.periodo.year),
+            ("mes", "=", str(self.periodo.month)),
+            ("es_inicial", "=", False),
+        ], "asovec_contador_lines_residencia_periodo")
+
+    def test_lectura_duplicada_del_contador(self):
+        """_validate_periodo_vals: lectura del mismo contador y período."""
+        self.assertUsaIndice("asovec.contador.lines", [
+            ("contador_id", "=", self.contadores[0].id),
+            ("es_inicial", "=", False),
+            ("mes", "=", str(self.periodo.month)),
+            ("anio", "=", self.periodo.year),
+        ], "asovec_contador_lines_contador_periodo")
+
+    def test_cargo_del_periodo(self):
+        """_cobro_line_for_period y _check_no_cargo_posteado: cargo de una residencia
+        en un período."""
+        residencia = self.lecturas[0].residencia_id
+        mes = str(self.periodo.month).zfill(2)
+        self.assertUsaIndice("asovec.proyecto_cobro_mensual_line", [
+            ("residencia_id", "=", residencia.id),
+            ("month", "=", mes),
+            ("year", "=", self.periodo.year),
+            ("cobro_state", "!=", "cancel"),
+        ], "asovec_cobro_line_residencia_periodo")
+        self.assertUsaIndice("asovec.proyecto_cobro_mensual_line", [
+            ("residencia_id", "=", residencia.id),
+            ("month", "=", mes),
+            ("year", "=", self.periodo.year),
+            ("move_state", "=", "posted"),
+        ], "asovec_cobro_line_residencia_periodo")
+
+    def test_detalle_de_cargos(self):
+        """account.move._cobros_mensuales: detalle de cobro de un grupo de cargos."""
+        self.assertTrue(self.cobro_lines.move_id)
+        self.assertUsaIndice("asovec.proyecto_cobro_mensual_line", [
+            ("move_id", "in", self.cobro_lines.move_id[:10].ids),
+        ], "asovec_proyecto_cobro_mensual_line__move_id_index")